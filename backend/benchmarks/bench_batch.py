@@ -0,0 +1,65 @@
+"""
+Benchmark: leitura de um lote de planilhas em série vs no pool de processos
+
+Cada arquivo de um upload em lote vira um job de ingestão; com INGEST_WORKERS
+processos no pool, as leituras correm em paralelo como aqui.
+
+Uso: python benchmarks/bench_batch.py [arquivos] [linhas por arquivo]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import make_cost_frame
+from services.ingestion import read_cost_table_file
+from services.uploads import open_upload_buffer
+
+
+def parse_upload(file_path, filename):
+    """Lê um arquivo como o job de ingestão (executado no processo do pool)"""
+    with open_upload_buffer(file_path) as buffer:
+        df, error, _ = read_cost_table_file(buffer, filename, trace_memory=False)
+    return len(df) if df is not None else error
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    directory = tempfile.mkdtemp()
+
+    try:
+        paths = []
+        for index in range(files):
+            path = os.path.join(directory, f'tabela_{index}.xlsx')
+            make_cost_frame(rows, seed=index).to_excel(path, index=False)
+            paths.append(path)
+
+        start = time.perf_counter()
+        for path in paths:
+            parse_upload(path, os.path.basename(path))
+        serial = time.perf_counter() - start
+        print(f"{'série':<24} {serial:8.3f}s")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                names = [os.path.basename(path) for path in paths]
+                # Aquecimento: os processos importam pandas/openpyxl na primeira rodada
+                list(executor.map(parse_upload, paths, names))
+                start = time.perf_counter()
+                list(executor.map(parse_upload, paths, names))
+                seconds = time.perf_counter() - start
+            print(f"{f'pool ({workers} processos)':<24} {seconds:8.3f}s  {serial / seconds:5.2f}x")
+            workers *= 2
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: gravação + SHA256 do upload
+
+Compara o fluxo original (file.save seguido de releitura em blocos de 4KB para o
+hash) com a gravação em passagem única de services.uploads.
+
+Uso: python benchmarks/bench_hashing.py [tamanho_em_MB]
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from common import timed
+from services.uploads import HashingFileWriter, DEFAULT_BUFFER_SIZE
+
+
+def save_then_hash(payload, directory):
+    """Fluxo original: grava o arquivo e depois o relê para calcular o hash"""
+    file_path = os.path.join(directory, 'original.bin')
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(io.BytesIO(payload), f)
+
+    hash_sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_sha256.update(chunk)
+    return hash_sha256.hexdigest(), os.path.getsize(file_path)
+
+
+def single_pass(payload, directory, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Gravação em passagem única com hash calculado no fluxo"""
+    writer = HashingFileWriter(directory, buffer_size)
+    stream = io.BytesIO(payload)
+    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+        writer.write(chunk)
+    stored = writer.persist(os.path.join(directory, 'single_pass.bin'))
+    return stored.sha256, stored.size
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    payload = os.urandom(size_mb * 1024 * 1024)
+    directory = tempfile.mkdtemp()
+
+    try:
+        (expected, _), seconds = timed(save_then_hash, payload, directory)
+        print(f"{'file.save + hash (4KB)':<32} {seconds:8.3f}s  {size_mb / seconds:8.1f} MB/s")
+
+        (digest, _), seconds = timed(single_pass, payload, directory)
+        print(f"{'passagem única (1MB)':<32} {seconds:8.3f}s  {size_mb / seconds:8.1f} MB/s")
+
+        _, seconds = timed(hashlib.sha256, payload)
+        print(f"{'somente SHA256 (memória)':<32} {seconds:8.3f}s  {size_mb / seconds:8.1f} MB/s")
+
+        assert digest == expected, 'hash divergente'
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
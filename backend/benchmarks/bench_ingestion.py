@@ -0,0 +1,66 @@
+"""
+Benchmark: ingestão de itens via ORM linha a linha vs INSERT em lote
+
+Uso: python benchmarks/bench_ingestion.py [linhas] [chunk_size]
+"""
+
+import os
+import sys
+from datetime import date
+
+from common import (make_app, seed_supplier_and_user, make_cost_frame, timed, report,
+                    db, CostTable, CostItem)
+from services.ingestion import ingest_cost_items
+
+
+def create_table(supplier, user, rows):
+    cost_table = CostTable(
+        supplier_id=supplier.id, version='v1.0', filename='bench.xlsx',
+        file_path='bench.xlsx', effective_date=date.today(), category='Outros',
+        total_items=rows, submitted_by=user.id
+    )
+    db.session.add(cost_table)
+    db.session.flush()
+    return cost_table
+
+
+def ingest_orm(cost_table, df):
+    """Caminho original: um CostItem por linha com df.iterrows()"""
+    for _, row in df.iterrows():
+        cost_item = CostItem(
+            cost_table_id=cost_table.id, sku=row['sku'], description=row['description'],
+            category=row['category'], unit=row['unit'], previous_cost=row['previous_cost'],
+            new_cost=row['new_cost'], monthly_volume=row['monthly_volume']
+        )
+        cost_item.calculate_changes()
+        db.session.add(cost_item)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    df = make_cost_frame(rows)
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            user, supplier = seed_supplier_and_user()
+
+            def run_orm():
+                ingest_orm(create_table(supplier, user, rows), df)
+                db.session.commit()
+
+            def run_bulk():
+                ingest_cost_items(create_table(supplier, user, rows), df, chunk_size=chunk_size)
+                db.session.commit()
+
+            _, seconds = timed(run_orm)
+            report('ORM (iterrows + session.add)', rows, seconds)
+            _, seconds = timed(run_bulk)
+            report(f'INSERT em lote (chunk={chunk_size})', rows, seconds)
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: número de consultas SQL por requisição nas rotas de listagem
+
+Chama cada rota com páginas pequenas e grandes e confere que o número de
+consultas (X-Query-Count) é o mesmo e fica dentro do orçamento declarado com
+@query_budget (QUERY_BUDGET_STRICT ligado: orçamento excedido vira erro 500).
+Termina com código 1 se alguma rota falhar.
+
+Uso: python benchmarks/bench_query_counts.py [tabelas]
+"""
+
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+
+from common import make_app, seed_supplier_and_user, db, CostTable, Approval, Supplier, User
+from routes.approval import approval_bp
+from routes.cost_table import cost_table_bp
+from routes.dashboard import dashboard_bp
+from services.migrations import run_migrations
+from services.query_counter import init_query_counter, QUERY_COUNT_HEADER
+
+SMALL, LARGE = 5, 50
+
+# (rota, parâmetro de tamanho da página)
+ENDPOINTS = [
+    ('/api/cost-tables/', 'per_page'),
+    ('/api/cost-tables/?cursor=', 'per_page'),
+    ('/api/approvals/pending', 'per_page'),
+    ('/api/approvals/overdue', 'per_page'),
+    ('/api/approvals/reminders', None),
+    ('/api/approvals/cost-table/1/workflow', None),
+    ('/api/dashboard/recent-activity', 'limit'),
+    ('/api/dashboard/metrics/approval-times', 'per_page'),
+    ('/api/dashboard/metrics/monthly', 'months'),
+    ('/api/dashboard/metrics/suppliers', 'limit'),
+    ('/api/dashboard/metrics/categories', None),
+    ('/api/dashboard/overview', None),
+    ('/api/dashboard/reports?period=last_year', None),
+]
+
+
+def seed(tables, owners=10):
+    user, supplier = seed_supplier_and_user()
+
+    # Fornecedores e usuários distintos por tabela, para o N+1 não ficar escondido no identity map
+    suppliers, users = [supplier], [user]
+    for index in range(1, owners):
+        suppliers.append(Supplier(name=f'Fornecedor {index}', cnpj=f'00.000.000/0001-{index:02d}',
+                                  email=f'fornecedor{index}@bench.com', category='Outros'))
+        approver = User(username=f'bench{index}', email=f'bench{index}@empresa.com',
+                        first_name='Bench', last_name=str(index), role='commercial_manager')
+        approver.set_password('bench')
+        users.append(approver)
+    db.session.add_all(suppliers[1:] + users[1:])
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for index in range(tables):
+        owner = index % owners
+        cost_table = CostTable(
+            supplier_id=suppliers[owner].id, version=f'v1.{index}', filename=f'bench_{index}.xlsx',
+            file_path='bench.xlsx', effective_date=date.today(), category='Outros',
+            total_items=0, submitted_by=users[owner].id, status='under_review'
+        )
+        db.session.add(cost_table)
+        db.session.flush()
+        # Uma aprovação pendente (metade vencida, delegada ao usuário logado) e uma decidida por tabela
+        db.session.add(Approval(cost_table_id=cost_table.id, approver_id=users[owner].id, delegated_to=user.id,
+                                approval_type='category_buyer', sequence_order=1, status='pending',
+                                deadline=now + timedelta(hours=(index % 2) * 48 - 12)))
+        db.session.add(Approval(cost_table_id=cost_table.id, approver_id=users[owner].id,
+                                approval_type='pricing_analyst', sequence_order=2, status='approved',
+                                assigned_at=now - timedelta(days=3), decision_date=now - timedelta(days=1),
+                                deadline=now))
+    db.session.commit()
+    return user
+
+
+def query_count(client, path, size_param, size):
+    url = path
+    if size_param:
+        url += ('&' if '?' in path else '?') + f'{size_param}={size}'
+    response = client.get(url)
+    return response.status_code, int(response.headers.get(QUERY_COUNT_HEADER, -1))
+
+
+def main():
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    app, db_path = make_app()
+    # Sem cache do dashboard: a segunda chamada de cada rota precisa chegar ao banco
+    app.config.update(SECRET_KEY='bench', QUERY_COUNT_HEADER=True, QUERY_BUDGET_STRICT=True, DASHBOARD_CACHE_TTL=0)
+    app.register_blueprint(cost_table_bp, url_prefix='/api/cost-tables')
+    app.register_blueprint(approval_bp, url_prefix='/api/approvals')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    init_query_counter(app)
+
+    failed = 0
+    try:
+        with app.app_context():
+            # Agregados do dashboard e índices de busca (mantidos por triggers)
+            run_migrations(db.engine)
+            user_id = seed(tables).id
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+
+        for path, size_param in ENDPOINTS:
+            small_status, small = query_count(client, path, size_param, SMALL)
+            large_status, large = query_count(client, path, size_param, LARGE)
+            ok = small_status == large_status == 200 and small == large
+            failed += not ok
+            print(f"[{'OK' if ok else 'FALHA'}] {path:<42} {small:>3} consultas (página {SMALL})  "
+                  f"{large:>3} consultas (página {LARGE})  status {small_status}/{large_status}")
+    finally:
+        os.remove(db_path)
+        shutil.rmtree(app.config['UPLOAD_FOLDER'], ignore_errors=True)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
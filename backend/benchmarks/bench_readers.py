@@ -0,0 +1,68 @@
+"""
+Benchmark: leitura de planilhas com pd.read_excel vs leitores em streaming
+
+Uso: python benchmarks/bench_readers.py [linhas]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from common import make_cost_frame
+from services.readers import read_cost_frame, reset_peak_memory, peak_memory_bytes
+
+
+def measure(fn):
+    reset_peak_memory()
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, peak_memory_bytes()
+
+
+def report(label, seconds, peak):
+    print(f"{label:<36} {seconds:8.3f}s  pico RSS {peak / 1024 / 1024:8.1f} MB")
+
+
+def write_xlsx(df, path):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Tabela')
+    # Colunas extras que a ingestão ignora, comuns nas planilhas dos fornecedores
+    worksheet.append(list(df.columns) + ['ean', 'ncm', 'observacao'])
+    for row in df.itertuples(index=False):
+        worksheet.append(list(row) + ['7890000000000', '0000.00.00', 'sem observação'])
+    workbook.save(path)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = make_cost_frame(rows)
+    directory = tempfile.mkdtemp()
+    xlsx_path = os.path.join(directory, 'tabela.xlsx')
+    csv_path = os.path.join(directory, 'tabela.csv')
+
+    try:
+        write_xlsx(df, xlsx_path)
+        df.to_csv(csv_path, index=False)
+
+        _, seconds, peak = measure(lambda: pd.read_excel(xlsx_path))
+        report('xlsx: pd.read_excel', seconds, peak)
+        _, seconds, peak = measure(lambda: read_cost_frame(xlsx_path, 'tabela.xlsx', trace_memory=False))
+        report('xlsx: streaming + projeção', seconds, peak)
+
+        _, seconds, peak = measure(lambda: pd.read_csv(csv_path))
+        report('csv: pd.read_csv', seconds, peak)
+        _, seconds, peak = measure(lambda: read_cost_frame(csv_path, 'tabela.csv', trace_memory=False))
+        report('csv: blocos + dtypes', seconds, peak)
+    finally:
+        for path in (xlsx_path, csv_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
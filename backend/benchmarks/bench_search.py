@@ -0,0 +1,79 @@
+"""
+Benchmark: busca de itens com LIKE '%termo%' vs índice FTS5
+
+Uso: python benchmarks/bench_search.py [linhas] [tabelas]
+"""
+
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import or_
+
+from common import (make_app, seed_supplier_and_user, make_cost_frame, timed, report,
+                    db, CostTable, CostItem)
+from services.ingestion import ingest_cost_items
+from services.search import ensure_search_index, search_cost_items
+
+TERMS = ['SKU0000123', 'sintético 4321', 'Bebidas', 'inexistente']
+REPEAT = 5
+
+
+def create_table(supplier, user, rows):
+    cost_table = CostTable(
+        supplier_id=supplier.id, version='v1.0', filename='bench.xlsx',
+        file_path='bench.xlsx', effective_date=date.today(), category='Outros',
+        total_items=rows, submitted_by=user.id
+    )
+    db.session.add(cost_table)
+    db.session.flush()
+    return cost_table
+
+
+def like_page(table_id, term):
+    query = CostItem.query.filter_by(cost_table_id=table_id).filter(
+        or_(CostItem.sku.contains(term), CostItem.description.contains(term))
+    ).order_by(CostItem.sku)
+    return query.paginate(page=1, per_page=50, error_out=False)
+
+
+def fts_page(table_id, term):
+    query = search_cost_items(CostItem.query, CostItem, term, cost_table_id=table_id)
+    return query.order_by(CostItem.sku).paginate(page=1, per_page=50, error_out=False)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    tables = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    per_table = rows // tables
+    df = make_cost_frame(per_table)
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            with db.engine.begin() as connection:
+                ensure_search_index(connection)
+            user, supplier = seed_supplier_and_user()
+
+            def load():
+                for _ in range(tables):
+                    ingest_cost_items(create_table(supplier, user, per_table), df)
+                    db.session.commit()
+                return create_table(supplier, user, 0).id - 1
+
+            table_id, seconds = timed(load)
+            db.session.rollback()
+            report('INSERT em lote com índice FTS5', per_table * tables, seconds)
+
+            # Busca dentro da última tabela carregada, como em /<id>/items
+            for term in TERMS:
+                for label, fn in (('LIKE', like_page), ('FTS5', fts_page)):
+                    page, seconds = timed(lambda: [fn(table_id, term) for _ in range(REPEAT)])
+                    print(f"{label:<5} {term!r:<20} {page[-1].total:>8} resultados  "
+                          f"{seconds / REPEAT * 1000:9.1f} ms/consulta")
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
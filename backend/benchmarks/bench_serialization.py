@@ -0,0 +1,123 @@
+"""
+Benchmark: serialização das listagens com to_dict vs esquemas sobre tuplas
+
+Para tabelas de custo (com fornecedor e usuário), itens e aprovações, mede o
+caminho completo de uma listagem: consulta, montagem dos dicionários e geração
+do JSON. Compara instâncias do ORM + to_dict + json.dumps com as linhas do
+esquema (services/serialization.py) + json.dumps e + orjson (se instalado).
+
+Uso: python benchmarks/bench_serialization.py [linhas]
+"""
+
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+
+from common import make_app, seed_supplier_and_user, make_cost_frame, timed, report, db, CostTable, CostItem, Approval
+from services.ingestion import ingest_cost_items
+from services import serialization
+from services.serialization import APPROVAL_SCHEMA, COST_ITEM_SCHEMA, COST_TABLE_SCHEMA
+
+
+def seed(rows):
+    user, supplier = seed_supplier_and_user()
+    user.set_categories(['Alimentação', 'Bebidas', 'Limpeza'])
+
+    tables = []
+    for index in range(rows):
+        tables.append(CostTable(
+            supplier_id=supplier.id, version=f'v1.{index}', filename=f'bench_{index}.xlsx',
+            file_path='bench.xlsx', effective_date=date.today(), category='Outros',
+            total_items=rows, total_value=1000 + index, monthly_impact=index * 10,
+            submitted_by=user.id, status='under_review'
+        ))
+    db.session.add_all(tables)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.add_all([
+        Approval(cost_table_id=table.id, approver_id=user.id, approval_type='category_buyer',
+                 sequence_order=1, deadline=now + timedelta(hours=index % 72 - 24))
+        for index, table in enumerate(tables)
+    ])
+    ingest_cost_items(tables[0], make_cost_frame(rows))
+    db.session.commit()
+    return tables[0].id
+
+
+def orm_cost_tables():
+    result = []
+    for table in CostTable.query.all():
+        table_dict = table.to_dict()
+        table_dict['supplier'] = table.supplier.to_dict()
+        table_dict['submitter'] = table.submitter.to_dict()
+        result.append(table_dict)
+    return result
+
+
+def schema_cost_tables():
+    rows = db.session.execute(COST_TABLE_SCHEMA.project().select()).all()
+    return COST_TABLE_SCHEMA.attach_relations(COST_TABLE_SCHEMA.serialize(rows))
+
+
+def orm_items(cost_table_id):
+    return [item.to_dict() for item in CostItem.query.filter_by(cost_table_id=cost_table_id)]
+
+
+def schema_items(cost_table_id):
+    projection = COST_ITEM_SCHEMA.project()
+    rows = db.session.execute(projection.select().where(CostItem.cost_table_id == cost_table_id)).all()
+    return projection.serialize(rows)
+
+
+def orm_approvals():
+    return [approval.to_dict() for approval in Approval.query.all()]
+
+
+def schema_approvals():
+    return APPROVAL_SCHEMA.serialize(db.session.execute(APPROVAL_SCHEMA.project().select()).all())
+
+
+def std_dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def run(build, encode, *args):
+    db.session.expire_all()
+    return len(encode(build(*args)))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            cost_table_id = seed(rows)
+
+            encoders = [('json', std_dumps)]
+            if serialization.orjson:
+                encoders.append(('orjson', serialization.dumps))
+            else:
+                print('orjson não instalado: só json da biblioteca padrão')
+
+            cases = [
+                ('Tabelas de custo', orm_cost_tables, schema_cost_tables, ()),
+                ('Itens', orm_items, schema_items, (cost_table_id,)),
+                ('Aprovações', orm_approvals, schema_approvals, ()),
+            ]
+            for label, orm_path, schema_path, args in cases:
+                _, seconds = timed(run, orm_path, std_dumps, *args)
+                report(f'{label}: to_dict + json', rows, seconds)
+                for encoder, dumps in encoders:
+                    _, seconds = timed(run, schema_path, dumps, *args)
+                    report(f'{label}: esquema + {encoder}', rows, seconds)
+    finally:
+        os.remove(db_path)
+        shutil.rmtree(app.config['UPLOAD_FOLDER'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
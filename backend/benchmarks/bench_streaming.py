@@ -0,0 +1,90 @@
+"""
+Benchmark: detalhe da tabela com todos os itens em uma resposta vs em streaming
+
+Mede o pico de memória (tracemalloc) para serializar os itens a partir do
+snapshot: lista completa + json.dumps contra as partes geradas em lotes, e a
+exportação em CSV e XLSX (write-only).
+
+Uso: python benchmarks/bench_streaming.py [linhas]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tracemalloc
+from datetime import date
+
+from common import make_app, seed_supplier_and_user, make_cost_frame, timed, report, db, CostTable
+from services.ingestion import ingest_cost_items
+from services.export import EXPORT_COLUMNS, csv_chunks, iter_row_batches, write_xlsx
+from services.snapshots import get_snapshot
+from services.streaming import cost_table_json_chunks, iter_item_batches, DEFAULT_STREAM_BATCH_SIZE
+
+
+def full_response(table_dict, snapshot):
+    document = dict(table_dict, items=snapshot.to_dicts())
+    return len(json.dumps({'cost_table': document}))
+
+
+def streamed_response(table_dict, snapshot):
+    batches = iter_item_batches(snapshot, DEFAULT_STREAM_BATCH_SIZE)
+    return sum(len(chunk) for chunk in cost_table_json_chunks(table_dict, batches))
+
+
+def csv_export(table_dict, snapshot):
+    batches = iter_row_batches(snapshot, EXPORT_COLUMNS, batch_size=DEFAULT_STREAM_BATCH_SIZE)
+    return sum(len(chunk) for chunk in csv_chunks(EXPORT_COLUMNS, batches))
+
+
+def xlsx_export(table_dict, snapshot):
+    batches = iter_row_batches(snapshot, EXPORT_COLUMNS, batch_size=DEFAULT_STREAM_BATCH_SIZE)
+    path = write_xlsx(EXPORT_COLUMNS, batches)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    try:
+        size, seconds = timed(fn, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, seconds, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    df = make_cost_frame(rows)
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            user, supplier = seed_supplier_and_user()
+            cost_table = CostTable(
+                supplier_id=supplier.id, version='v1.0', filename='bench.xlsx',
+                file_path='bench.xlsx', effective_date=date.today(), category='Outros',
+                total_items=rows, submitted_by=user.id
+            )
+            db.session.add(cost_table)
+            db.session.flush()
+            ingest_cost_items(cost_table, df)
+            db.session.commit()
+
+            snapshot = get_snapshot(cost_table.id)
+            table_dict = cost_table.to_dict()
+
+            for label, fn in (('Resposta completa', full_response), ('Streaming (json)', streamed_response),
+                              ('Exportação CSV', csv_export), ('Exportação XLSX', xlsx_export)):
+                size, seconds, peak = measure(fn, table_dict, snapshot)
+                report(label, rows, seconds)
+                print(f"{'':<40} {size / 1024 / 1024:9.1f} MB enviados  pico de memória {peak / 1024 / 1024:8.1f} MB")
+    finally:
+        os.remove(db_path)
+        shutil.rmtree(app.config['UPLOAD_FOLDER'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Benchmark: validação vetorizada das linhas de uma tabela de custos
+
+Uso: python benchmarks/bench_validation.py [linhas]
+"""
+
+import sys
+
+import numpy as np
+
+from common import make_cost_frame, timed, report
+from services.validation import validate_cost_frame
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    df = make_cost_frame(rows)
+
+    # Problemas espalhados pelo arquivo, como nas planilhas reais
+    df.loc[::997, 'new_cost'] = np.nan
+    df.loc[::1009, 'unit'] = 'BAG'
+    df.loc[::1013, 'sku'] = df.loc[0, 'sku']
+
+    (clean, validation), seconds = timed(validate_cost_frame, df)
+    report('validação (todas as regras)', rows, seconds)
+    _, seconds = timed(validation.to_frame)
+    report('relatório de erros', validation.error_rows + validation.warning_rows, seconds)
+    print(validation.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Utilitários compartilhados pelos benchmarks
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Permitir imports no mesmo estilo de main.py (models.*, routes.*, services.*)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask
+from models.user import db, User
+from models.supplier import Supplier
+from models.cost_table import CostTable, CostItem
+from models.approval import Approval, ApprovalTemplate
+
+
+def make_app(db_path=None):
+    """Cria uma aplicação mínima apontando para um banco SQLite temporário"""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+
+    return app, db_path
+
+
+def seed_supplier_and_user():
+    """Cria o fornecedor e o usuário usados pelas tabelas sintéticas"""
+    user = User(username='bench', email='bench@empresa.com', first_name='Bench',
+                last_name='Mark', role='admin')
+    user.set_password('bench')
+    supplier = Supplier(name='Fornecedor Bench', cnpj='00.000.000/0001-00',
+                        email='fornecedor@bench.com', category='Outros')
+    db.session.add_all([user, supplier])
+    db.session.commit()
+    return user, supplier
+
+
+def make_cost_frame(rows, seed=42):
+    """Gera um DataFrame no formato retornado por read_cost_table_file"""
+    rng = np.random.default_rng(seed)
+    previous_cost = np.round(rng.uniform(1, 500, rows), 4)
+    change = rng.normal(0.03, 0.08, rows)
+    return pd.DataFrame({
+        'sku': [f'SKU{i:08d}' for i in range(rows)],
+        'description': [f'Produto sintético {i}' for i in range(rows)],
+        'category': rng.choice(['Alimentação', 'Bebidas', 'Limpeza', 'Higiene'], rows),
+        'unit': rng.choice(['UN', 'KG', 'L', 'CX'], rows),
+        'previous_cost': previous_cost,
+        'new_cost': np.round(previous_cost * (1 + change), 4),
+        'monthly_volume': np.round(rng.uniform(0, 10000, rows), 2),
+    })
+
+
+def timed(fn, *args, **kwargs):
+    """Executa fn e retorna (resultado, segundos)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(label, rows, seconds):
+    print(f"{label:<40} {rows:>9} linhas  {seconds:8.3f}s  {rows / seconds:12,.0f} linhas/s")
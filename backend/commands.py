@@ -0,0 +1,58 @@
+"""
+Comandos de linha de comando da aplicação (flask --app main <comando>)
+"""
+
+import click
+
+from models.user import db
+from services.migrations import run_migrations, migration_status
+from services.query_plans import check_query_plans
+from services.reporting import rebuild_report_cube
+from services.rollups import rebuild_rollups
+from services.uploads import expire_upload_sessions
+
+
+def register_commands(app):
+    """Registra os comandos na aplicação"""
+
+    @app.cli.command('migrate-db')
+    def migrate_db():
+        """Aplica as migrações pendentes e lista a situação de cada uma"""
+        executed = run_migrations(db.engine)
+        click.echo(f'Migrações aplicadas agora: {len(executed)}')
+        for entry in migration_status(db.engine):
+            applied_at = entry['applied_at'] or 'pendente'
+            click.echo(f"  {entry['version']:>4}  {applied_at:<26}  {entry['name']}")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_dashboard_rollups():
+        """Recalcula os agregados do dashboard e o cubo de relatórios a partir de cost_tables e approvals"""
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+            rebuild_report_cube(connection)
+        click.echo('Agregados do dashboard e cubo de relatórios recalculados')
+
+    @app.cli.command('expire-uploads')
+    @click.option('--ttl-hours', type=int, default=None, help='Horas sem atividade (padrão: UPLOAD_SESSION_TTL_HOURS)')
+    def expire_uploads(ttl_hours):
+        """Expira uploads em partes abandonados e apaga as partes recebidas"""
+        expired = expire_upload_sessions(ttl_hours)
+        click.echo(f'Uploads em partes expirados: {expired}')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', '-v', is_flag=True, help='Mostra o plano de todas as consultas')
+    def check_plans(verbose):
+        """Confere com EXPLAIN QUERY PLAN se as consultas frequentes usam índice"""
+        results = check_query_plans()
+        for result in results:
+            click.echo(f"[{'OK' if result['ok'] else 'FALHA'}] {result['name']}")
+            for problem in result['problems']:
+                click.echo(f'    - {problem}')
+            if verbose or not result['ok']:
+                for detail in result['plan']:
+                    click.echo(f'      {detail}')
+
+        failed = sum(1 for result in results if not result['ok'])
+        click.echo(f'{len(results) - failed}/{len(results)} consultas usando índice')
+        if failed:
+            raise SystemExit(1)
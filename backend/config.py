@@ -20,11 +20,34 @@ class Config:
     DATABASE_PATH = DATABASE_DIR / 'app.db'
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DATABASE_PATH}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))  # Segundos esperando o lock de escrita
     
     # Configurações de upload
     UPLOAD_DIR = BASE_DIR / 'uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB por requisição
     ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    UPLOAD_BUFFER_SIZE = int(os.environ.get('UPLOAD_BUFFER_SIZE', 1024 * 1024))  # 1MB por escrita
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # 8MB por parte (upload em partes)
+    MAX_CHUNKED_UPLOAD_SIZE = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 512 * 1024 * 1024))  # 512MB
+    UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))  # Upload em partes sem atividade expira
+    
+    # Configurações de ingestão
+    INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 5000))  # Linhas por INSERT em lote
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))  # Processos do pool de ingestão
+    INGEST_TRACE_MEMORY = os.environ.get('INGEST_TRACE_MEMORY', '1') == '1'  # Medir pico de memória da leitura
+    BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 50))  # Arquivos por upload em lote
+    PARSED_CACHE_MAX_AGE_DAYS = int(os.environ.get('PARSED_CACHE_MAX_AGE_DAYS', 30))  # Cache do parser e relatórios
+    PARSED_CACHE_MAX_BYTES = int(os.environ.get('PARSED_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB no total
+    
+    # Configurações de respostas em streaming
+    STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 1000))  # Itens serializados por parte
+    
+    # Contagem de consultas por requisição
+    QUERY_COUNT_HEADER = os.environ.get('QUERY_COUNT_HEADER', '1') == '1'  # Cabeçalho X-Query-Count
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', '0') == '1'  # Orçamento excedido vira erro 500
+    
+    # Cache das respostas do dashboard
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))  # Segundos; 0 desativa
     
     # Configurações de servidor
     HOST = '0.0.0.0'
@@ -45,8 +68,23 @@ class Config:
         app.config['SECRET_KEY'] = cls.SECRET_KEY
         app.config['SQLALCHEMY_DATABASE_URI'] = cls.SQLALCHEMY_DATABASE_URI
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = cls.SQLALCHEMY_TRACK_MODIFICATIONS
+        app.config['SQLITE_BUSY_TIMEOUT'] = cls.SQLITE_BUSY_TIMEOUT
         app.config['MAX_CONTENT_LENGTH'] = cls.MAX_CONTENT_LENGTH
         app.config['UPLOAD_FOLDER'] = str(cls.UPLOAD_DIR)
+        app.config['UPLOAD_BUFFER_SIZE'] = cls.UPLOAD_BUFFER_SIZE
+        app.config['UPLOAD_CHUNK_SIZE'] = cls.UPLOAD_CHUNK_SIZE
+        app.config['MAX_CHUNKED_UPLOAD_SIZE'] = cls.MAX_CHUNKED_UPLOAD_SIZE
+        app.config['UPLOAD_SESSION_TTL_HOURS'] = cls.UPLOAD_SESSION_TTL_HOURS
+        app.config['INGEST_CHUNK_SIZE'] = cls.INGEST_CHUNK_SIZE
+        app.config['INGEST_WORKERS'] = cls.INGEST_WORKERS
+        app.config['INGEST_TRACE_MEMORY'] = cls.INGEST_TRACE_MEMORY
+        app.config['BATCH_UPLOAD_MAX_FILES'] = cls.BATCH_UPLOAD_MAX_FILES
+        app.config['PARSED_CACHE_MAX_AGE_DAYS'] = cls.PARSED_CACHE_MAX_AGE_DAYS
+        app.config['PARSED_CACHE_MAX_BYTES'] = cls.PARSED_CACHE_MAX_BYTES
+        app.config['STREAM_BATCH_SIZE'] = cls.STREAM_BATCH_SIZE
+        app.config['QUERY_COUNT_HEADER'] = cls.QUERY_COUNT_HEADER
+        app.config['QUERY_BUDGET_STRICT'] = cls.QUERY_BUDGET_STRICT
+        app.config['DASHBOARD_CACHE_TTL'] = cls.DASHBOARD_CACHE_TTL
 
 class DevelopmentConfig(Config):
     """Configurações para desenvolvimento"""
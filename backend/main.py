@@ -9,20 +9,34 @@ sys.path.insert(0, str(backend_dir))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 
+from config import Config
+
 # Imports dos modelos (sem src.)
 from models.user import db, User
 from models.supplier import Supplier
 from models.cost_table import CostTable, CostItem
 from models.approval import Approval, ApprovalTemplate
+from models.ingestion_job import IngestionJob
+from models.upload_session import UploadSession
 
 # Imports das rotas (sem src.)
 from routes.user import user_bp
 from routes.auth import auth_bp
 from routes.supplier import supplier_bp
 from routes.cost_table import cost_table_bp
+from routes.upload import upload_bp
 from routes.approval import approval_bp
 from routes.dashboard import dashboard_bp
 
+from services.cache import init_cache
+from services.database import init_database
+from services.jobs import resume_pending_jobs
+from services.migrations import run_migrations
+from services.query_counter import init_query_counter
+from services.uploads import UploadRequest
+
+from commands import register_commands
+
 def create_app():
     """Factory function para criar a aplicação Flask"""
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -32,8 +46,39 @@ def create_app():
     CORS(app, origins=['*'])
 
     # Configuração de upload de arquivos
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH  # Limite por requisição
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+    app.config['UPLOAD_BUFFER_SIZE'] = Config.UPLOAD_BUFFER_SIZE
+
+    # Arquivos maiores que o limite por requisição são enviados em partes
+    app.config['UPLOAD_CHUNK_SIZE'] = min(Config.UPLOAD_CHUNK_SIZE, Config.MAX_CONTENT_LENGTH)
+    app.config['MAX_CHUNKED_UPLOAD_SIZE'] = Config.MAX_CHUNKED_UPLOAD_SIZE
+    app.config['UPLOAD_SESSION_TTL_HOURS'] = Config.UPLOAD_SESSION_TTL_HOURS  # Limpeza: flask expire-uploads
+
+    # Arquivos enviados são gravados e têm o hash calculado durante o recebimento
+    app.request_class = UploadRequest
+
+    # Configuração de ingestão em lote
+    app.config['INGEST_CHUNK_SIZE'] = Config.INGEST_CHUNK_SIZE
+    app.config['INGEST_WORKERS'] = Config.INGEST_WORKERS
+    app.config['INGEST_TRACE_MEMORY'] = Config.INGEST_TRACE_MEMORY
+    app.config['BATCH_UPLOAD_MAX_FILES'] = Config.BATCH_UPLOAD_MAX_FILES
+
+    # Limites do cache do parser e dos relatórios de validação (idade e tamanho total)
+    app.config['PARSED_CACHE_MAX_AGE_DAYS'] = Config.PARSED_CACHE_MAX_AGE_DAYS
+    app.config['PARSED_CACHE_MAX_BYTES'] = Config.PARSED_CACHE_MAX_BYTES
+
+    # Respostas em streaming (itens por parte)
+    app.config['STREAM_BATCH_SIZE'] = Config.STREAM_BATCH_SIZE
+
+    # Contagem de consultas por requisição (X-Query-Count e orçamento das listagens)
+    app.config['QUERY_COUNT_HEADER'] = Config.QUERY_COUNT_HEADER
+    app.config['QUERY_BUDGET_STRICT'] = Config.QUERY_BUDGET_STRICT
+    init_query_counter(app)
+
+    # Cache do dashboard (TTL e invalidação a cada commit em tabelas de custo e aprovações)
+    app.config['DASHBOARD_CACHE_TTL'] = Config.DASHBOARD_CACHE_TTL
+    init_cache(app)
 
     # Criar pastas necessárias
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -44,6 +89,7 @@ def create_app():
     app.register_blueprint(user_bp, url_prefix='/api/users')
     app.register_blueprint(supplier_bp, url_prefix='/api/suppliers')
     app.register_blueprint(cost_table_bp, url_prefix='/api/cost-tables')
+    app.register_blueprint(upload_bp, url_prefix='/api/cost-tables/uploads')
     app.register_blueprint(approval_bp, url_prefix='/api/approvals')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
 
@@ -52,11 +98,19 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # WAL e espera pelo lock: web e processos de ingestão gravam no mesmo arquivo
+    app.config['SQLITE_BUSY_TIMEOUT'] = Config.SQLITE_BUSY_TIMEOUT
+    init_database(app)
+    
     db.init_app(app)
 
     with app.app_context():
         db.create_all()
         
+        # create_all não altera tabelas existentes; colunas, índices e busca
+        # textual de bancos já em uso vêm das migrações pendentes
+        run_migrations(db.engine)
+        
         # Criar usuário admin padrão se não existir
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -76,6 +130,12 @@ def create_app():
             db.session.commit()
             print("Usuário admin criado com sucesso!")
 
+    # Retomar jobs de ingestão interrompidos
+    resume_pending_jobs(app)
+
+    # Comandos de linha de comando (migrate-db, check-query-plans)
+    register_commands(app)
+
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve(path):
@@ -4,6 +4,15 @@ from .user import db
 
 class Approval(db.Model):
     __tablename__ = 'approvals'
+    __table_args__ = (
+        # Aprovações pendentes do aprovador ou do delegado, por prazo
+        db.Index('ix_approvals_approver_status_deadline', 'approver_id', 'status', 'deadline'),
+        db.Index('ix_approvals_delegated_status', 'delegated_to', 'status'),
+        # Aprovações em atraso
+        db.Index('ix_approvals_status_deadline', 'status', 'deadline'),
+        # Fluxo de aprovação da tabela, na ordem da sequência
+        db.Index('ix_approvals_cost_table_sequence', 'cost_table_id', 'sequence_order'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cost_table_id = db.Column(db.Integer, db.ForeignKey('cost_tables.id'), nullable=False)
@@ -59,6 +68,20 @@ class Approval(db.Model):
             days = days_map.get(self.approval_type, 3)
             self.deadline = datetime.utcnow() + timedelta(days=days)
     
+    @staticmethod
+    def pending_for(user_id):
+        """Filtro das aprovações pendentes do usuário, como aprovador ou delegado
+        
+        `status || ''` impede de propósito o uso do índice (status, deadline): sem
+        ele o SQLite pode percorrer todas as aprovações pendentes do sistema; assim
+        parte dos índices de approver_id e delegated_to (MULTI-INDEX OR). O plano é
+        conferido em services/query_plans.py (flask check-query-plans).
+        """
+        return db.and_(
+            db.or_(Approval.approver_id == user_id, Approval.delegated_to == user_id),
+            (Approval.status + '') == 'pending'
+        )
+    
     @property
     def days_remaining(self):
         if self.deadline:
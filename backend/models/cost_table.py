@@ -5,6 +5,16 @@ import json
 
 class CostTable(db.Model):
     __tablename__ = 'cost_tables'
+    __table_args__ = (
+        # Deduplicação de uploads pelo hash do arquivo
+        db.Index('ix_cost_tables_file_hash_supplier', 'file_hash', 'supplier_id'),
+        # Tabelas do fornecedor por status (última aprovada, listagens filtradas)
+        db.Index('ix_cost_tables_supplier_status_created', 'supplier_id', 'status', 'created_at'),
+        # Contagens por status no dashboard (ex.: aprovadas no mês)
+        db.Index('ix_cost_tables_status_updated', 'status', 'updated_at'),
+        # Listagem geral, da mais recente para a mais antiga
+        db.Index('ix_cost_tables_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False)
@@ -47,6 +57,9 @@ class CostTable(db.Model):
     comments = db.Column(db.Text)
     rejection_reason = db.Column(db.Text)
     
+    # Comparação dos SKUs com a última tabela aprovada (JSON)
+    sku_comparison = db.Column(db.Text)
+    
     # Dados de auditoria
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -60,6 +73,14 @@ class CostTable(db.Model):
         if not self.deadline:
             self.deadline = datetime.utcnow() + timedelta(days=30)
     
+    def get_sku_comparison(self):
+        """Retorna a comparação de SKUs como dicionário"""
+        return json.loads(self.sku_comparison) if self.sku_comparison else None
+    
+    def set_sku_comparison(self, comparison):
+        """Define a comparação de SKUs"""
+        self.sku_comparison = json.dumps(comparison) if comparison is not None else None
+    
     @property
     def days_remaining(self):
         if self.deadline:
@@ -112,6 +133,7 @@ class CostTable(db.Model):
             'is_overdue': self.is_overdue,
             'comments': self.comments,
             'rejection_reason': self.rejection_reason,
+            'sku_comparison': self.get_sku_comparison(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'approval_level_required': self.calculate_approval_level_required()
@@ -123,6 +145,10 @@ class CostTable(db.Model):
 
 class CostItem(db.Model):
     __tablename__ = 'cost_items'
+    __table_args__ = (
+        # Itens da tabela (cost_table_id) e cruzamento por SKU com a tabela aprovada anterior
+        db.Index('ix_cost_items_table_sku', 'cost_table_id', 'sku'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cost_table_id = db.Column(db.Integer, db.ForeignKey('cost_tables.id'), nullable=False)
@@ -0,0 +1,109 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from .user import db
+import json
+
+class IngestionJob(db.Model):
+    """Job de ingestão em segundo plano de um arquivo de tabela de custos"""
+    __tablename__ = 'ingestion_jobs'
+    __table_args__ = (
+        # Job que gerou a tabela e jobs em andamento com o mesmo arquivo
+        db.Index('ix_ingestion_jobs_cost_table', 'cost_table_id'),
+        db.Index('ix_ingestion_jobs_file_hash_supplier', 'file_hash', 'supplier_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Estado do job
+    state = db.Column(db.String(20), default='queued', nullable=False)
+    # queued, running, completed, failed
+    phase = db.Column(db.String(20))  # parsing, parsed (aguardando o gravador), persisting
+
+    # Arquivo recebido
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    file_size = db.Column(db.Integer)
+    file_hash = db.Column(db.String(64))
+    sheet_name = db.Column(db.String(100))  # Planilha a ler (padrão: a primeira)
+
+    # Dados do formulário de upload
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    effective_date = db.Column(db.Date, nullable=False)
+    comments = db.Column(db.Text)
+    submitted_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    # Resultado
+    cost_table_id = db.Column(db.Integer, db.ForeignKey('cost_tables.id'))
+    rows_total = db.Column(db.Integer, default=0)
+    rows_processed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    validation_summary = db.Column(db.Text)  # Contagens da validação das linhas (JSON)
+
+    # Tempos
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    parse_seconds = db.Column(db.Float)
+    persist_seconds = db.Column(db.Float)
+    read_seconds = db.Column(db.Float)  # Leitura do arquivo, parte de parse_seconds
+    peak_memory_bytes = db.Column(db.BigInteger)  # Pico de memória durante a leitura
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def is_finished(self):
+        return self.state in ('completed', 'failed')
+
+    @property
+    def queued_seconds(self):
+        if self.started_at and self.created_at:
+            return (self.started_at - self.created_at).total_seconds()
+        return None
+
+    @property
+    def total_seconds(self):
+        if self.finished_at and self.created_at:
+            return (self.finished_at - self.created_at).total_seconds()
+        return None
+
+    def get_validation_summary(self):
+        """Retorna o resumo da validação como dicionário"""
+        return json.loads(self.validation_summary) if self.validation_summary else None
+
+    def set_validation_summary(self, summary):
+        """Define o resumo da validação"""
+        self.validation_summary = json.dumps(summary) if summary is not None else None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'phase': self.phase,
+            'filename': self.filename,
+            'file_size': self.file_size,
+            'sheet_name': self.sheet_name,
+            'supplier_id': self.supplier_id,
+            'category': self.category,
+            'effective_date': self.effective_date.isoformat() if self.effective_date else None,
+            'submitted_by': self.submitted_by,
+            'cost_table_id': self.cost_table_id,
+            'rows_total': self.rows_total or 0,
+            'rows_processed': self.rows_processed or 0,
+            'error': self.error,
+            'validation': self.get_validation_summary(),
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'timing': {
+                'queued_seconds': self.queued_seconds,
+                'parse_seconds': self.parse_seconds,
+                'read_seconds': self.read_seconds,
+                'persist_seconds': self.persist_seconds,
+                'total_seconds': self.total_seconds
+            },
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<IngestionJob {self.id} - {self.state}>'
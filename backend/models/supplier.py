@@ -4,6 +4,10 @@ from .user import db
 
 class Supplier(db.Model):
     __tablename__ = 'suppliers'
+    __table_args__ = (
+        # Fornecedor vinculado ao usuário (mesmo email)
+        db.Index('ix_suppliers_email', 'email'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -19,6 +23,13 @@ class Supplier(db.Model):
     # Relacionamentos
     cost_tables = db.relationship('CostTable', backref='supplier', lazy=True, cascade='all, delete-orphan')
     
+    def link_users(self):
+        """Vincula ao fornecedor os usuários fornecedores com o mesmo email ainda sem vínculo"""
+        from .user import User
+        User.query.filter_by(role='supplier', email=self.email, supplier_id=None).update(
+            {'supplier_id': self.id}, synchronize_session='fetch'
+        )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,69 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+import json
+from .user import db
+
+class UploadSession(db.Model):
+    """Upload em partes (retomável) de um arquivo de tabela de custos"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)  # Token opaco (uuid4 hex)
+
+    # Arquivo esperado
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    total_chunks = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # Hash do arquivo completo informado pelo cliente (opcional)
+
+    # Metadados do upload, repassados ao pipeline na conclusão (JSON)
+    upload_metadata = db.Column(db.Text, nullable=False)
+
+    # Estado
+    state = db.Column(db.String(20), default='open', nullable=False)
+    # open, completing, completed, aborted, expired
+    job_id = db.Column(db.Integer, db.ForeignKey('ingestion_jobs.id'))
+
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_metadata(self):
+        """Retorna os metadados do upload como dicionário"""
+        return json.loads(self.upload_metadata) if self.upload_metadata else {}
+
+    def set_metadata(self, metadata):
+        """Define os metadados do upload"""
+        self.upload_metadata = json.dumps(metadata)
+
+    def chunk_length(self, index):
+        """Tamanho esperado da parte `index` (a última pode ser menor)"""
+        if index == self.total_chunks - 1:
+            return self.total_size - self.chunk_size * (self.total_chunks - 1)
+        return self.chunk_size
+
+    def to_dict(self, received_chunks=None):
+        data = {
+            'id': self.id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': self.total_chunks,
+            'sha256': self.sha256,
+            'metadata': self.get_metadata(),
+            'state': self.state,
+            'job_id': self.job_id,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+        if received_chunks is not None:
+            received = sorted(received_chunks)
+            data['received_chunks'] = received
+            data['missing_chunks'] = sorted(set(range(self.total_chunks)) - set(received))
+
+        return data
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} - {self.state}>'
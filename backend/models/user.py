@@ -4,6 +4,18 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+# Nome de cada role em português
+ROLE_NAMES = {
+    'supplier': 'Fornecedor',
+    'category_buyer': 'Comprador de Categoria',
+    'pricing_analyst': 'Analista de Pricing',
+    'commercial_manager': 'Gerente Comercial',
+    'commercial_director': 'Diretor Comercial',
+    'pricing_director': 'Diretor de Pricing',
+    'vp_commercial': 'Vice Presidente Comercial',
+    'admin': 'Administrador'
+}
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -25,6 +37,9 @@ class User(db.Model):
     department = db.Column(db.String(100))
     manager_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     
+    # Fornecedor vinculado (usuários com role supplier)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), index=True)
+    
     # Configurações de aprovação
     approval_limit = db.Column(db.Numeric(15, 2), default=0)  # Limite de aprovação em valor
     can_delegate = db.Column(db.Boolean, default=False)
@@ -77,17 +92,15 @@ class User(db.Model):
     
     def get_role_display(self):
         """Retorna o nome do role em português"""
-        role_names = {
-            'supplier': 'Fornecedor',
-            'category_buyer': 'Comprador de Categoria',
-            'pricing_analyst': 'Analista de Pricing',
-            'commercial_manager': 'Gerente Comercial',
-            'commercial_director': 'Diretor Comercial',
-            'pricing_director': 'Diretor de Pricing',
-            'vp_commercial': 'Vice Presidente Comercial',
-            'admin': 'Administrador'
-        }
-        return role_names.get(self.role, self.role)
+        return ROLE_NAMES.get(self.role, self.role)
+    
+    def link_supplier(self):
+        """Vincula o usuário fornecedor ao fornecedor com o mesmo email, se ainda não vinculado"""
+        from models.supplier import Supplier
+        if self.role == 'supplier' and self.supplier_id is None:
+            supplier = Supplier.query.filter_by(email=self.email).order_by(Supplier.id).first()
+            if supplier:
+                self.supplier_id = supplier.id
     
     def update_last_login(self):
         """Atualiza o timestamp do último login"""
@@ -107,6 +120,7 @@ class User(db.Model):
             'role_display': self.get_role_display(),
             'department': self.department,
             'manager_id': self.manager_id,
+            'supplier_id': self.supplier_id,
             'approval_limit': float(self.approval_limit) if self.approval_limit else 0,
             'can_delegate': self.can_delegate,
             'categories': self.get_categories(),
@@ -1,9 +1,13 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy.orm import joinedload
 from models.approval import Approval, ApprovalTemplate
 from models.cost_table import CostTable
 from models.user import User, db
 from routes.auth import login_required, role_required
-from datetime import datetime
+from services.pagination import InvalidCursor, cursor_args, keyset_paginate, wants_cursor
+from services.query_counter import query_budget
+from services.serialization import APPROVAL_SCHEMA, COST_TABLE_SCHEMA, FieldError, json_response
+from datetime import datetime, timedelta
 
 approval_bp = Blueprint('approval', __name__)
 
@@ -79,46 +83,80 @@ def create_approval_workflow(cost_table):
         db.session.rollback()
         return False, str(e)
 
+def with_details(query):
+    """Carrega tabela, fornecedor e aprovador na mesma consulta das aprovações"""
+    return query.options(
+        joinedload(Approval.cost_table).joinedload(CostTable.supplier),
+        joinedload(Approval.approver)
+    )
+
+def approval_details(approval):
+    """Aprovação com a tabela de custo, o fornecedor e o aprovador"""
+    approval_dict = approval.to_dict()
+    approval_dict['cost_table'] = approval.cost_table.to_dict()
+    approval_dict['cost_table']['supplier'] = approval.cost_table.supplier.to_dict()
+    approval_dict['approver'] = approval.approver.to_dict()
+    return approval_dict
+
+# Colunas da chave de paginação por prazo, sempre selecionadas
+DEADLINE_KEY = ['deadline', 'id']
+
+def approval_rows(fields):
+    """Consulta só com as colunas dos campos pedidos das aprovações"""
+    return APPROVAL_SCHEMA.query(fields, extra=DEADLINE_KEY)
+
+def serialize_approvals(rows, fields):
+    """Aprovações no formato de approval_details, a partir das linhas (uma consulta por relação)"""
+    now = datetime.utcnow()
+    result = APPROVAL_SCHEMA.serialize(rows, fields, extra=DEADLINE_KEY, now=now)
+    APPROVAL_SCHEMA.attach_relations(result, fields, now)
+    if 'cost_table' in APPROVAL_SCHEMA.relations_for(fields):
+        cost_tables = [item['cost_table'] for item in result if item['cost_table']]
+        COST_TABLE_SCHEMA.attach_relations(cost_tables, ['supplier'], now)
+    return result
+
+def paginate_by_deadline(query, page, per_page):
+    """Pagina aprovações por prazo: por cursor (deadline + id) se pedido, senão por página"""
+    if wants_cursor(request.args):
+        keyset = keyset_paginate(query, [Approval.deadline, Approval.id], **cursor_args(request.args, per_page))
+        return keyset.items, keyset.to_dict()
+    
+    approvals = query.order_by(Approval.deadline.asc()).paginate(
+        page=page,
+        per_page=per_page,
+        error_out=False
+    )
+    return approvals.items, {
+        'total': approvals.total,
+        'pages': approvals.pages,
+        'current_page': page,
+        'per_page': per_page
+    }
+
 @approval_bp.route('/pending', methods=['GET'])
 @login_required
+@query_budget(5)
 def get_pending_approvals():
-    """Listar aprovações pendentes para o usuário logado"""
+    """Listar aprovações pendentes para o usuário logado (?fields= limita os campos)"""
     try:
         user_id = session['user_id']
-        user = User.query.get(user_id)
         
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        fields = APPROVAL_SCHEMA.parse_fields(request.args.get('fields', ''))
         
         # Buscar aprovações pendentes
-        query = Approval.query.filter(
-            (Approval.approver_id == user_id) | (Approval.delegated_to == user_id),
-            Approval.status == 'pending'
-        ).order_by(Approval.deadline.asc())
-        
-        approvals = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        query = approval_rows(fields).filter(Approval.pending_for(user_id))
+        
+        rows, pagination = paginate_by_deadline(query, page, per_page)
         
         # Incluir dados da tabela de custo
-        result = []
-        for approval in approvals.items:
-            approval_dict = approval.to_dict()
-            approval_dict['cost_table'] = approval.cost_table.to_dict()
-            approval_dict['cost_table']['supplier'] = approval.cost_table.supplier.to_dict()
-            approval_dict['approver'] = approval.approver.to_dict()
-            result.append(approval_dict)
+        result = serialize_approvals(rows, fields)
         
-        return jsonify({
-            'approvals': result,
-            'total': approvals.total,
-            'pages': approvals.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return json_response(dict(pagination, approvals=result))
         
+    except (InvalidCursor, FieldError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -306,12 +344,16 @@ def start_approval_workflow(table_id):
 
 @approval_bp.route('/cost-table/<int:table_id>/workflow', methods=['GET'])
 @login_required
+@query_budget(3)
 def get_approval_workflow(table_id):
     """Obter fluxo de aprovação de uma tabela de custos"""
     try:
         cost_table = CostTable.query.get_or_404(table_id)
         
-        approvals = Approval.query.filter_by(
+        approvals = Approval.query.options(
+            joinedload(Approval.approver),
+            joinedload(Approval.delegated_user)
+        ).filter_by(
             cost_table_id=table_id
         ).order_by(Approval.sequence_order).all()
         
@@ -333,62 +375,47 @@ def get_approval_workflow(table_id):
 
 @approval_bp.route('/overdue', methods=['GET'])
 @role_required(['admin', 'commercial_manager', 'commercial_director', 'vp_commercial'])
+@query_budget(6)
 def get_overdue_approvals():
-    """Listar aprovações em atraso"""
+    """Listar aprovações em atraso (?fields= limita os campos)"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        fields = APPROVAL_SCHEMA.parse_fields(request.args.get('fields', ''))
         
         # Buscar aprovações em atraso
-        query = Approval.query.filter(
+        query = approval_rows(fields).filter(
             Approval.status == 'pending',
             Approval.deadline < datetime.utcnow()
-        ).order_by(Approval.deadline.asc())
-        
-        approvals = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
         )
         
+        rows, pagination = paginate_by_deadline(query, page, per_page)
+        
         # Incluir dados completos
-        result = []
-        for approval in approvals.items:
-            approval_dict = approval.to_dict()
-            approval_dict['cost_table'] = approval.cost_table.to_dict()
-            approval_dict['cost_table']['supplier'] = approval.cost_table.supplier.to_dict()
-            approval_dict['approver'] = approval.approver.to_dict()
-            result.append(approval_dict)
+        result = serialize_approvals(rows, fields)
         
-        return jsonify({
-            'overdue_approvals': result,
-            'total': approvals.total,
-            'pages': approvals.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return json_response(dict(pagination, overdue_approvals=result))
         
+    except (InvalidCursor, FieldError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @approval_bp.route('/reminders', methods=['GET'])
 @role_required(['admin'])
+@query_budget(2)
 def get_reminder_candidates():
     """Listar aprovações que precisam de lembrete"""
     try:
-        # Buscar aprovações que precisam de lembrete
-        approvals = Approval.query.filter(
-            Approval.status == 'pending'
-        ).all()
+        # Buscar aprovações que precisam de lembrete (prazo nas próximas 24h ou vencido)
+        approvals = with_details(Approval.query.filter(
+            Approval.status == 'pending',
+            Approval.deadline <= datetime.utcnow() + timedelta(hours=24)
+        )).all()
         
-        reminder_candidates = []
-        for approval in approvals:
-            if approval.needs_reminder:
-                approval_dict = approval.to_dict()
-                approval_dict['cost_table'] = approval.cost_table.to_dict()
-                approval_dict['cost_table']['supplier'] = approval.cost_table.supplier.to_dict()
-                approval_dict['approver'] = approval.approver.to_dict()
-                reminder_candidates.append(approval_dict)
+        reminder_candidates = [
+            approval_details(approval) for approval in approvals if approval.needs_reminder
+        ]
         
         return jsonify({
             'reminder_candidates': reminder_candidates,
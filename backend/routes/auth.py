@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from models.user import User, db
+from models.supplier import Supplier
 from functools import wraps
+from services.identity import current_identity
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -21,8 +23,9 @@ def role_required(roles):
             if 'user_id' not in session:
                 return jsonify({'error': 'Login necessário'}), 401
             
-            user = User.query.get(session['user_id'])
-            if not user or user.role not in roles:
+            # Identidade fica em g para o resto da requisição
+            identity = current_identity()
+            if not identity or not identity.has_role(roles):
                 return jsonify({'error': 'Acesso negado'}), 403
             
             return f(*args, **kwargs)
@@ -78,11 +81,11 @@ def logout():
 def get_current_user():
     """Endpoint para obter dados do usuário logado"""
     try:
-        user = User.query.get(session['user_id'])
-        if not user:
+        identity = current_identity()
+        if not identity:
             return jsonify({'error': 'Usuário não encontrado'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': identity.user.to_dict()}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -98,9 +101,10 @@ def change_password():
         if not current_password or not new_password:
             return jsonify({'error': 'Senha atual e nova senha são obrigatórias'}), 400
         
-        user = User.query.get(session['user_id'])
-        if not user:
+        identity = current_identity()
+        if not identity:
             return jsonify({'error': 'Usuário não encontrado'}), 404
+        user = identity.user
         
         if not user.check_password(current_password):
             return jsonify({'error': 'Senha atual incorreta'}), 400
@@ -144,6 +148,13 @@ def register():
         if data['role'] not in valid_roles:
             return jsonify({'error': 'Role inválido'}), 400
         
+        # Vínculo com fornecedor só para usuários fornecedores, com fornecedor existente
+        if data.get('supplier_id') is not None:
+            if data['role'] != 'supplier':
+                return jsonify({'error': 'supplier_id só é permitido para usuários com role supplier'}), 400
+            if not db.session.get(Supplier, data['supplier_id']):
+                return jsonify({'error': 'Fornecedor não encontrado'}), 400
+        
         # Criar novo usuário
         user = User(
             username=data['username'],
@@ -154,6 +165,7 @@ def register():
             role=data['role'],
             department=data.get('department'),
             manager_id=data.get('manager_id'),
+            supplier_id=data.get('supplier_id'),
             approval_limit=data.get('approval_limit', 0),
             can_delegate=data.get('can_delegate', False),
             is_active=data.get('is_active', True),
@@ -166,6 +178,9 @@ def register():
         if data.get('categories'):
             user.set_categories(data['categories'])
         
+        # Sem supplier_id, fornecedores são vinculados pelo email
+        user.link_supplier()
+        
         db.session.add(user)
         db.session.commit()
         
@@ -1,13 +1,30 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, Response, request, jsonify, session, current_app, send_file, url_for
 from werkzeug.utils import secure_filename
 import os
-import hashlib
-import pandas as pd
+import json
+import math
 from datetime import datetime
 from models.cost_table import CostTable, CostItem
 from models.supplier import Supplier
-from models.user import User, db
+from models.user import db
+from models.ingestion_job import IngestionJob
 from routes.auth import login_required, role_required
+from services.analysis import DEFAULT_TOP_N, get_analysis, limit_top
+from services.dedupe import find_duplicate, clone_cost_table, validation_report_path
+from services.export import (EXPORT_MIMETYPES, ExportError, csv_chunks, export_columns, file_chunks,
+                             iter_row_batches, search_positions, write_xlsx)
+from services.identity import current_identity
+from services.jobs import submit_job
+from services.pagination import (InvalidCursor, KeysetPage, cursor_args, decode_cursor, encode_cursor,
+                                 keyset_paginate, wants_cursor)
+from services.query_counter import query_budget
+from services.search import search_cost_items
+from services.serialization import COST_ITEM_SCHEMA, COST_TABLE_SCHEMA, FieldError, json_response
+from services.sku_matching import compare_skus
+from services.snapshots import get_snapshot, write_snapshot
+from services.streaming import (NDJSON_MIMETYPE, STREAM_FORMATS, cost_table_json_chunks,
+                                cost_table_ndjson_chunks, iter_item_batches, stream_format)
+from services.uploads import store_upload
 
 cost_table_bp = Blueprint('cost_table', __name__)
 
@@ -16,70 +33,28 @@ ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def calculate_file_hash(file_path):
-    """Calcula hash SHA256 do arquivo"""
-    hash_sha256 = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
-
-def parse_cost_table_file(file_path, filename):
-    """Processa arquivo de tabela de custos"""
-    try:
-        # Determinar tipo de arquivo e ler
-        if filename.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.read_excel(file_path)
-        
-        # Validar colunas obrigatórias
-        required_columns = ['sku', 'description', 'new_cost']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return None, f"Colunas obrigatórias ausentes: {', '.join(missing_columns)}"
-        
-        # Limpar e validar dados
-        df = df.dropna(subset=['sku', 'new_cost'])
-        df['sku'] = df['sku'].astype(str)
-        df['description'] = df['description'].fillna('')
-        df['category'] = df.get('category', '').fillna('')
-        df['unit'] = df.get('unit', 'UN').fillna('UN')
-        df['previous_cost'] = pd.to_numeric(df.get('previous_cost', 0), errors='coerce').fillna(0)
-        df['new_cost'] = pd.to_numeric(df['new_cost'], errors='coerce')
-        df['monthly_volume'] = pd.to_numeric(df.get('monthly_volume', 0), errors='coerce').fillna(0)
-        
-        # Remover linhas com new_cost inválido
-        df = df.dropna(subset=['new_cost'])
-        
-        if len(df) == 0:
-            return None, "Nenhum item válido encontrado no arquivo"
-        
-        return df, None
-        
-    except Exception as e:
-        return None, f"Erro ao processar arquivo: {str(e)}"
-
 @cost_table_bp.route('/', methods=['GET'])
 @login_required
+@query_budget(5)
 def get_cost_tables():
-    """Listar tabelas de custo"""
+    """Listar tabelas de custo (?fields= limita os campos de cada tabela)"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status', '')
         supplier_id = request.args.get('supplier_id', type=int)
         category = request.args.get('category', '')
+        fields = COST_TABLE_SCHEMA.parse_fields(request.args.get('fields', ''))
         
-        query = CostTable.query
+        # Só as colunas dos campos pedidos (created_at e id também servem de cursor)
+        query = COST_TABLE_SCHEMA.query(fields, extra=['created_at', 'id'])
         
         # Filtros baseados no role do usuário
-        user = User.query.get(session['user_id'])
-        if user.role == 'supplier':
+        identity = current_identity()
+        if identity.is_supplier:
             # Fornecedores só veem suas próprias tabelas
-            supplier = Supplier.query.filter_by(email=user.email).first()
-            if supplier:
-                query = query.filter(CostTable.supplier_id == supplier.id)
+            if identity.supplier_id:
+                query = query.filter(CostTable.supplier_id == identity.supplier_id)
             else:
                 return jsonify({'cost_tables': [], 'total': 0}), 200
         
@@ -93,61 +68,207 @@ def get_cost_tables():
         if category:
             query = query.filter(CostTable.category == category)
         
-        # Ordenação
-        query = query.order_by(CostTable.created_at.desc())
-        
-        # Paginação
-        cost_tables = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        # Incluir dados do fornecedor
-        result = []
-        for table in cost_tables.items:
-            table_dict = table.to_dict()
-            table_dict['supplier'] = table.supplier.to_dict()
-            table_dict['submitter'] = table.submitter.to_dict()
-            result.append(table_dict)
-        
-        return jsonify({
-            'cost_tables': result,
-            'total': cost_tables.total,
-            'pages': cost_tables.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
-        
+        if wants_cursor(request.args):
+            # Paginação por cursor (created_at + id), sem OFFSET
+            keyset = keyset_paginate(query, [CostTable.created_at, CostTable.id], descending=True,
+                                     **cursor_args(request.args, per_page))
+            rows = keyset.items
+            pagination = keyset.to_dict()
+        else:
+            # Ordenação
+            query = query.order_by(CostTable.created_at.desc())
+            
+            # Paginação
+            cost_tables = query.paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+            rows = cost_tables.items
+            pagination = {
+                'total': cost_tables.total,
+                'pages': cost_tables.pages,
+                'current_page': page,
+                'per_page': per_page
+            }
+        
+        # Fornecedor e usuário que enviou: uma consulta para cada, pelos ids da página
+        now = datetime.utcnow()
+        result = COST_TABLE_SCHEMA.serialize(rows, fields, extra=['created_at', 'id'], now=now)
+        COST_TABLE_SCHEMA.attach_relations(result, fields, now)
+        
+        return json_response(dict(pagination, cost_tables=result))
+        
+    except (InvalidCursor, FieldError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @cost_table_bp.route('/<int:table_id>', methods=['GET'])
 @login_required
 def get_cost_table(table_id):
-    """Obter dados de uma tabela de custo específica"""
+    """Obter dados de uma tabela de custo específica
+    
+    Com ?stream=json (ou ndjson) os itens são enviados em partes, sem montar a
+    lista completa em memória.
+    """
     try:
         cost_table = CostTable.query.get_or_404(table_id)
         
         # Verificar permissão
-        user = User.query.get(session['user_id'])
-        if user.role == 'supplier':
-            supplier = Supplier.query.filter_by(email=user.email).first()
-            if not supplier or cost_table.supplier_id != supplier.id:
-                return jsonify({'error': 'Acesso negado'}), 403
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        mode = stream_format(request)
+        if mode == 'invalid':
+            return jsonify({'error': f"stream deve ser {' ou '.join(STREAM_FORMATS)}"}), 400
         
-        # Incluir itens da tabela
         table_dict = cost_table.to_dict()
         table_dict['supplier'] = cost_table.supplier.to_dict()
         table_dict['submitter'] = cost_table.submitter.to_dict()
-        table_dict['items'] = [item.to_dict() for item in cost_table.cost_items]
         table_dict['approvals'] = [approval.to_dict() for approval in cost_table.approvals]
+        snapshot = get_snapshot(table_id)
+        
+        # Itens em lotes lidos do snapshot (memória constante por requisição)
+        if mode:
+            batches = iter_item_batches(snapshot, current_app.config['STREAM_BATCH_SIZE'])
+            if mode == 'ndjson':
+                return Response(cost_table_ndjson_chunks(table_dict, batches), mimetype=NDJSON_MIMETYPE)
+            return Response(cost_table_json_chunks(table_dict, batches), mimetype='application/json')
+        
+        # Incluir itens da tabela
+        table_dict['items'] = snapshot.to_dicts()
         
         return jsonify({'cost_table': table_dict}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def validate_upload_metadata(values):
+    """Valida os metadados de um upload (form ou JSON); retorna (metadata, (resposta, status))"""
+    supplier_id = values.get('supplier_id')
+    category = values.get('category')
+    effective_date = values.get('effective_date')
+    on_duplicate = values.get('on_duplicate') or 'reject'  # reject, clone
+    
+    if on_duplicate not in ('reject', 'clone'):
+        return None, (jsonify({'error': 'on_duplicate deve ser reject ou clone'}), 400)
+    
+    try:
+        supplier_id = int(supplier_id) if supplier_id else None
+    except (TypeError, ValueError):
+        supplier_id = None
+    
+    if not supplier_id or not category or not effective_date:
+        return None, (jsonify({'error': 'Campos obrigatórios: supplier_id, category, effective_date'}), 400)
+    
+    try:
+        effective_date = datetime.strptime(effective_date, '%Y-%m-%d').date()
+    except ValueError:
+        return None, (jsonify({'error': 'effective_date deve estar no formato AAAA-MM-DD'}), 400)
+    
+    # Verificar se fornecedor existe
+    supplier = Supplier.query.get(supplier_id)
+    if not supplier:
+        return None, (jsonify({'error': 'Fornecedor não encontrado'}), 404)
+    
+    # Verificar permissão
+    if not current_identity().can_access_supplier(supplier_id):
+        return None, (jsonify({'error': 'Acesso negado'}), 403)
+    
+    return {
+        'supplier_id': supplier_id,
+        'category': category,
+        'effective_date': effective_date,
+        'comments': values.get('comments') or '',
+        'sheet_name': values.get('sheet_name') or None,
+        'on_duplicate': on_duplicate
+    }, None
+
+def stored_upload_path(original_filename):
+    """Nome e caminho definitivos do arquivo na pasta de uploads"""
+    filename = secure_filename(original_filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base, extension = os.path.splitext(filename)
+    candidate = f"{timestamp}_{filename}"
+    
+    # Vários arquivos com o mesmo nome no mesmo segundo (ex.: upload em lote)
+    counter = 1
+    while os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], candidate)):
+        candidate = f"{timestamp}_{base}_{counter}{extension}"
+        counter += 1
+    
+    return candidate, os.path.join(current_app.config['UPLOAD_FOLDER'], candidate)
+
+def resolve_duplicate(stored, metadata):
+    """Trata o reenvio de um arquivo idêntico; retorna (dados, status) ou None se o arquivo é novo"""
+    # Arquivo idêntico já enviado por este fornecedor: não reprocessar
+    duplicate_table, duplicate_job = find_duplicate(metadata['supplier_id'], stored.sha256)
+    if not duplicate_table and not duplicate_job:
+        return None
+    
+    os.remove(stored.path)
+    
+    if duplicate_table and metadata['on_duplicate'] == 'clone':
+        cost_table = clone_cost_table(
+            duplicate_table,
+            category=metadata['category'],
+            effective_date=metadata['effective_date'],
+            submitted_by=session['user_id'],
+            comments=metadata['comments']
+        )
+        db.session.commit()
+        write_snapshot(cost_table.id)
+        return {
+            'message': 'Arquivo idêntico a uma tabela existente; itens copiados sem reprocessamento',
+            'cost_table': cost_table.to_dict(),
+            'cloned_from': duplicate_table.id
+        }, 201
+    
+    return {
+        'error': 'Arquivo idêntico já enviado para este fornecedor',
+        'duplicate_of': duplicate_table.to_dict() if duplicate_table else None,
+        'duplicate_job': duplicate_job.to_dict() if duplicate_job else None
+    }, 409
+
+def new_ingestion_job(stored, filename, metadata):
+    """Job de ingestão (ainda não gravado) para um arquivo já recebido"""
+    return IngestionJob(
+        filename=filename,
+        file_path=stored.path,
+        file_size=stored.size,
+        file_hash=stored.sha256,
+        sheet_name=metadata['sheet_name'],
+        supplier_id=metadata['supplier_id'],
+        category=metadata['category'],
+        effective_date=metadata['effective_date'],
+        comments=metadata['comments'],
+        submitted_by=session['user_id']
+    )
+
+def job_status(job):
+    """Dados do job enfileirado com a URL para acompanhar o processamento"""
+    return dict(job.to_dict(), status_url=url_for('cost_table.get_ingestion_job', job_id=job.id))
+
+def enqueue_stored_upload(stored, filename, metadata):
+    """Deduplica e enfileira a ingestão de um arquivo já gravado; retorna (resposta, status)"""
+    duplicate = resolve_duplicate(stored, metadata)
+    if duplicate:
+        payload, status = duplicate
+        return jsonify(payload), status
+    
+    # Registrar job de ingestão; o processamento ocorre em segundo plano
+    job = new_ingestion_job(stored, filename, metadata)
+    db.session.add(job)
+    db.session.commit()
+    
+    submit_job(current_app._get_current_object(), job.id)
+    
+    return jsonify({
+        'message': 'Arquivo recebido, processamento em andamento',
+        'job': job_status(job)
+    }), 202
+
 @cost_table_bp.route('/upload', methods=['POST'])
 @login_required
 def upload_cost_table():
@@ -164,149 +285,286 @@ def upload_cost_table():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
         
-        # Obter dados do formulário
-        supplier_id = request.form.get('supplier_id', type=int)
-        category = request.form.get('category')
-        effective_date = request.form.get('effective_date')
-        comments = request.form.get('comments', '')
+        # Obter e validar dados do formulário
+        metadata, error_response = validate_upload_metadata(request.form)
+        if error_response:
+            return error_response
         
-        if not supplier_id or not category or not effective_date:
-            return jsonify({'error': 'Campos obrigatórios: supplier_id, category, effective_date'}), 400
+        # Gravação em passagem única, com hash SHA256 e tamanho calculados no fluxo
+        filename, file_path = stored_upload_path(file.filename)
+        stored = store_upload(file, file_path)
         
-        # Verificar se fornecedor existe
-        supplier = Supplier.query.get(supplier_id)
-        if not supplier:
-            return jsonify({'error': 'Fornecedor não encontrado'}), 404
+        return enqueue_stored_upload(stored, filename, metadata)
         
-        # Verificar permissão
-        user = User.query.get(session['user_id'])
-        if user.role == 'supplier':
-            supplier_user = Supplier.query.filter_by(email=user.email).first()
-            if not supplier_user or supplier_user.id != supplier_id:
-                return jsonify({'error': 'Acesso negado'}), 403
-        
-        # Salvar arquivo
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Calcular hash do arquivo
-        file_hash = calculate_file_hash(file_path)
-        file_size = os.path.getsize(file_path)
-        
-        # Processar arquivo
-        df, error = parse_cost_table_file(file_path, filename)
-        if error:
-            os.remove(file_path)  # Remover arquivo inválido
-            return jsonify({'error': error}), 400
-        
-        # Gerar versão
-        last_version = CostTable.query.filter_by(supplier_id=supplier_id).order_by(CostTable.created_at.desc()).first()
-        if last_version:
-            version_num = float(last_version.version.replace('v', '')) + 0.1
-            version = f"v{version_num:.1f}"
-        else:
-            version = "v1.0"
-        
-        # Criar registro da tabela
-        cost_table = CostTable(
-            supplier_id=supplier_id,
-            version=version,
-            filename=filename,
-            file_path=file_path,
-            file_size=file_size,
-            file_hash=file_hash,
-            effective_date=datetime.strptime(effective_date, '%Y-%m-%d').date(),
-            category=category,
-            status='submitted',
-            total_items=len(df),
-            submitted_by=session['user_id'],
-            comments=comments
-        )
+    except Exception as e:
+        db.session.rollback()
+        if 'file_path' in locals() and os.path.exists(file_path):
+            os.remove(file_path)
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/upload/batch', methods=['POST'])
+@login_required
+def upload_cost_table_batch():
+    """Upload em lote de tabelas de custos (um job de ingestão por arquivo)
+    
+    Arquivos no campo `files`; metadados por arquivo no campo `metadata` (lista JSON
+    na mesma ordem dos arquivos), com os demais campos do formulário como padrão.
+    A requisição só grava e deduplica os arquivos: a leitura e a gravação das tabelas
+    correm no pool de ingestão, e a resposta (202) traz o job e a URL de cada arquivo.
+    """
+    try:
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({'error': 'Nenhum arquivo enviado'}), 400
         
-        db.session.add(cost_table)
-        db.session.flush()  # Para obter o ID
-        
-        # Processar itens
-        total_value = 0
-        total_impact = 0
-        
-        for _, row in df.iterrows():
-            cost_item = CostItem(
-                cost_table_id=cost_table.id,
-                sku=row['sku'],
-                description=row['description'],
-                category=row['category'],
-                unit=row['unit'],
-                previous_cost=row['previous_cost'],
-                new_cost=row['new_cost'],
-                monthly_volume=row['monthly_volume']
-            )
+        max_files = current_app.config.get('BATCH_UPLOAD_MAX_FILES', 50)
+        if len(files) > max_files:
+            return jsonify({'error': f'Máximo de {max_files} arquivos por lote'}), 400
+        
+        try:
+            file_metadata = json.loads(request.form.get('metadata') or '[]')
+        except ValueError:
+            file_metadata = None
+        if not isinstance(file_metadata, list) or (file_metadata and len(file_metadata) != len(files)):
+            return jsonify({'error': 'metadata deve ser uma lista com um objeto por arquivo'}), 400
+        
+        defaults = request.form.to_dict()
+        defaults.pop('metadata', None)
+        
+        results = []
+        entries = []
+        seen = set()
+        for index, file in enumerate(files):
+            result = {'index': index, 'filename': file.filename}
+            results.append(result)
             
-            # Calcular mudanças
-            cost_item.calculate_changes()
+            if not file.filename or not allowed_file(file.filename):
+                result.update(status='invalid', error='Tipo de arquivo não permitido')
+                continue
             
-            total_value += float(cost_item.new_cost) * float(cost_item.monthly_volume or 0)
-            total_impact += float(cost_item.monthly_impact or 0)
+            values = dict(defaults, **(file_metadata[index] if file_metadata else {}))
+            metadata, error_response = validate_upload_metadata(values)
+            if error_response:
+                response, _ = error_response
+                result.update(status='invalid', error=response.get_json()['error'])
+                continue
             
-            db.session.add(cost_item)
-        
-        # Atualizar totais da tabela
-        cost_table.total_value = total_value
-        cost_table.monthly_impact = total_impact
+            filename, file_path = stored_upload_path(file.filename)
+            stored = store_upload(file, file_path)
+            
+            # Arquivo repetido dentro do próprio lote
+            key = (metadata['supplier_id'], stored.sha256)
+            if key in seen:
+                os.remove(stored.path)
+                result.update(status='duplicate', error='Arquivo repetido no lote para este fornecedor')
+                continue
+            seen.add(key)
+            
+            duplicate = resolve_duplicate(stored, metadata)
+            if duplicate:
+                payload, status = duplicate
+                result.update(payload, status='cloned' if status == 201 else 'duplicate')
+                continue
+            
+            entries.append({'job': new_ingestion_job(stored, filename, metadata), 'stored': stored,
+                            'result': result})
         
-        # Calcular impacto baseado na tabela anterior
-        previous_table = CostTable.query.filter_by(
-            supplier_id=supplier_id,
-            status='approved'
-        ).order_by(CostTable.created_at.desc()).first()
+        # Jobs do lote gravados juntos e enviados ao pool de ingestão
+        db.session.add_all([entry['job'] for entry in entries])
+        db.session.commit()
         
-        if previous_table:
-            cost_table.previous_total_value = previous_table.total_value
-            cost_table.impact_value = cost_table.total_value - previous_table.total_value
-            if previous_table.total_value > 0:
-                cost_table.impact_percentage = (cost_table.impact_value / previous_table.total_value) * 100
+        app = current_app._get_current_object()
+        for entry in entries:
+            submit_job(app, entry['job'].id)
+            entry['result'].update(status='queued', job=job_status(entry['job']))
         
-        db.session.commit()
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
         
         return jsonify({
-            'message': 'Tabela de custos enviada com sucesso',
-            'cost_table': cost_table.to_dict()
-        }), 201
+            'message': 'Arquivos recebidos, processamento em andamento' if entries else 'Nenhum arquivo enfileirado',
+            'files': results,
+            'summary': summary,
+            'jobs': [entry['job'].id for entry in entries]
+        }), 202 if entries else 200
         
     except Exception as e:
         db.session.rollback()
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+        for entry in locals().get('entries', []):
+            if os.path.exists(entry['stored'].path) and 'status' not in entry['result']:
+                os.remove(entry['stored'].path)
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_ingestion_job(job_id):
+    """Obter estado, progresso e tempos de um job de ingestão"""
+    try:
+        job = IngestionJob.query.get_or_404(job_id)
+        
+        # Fornecedores só veem os próprios envios
+        identity = current_identity()
+        if identity.is_supplier and job.submitted_by != identity.id:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        job_dict = job.to_dict()
+        if job.cost_table_id:
+            job_dict['cost_table'] = CostTable.query.get(job.cost_table_id).to_dict()
+        
+        return jsonify({'job': job_dict}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def send_validation_report(file_hash, sheet_name, filename):
+    """Envia o relatório de validação gravado na leitura do arquivo"""
+    report_path = validation_report_path(file_hash, sheet_name) if file_hash else None
+    if not report_path or not os.path.exists(report_path):
+        return jsonify({'error': 'Relatório de validação não encontrado'}), 404
+    
+    download_name = f"erros_{os.path.splitext(filename)[0]}.csv"
+    return send_file(report_path, mimetype='text/csv', as_attachment=True, download_name=download_name)
+
+@cost_table_bp.route('/jobs/<int:job_id>/errors', methods=['GET'])
+@login_required
+def get_ingestion_job_errors(job_id):
+    """Baixar o relatório de validação (CSV) das linhas do arquivo de um job"""
+    try:
+        job = IngestionJob.query.get_or_404(job_id)
+        
+        identity = current_identity()
+        if identity.is_supplier and job.submitted_by != identity.id:
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        return send_validation_report(job.file_hash, job.sheet_name, job.filename)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/<int:table_id>/errors', methods=['GET'])
+@login_required
+def get_cost_table_errors(table_id):
+    """Baixar o relatório de validação (CSV) do arquivo de uma tabela de custo"""
+    try:
+        cost_table = CostTable.query.get_or_404(table_id)
+        
+        # Verificar permissão
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        # A planilha lida é a registrada no job que gerou a tabela, se houver
+        job = IngestionJob.query.filter_by(cost_table_id=table_id).first()
+        sheet_name = job.sheet_name if job else None
+        
+        return send_validation_report(cost_table.file_hash, sheet_name, cost_table.filename)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/<int:table_id>/sku-changes', methods=['GET'])
+@login_required
+def get_cost_table_sku_changes(table_id):
+    """SKUs novos e descontinuados em relação à tabela aprovada anterior"""
+    try:
+        cost_table = CostTable.query.get_or_404(table_id)
+        
+        # Verificar permissão
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        comparison = cost_table.get_sku_comparison()
+        if not comparison:
+            return jsonify({'error': 'Tabela sem tabela aprovada anterior para comparação'}), 404
+        
+        changes = compare_skus(get_snapshot(table_id).columns['sku'], comparison['approved_cost_table_id'])
+        
+        return jsonify({
+            'summary': comparison,
+            'new': changes['new'],
+            'discontinued': changes['discontinued']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/<int:table_id>/analysis', methods=['GET'])
+@login_required
+def get_cost_table_analysis(table_id):
+    """Resumo dos itens: maiores variações, histograma, subtotais por categoria e contagens"""
+    try:
+        cost_table = CostTable.query.get_or_404(table_id)
+        
+        # Verificar permissão
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        top = request.args.get('top', DEFAULT_TOP_N, type=int)
+        analysis = get_analysis(get_snapshot(table_id))
+        
+        return jsonify({'analysis': limit_top(analysis, top)}), 200
+        
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @cost_table_bp.route('/<int:table_id>/items', methods=['GET'])
 @login_required
 def get_cost_table_items(table_id):
-    """Listar itens de uma tabela de custo"""
+    """Listar itens de uma tabela de custo (?fields= limita os campos de cada item)"""
     try:
         cost_table = CostTable.query.get_or_404(table_id)
         
         # Verificar permissão
-        user = User.query.get(session['user_id'])
-        if user.role == 'supplier':
-            supplier = Supplier.query.filter_by(email=user.email).first()
-            if not supplier or cost_table.supplier_id != supplier.id:
-                return jsonify({'error': 'Acesso negado'}), 403
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
         
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
         search = request.args.get('search', '')
-        
-        query = CostItem.query.filter_by(cost_table_id=table_id)
-        
-        if search:
-            query = query.filter(
-                (CostItem.sku.contains(search)) |
-                (CostItem.description.contains(search))
-            )
+        fields = COST_ITEM_SCHEMA.parse_fields(request.args.get('fields', ''))
+        
+        # Paginação por cursor (sku + id): sem busca, posição direta no snapshot
+        if wants_cursor(request.args):
+            args = cursor_args(request.args, per_page)
+            if not search:
+                snapshot = get_snapshot(table_id)
+                start = 0
+                if args['cursor']:
+                    sku, item_id = decode_cursor(args['cursor'], [CostItem.sku, CostItem.id])
+                    start = snapshot.position_after(sku, item_id)
+                stop = min(start + args['per_page'], snapshot.rows)
+                items = snapshot.to_dicts(start, stop, fields)
+                next_cursor = None
+                if stop < snapshot.rows:
+                    # Último item da página, lido do snapshot (o item pode ter ficado fora de ?fields=)
+                    next_cursor = encode_cursor([str(snapshot.columns['sku'][stop - 1]),
+                                                 int(snapshot.columns['id'][stop - 1])])
+                keyset = KeysetPage(items, next_cursor, args['per_page'], total=snapshot.rows)
+            else:
+                query = search_cost_items(COST_ITEM_SCHEMA.query(fields, extra=['sku', 'id']), CostItem, search,
+                                          cost_table_id=table_id)
+                keyset = keyset_paginate(query, [CostItem.sku, CostItem.id], **args)
+                keyset.items = COST_ITEM_SCHEMA.serialize(keyset.items, fields, extra=['sku', 'id'])
+            
+            return json_response(dict(keyset.to_dict(), items=keyset.items, cost_table=cost_table.to_dict()))
+        
+        # Sem busca, a página sai direto do snapshot colunar (ordenado por sku)
+        if not search:
+            snapshot = get_snapshot(table_id)
+            page = max(page, 1)
+            per_page = max(per_page, 1)
+            start = (page - 1) * per_page
+            return json_response({
+                'items': snapshot.to_dicts(start, start + per_page, fields),
+                'total': snapshot.rows,
+                'pages': math.ceil(snapshot.rows / per_page),
+                'current_page': page,
+                'per_page': per_page,
+                'cost_table': cost_table.to_dict()
+            })
+        
+        # Busca pelo índice FTS5 (prefixo por termo, ordenada por relevância)
+        query = search_cost_items(COST_ITEM_SCHEMA.query(fields), CostItem, search, cost_table_id=table_id)
         
         query = query.order_by(CostItem.sku)
         
@@ -316,15 +574,55 @@ def get_cost_table_items(table_id):
             error_out=False
         )
         
-        return jsonify({
-            'items': [item.to_dict() for item in items.items],
+        return json_response({
+            'items': COST_ITEM_SCHEMA.serialize(items.items, fields),
             'total': items.total,
             'pages': items.pages,
             'current_page': page,
             'per_page': per_page,
             'cost_table': cost_table.to_dict()
-        }), 200
+        })
+        
+    except (InvalidCursor, FieldError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cost_table_bp.route('/<int:table_id>/export', methods=['GET'])
+@login_required
+def export_cost_table_items(table_id):
+    """Exportar itens da tabela em CSV ou XLSX (?format=, ?columns=, ?search= como em /items)"""
+    try:
+        cost_table = CostTable.query.get_or_404(table_id)
+        
+        # Verificar permissão
+        if not current_identity().can_access_supplier(cost_table.supplier_id):
+            return jsonify({'error': 'Acesso negado'}), 403
+        
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_MIMETYPES:
+            return jsonify({'error': f"format deve ser {' ou '.join(EXPORT_MIMETYPES)}"}), 400
+        columns = export_columns(request.args.get('columns', ''))
+        search = request.args.get('search', '')
+        
+        snapshot = get_snapshot(table_id)
+        positions = search_positions(snapshot, search) if search else None
+        batches = iter_row_batches(snapshot, columns, positions, current_app.config['STREAM_BATCH_SIZE'])
+        
+        filename = f'tabela_{cost_table.id}_{cost_table.version}.{export_format}'
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        
+        if export_format == 'csv':
+            return Response(csv_chunks(columns, batches), mimetype=EXPORT_MIMETYPES['csv'], headers=headers)
+        
+        # XLSX precisa ser fechado antes do envio: gravado em arquivo temporário e removido após o envio
+        path = write_xlsx(columns, batches, directory=current_app.config['UPLOAD_FOLDER'])
+        headers['Content-Length'] = str(os.path.getsize(path))
+        return Response(file_chunks(path, current_app.config['UPLOAD_BUFFER_SIZE']),
+                        mimetype=EXPORT_MIMETYPES['xlsx'], headers=headers)
         
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,99 +1,87 @@
 from flask import Blueprint, request, jsonify, session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from models.cost_table import CostTable
 from models.approval import Approval
-from models.supplier import Supplier
-from models.user import User, db
 from routes.auth import login_required
+from services.cache import cached, cached_view, conditional_json
+from services.identity import current_identity
+from services.metrics import (approval_time_percentiles, category_metrics, decided_approval_rows, monthly_metrics,
+                             overview_totals, supplier_metrics, user_overview)
+from services.pagination import InvalidCursor, cursor_args, keyset_paginate
+from services.query_counter import query_budget
+from services.reporting import PERIODS, build_report
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Janela máxima (dias) e aprovações individuais por página nas métricas de tempo de aprovação
+MAX_WINDOW_DAYS = 3650
+APPROVAL_TIMES_PER_PAGE = 50
+
 @dashboard_bp.route('/overview', methods=['GET'])
 @login_required
+@query_budget(7)
 def get_dashboard_overview():
     """Obter visão geral do dashboard"""
     try:
-        user = User.query.get(session['user_id'])
-        
-        # Métricas básicas
-        total_suppliers = Supplier.query.filter_by(status='active').count()
-        total_cost_tables = CostTable.query.count()
+        user_id = session['user_id']
         
-        # Tabelas por status
-        status_counts = db.session.query(
-            CostTable.status,
-            func.count(CostTable.id)
-        ).group_by(CostTable.status).all()
+        # Parte global compartilhada entre usuários; a do usuário fica em cache própria
+        overview = dict(cached('overview', overview_totals))
+        overview.update(cached(('overview', user_id), lambda: user_overview(current_identity())))
         
-        status_summary = {status: count for status, count in status_counts}
+        return conditional_json({'overview': overview})
         
-        # Aprovações pendentes para o usuário
-        pending_approvals = 0
-        if user.role != 'supplier':
-            pending_approvals = Approval.query.filter(
-                or_(Approval.approver_id == user.id, Approval.delegated_to == user.id),
-                Approval.status == 'pending'
-            ).count()
-        
-        # Aprovações em atraso (apenas para gestores)
-        overdue_approvals = 0
-        if user.role in ['admin', 'commercial_manager', 'commercial_director', 'vp_commercial']:
-            overdue_approvals = Approval.query.filter(
-                Approval.status == 'pending',
-                Approval.deadline < datetime.utcnow()
-            ).count()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@dashboard_bp.route('/reports', methods=['GET'])
+@login_required
+@query_budget(6)
+def get_reports():
+    """Obter relatórios do período (?period=), com drill-down por ?supplier_id= e ?category="""
+    try:
+        period = request.args.get('period', 'last_30_days')
+        if period not in PERIODS:
+            return jsonify({'error': f'Período inválido: {period}'}), 400
         
-        # Impacto financeiro do mês
-        current_month = datetime.now().replace(day=1)
-        monthly_impact = db.session.query(
-            func.sum(CostTable.monthly_impact)
-        ).filter(
-            CostTable.created_at >= current_month,
-            CostTable.status.in_(['approved', 'under_review', 'pricing_analysis', 'commercial_review'])
-        ).scalar() or 0
+        supplier_id = request.args.get('supplier_id', type=int)
+        category = request.args.get('category') or None
         
-        # Tabelas aprovadas no mês
-        approved_this_month = CostTable.query.filter(
-            CostTable.status == 'approved',
-            CostTable.updated_at >= current_month
-        ).count()
+        # Fornecedores só veem os próprios dados
+        user = current_identity()
+        if user.is_supplier:
+            if user.supplier_id is None or (supplier_id is not None and not user.can_access_supplier(supplier_id)):
+                return jsonify({'error': 'Acesso negado'}), 403
+            supplier_id = user.supplier_id
         
-        return jsonify({
-            'overview': {
-                'total_suppliers': total_suppliers,
-                'total_cost_tables': total_cost_tables,
-                'pending_approvals': pending_approvals,
-                'overdue_approvals': overdue_approvals,
-                'monthly_impact': float(monthly_impact),
-                'approved_this_month': approved_this_month,
-                'status_summary': status_summary
-            }
-        }), 200
+        # Lido só do cubo de relatórios; compartilhado entre usuários com os mesmos filtros
+        report = cached(('reports', period, supplier_id, category),
+                        lambda: build_report(period, supplier_id, category))
+        return conditional_json(report)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @dashboard_bp.route('/recent-activity', methods=['GET'])
 @login_required
+@query_budget(4)
 def get_recent_activity():
     """Obter atividades recentes"""
     try:
-        user = User.query.get(session['user_id'])
+        user = current_identity()
         limit = request.args.get('limit', 10, type=int)
         
         activities = []
         
-        # Tabelas de custo recentes
-        recent_tables_query = CostTable.query.order_by(CostTable.created_at.desc()).limit(limit)
+        # Tabelas de custo recentes (com o fornecedor na mesma consulta)
+        recent_tables_query = CostTable.query.options(joinedload(CostTable.supplier))
         
         # Filtrar por fornecedor se for usuário fornecedor
-        if user.role == 'supplier':
-            supplier = Supplier.query.filter_by(email=user.email).first()
-            if supplier:
-                recent_tables_query = recent_tables_query.filter_by(supplier_id=supplier.id)
+        if user.is_supplier:
+            recent_tables_query = recent_tables_query.filter_by(supplier_id=user.supplier_id)
         
-        recent_tables = recent_tables_query.all()
+        recent_tables = recent_tables_query.order_by(CostTable.created_at.desc()).limit(limit).all()
         
         for table in recent_tables:
             activities.append({
@@ -110,7 +98,10 @@ def get_recent_activity():
         
         # Aprovações recentes (apenas para usuários com permissão)
         if user.role != 'supplier':
-            recent_approvals = Approval.query.filter(
+            recent_approvals = Approval.query.options(
+                joinedload(Approval.cost_table),
+                joinedload(Approval.approver)
+            ).filter(
                 Approval.decision_date.isnot(None)
             ).order_by(Approval.decision_date.desc()).limit(limit).all()
             
@@ -140,56 +131,16 @@ def get_recent_activity():
 
 @dashboard_bp.route('/metrics/monthly', methods=['GET'])
 @login_required
+@query_budget(2)
+@cached_view
 def get_monthly_metrics():
-    """Obter métricas mensais"""
+    """Obter métricas mensais (meses do calendário, o atual incluído)"""
     try:
         months = request.args.get('months', 6, type=int)
         
-        # Calcular período
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30 * months)
-        
-        # Métricas por mês
-        monthly_data = []
-        
-        for i in range(months):
-            month_start = end_date - timedelta(days=30 * (i + 1))
-            month_end = end_date - timedelta(days=30 * i)
-            
-            # Tabelas submetidas no mês
-            submitted = CostTable.query.filter(
-                CostTable.created_at >= month_start,
-                CostTable.created_at < month_end
-            ).count()
-            
-            # Tabelas aprovadas no mês
-            approved = CostTable.query.filter(
-                CostTable.status == 'approved',
-                CostTable.updated_at >= month_start,
-                CostTable.updated_at < month_end
-            ).count()
-            
-            # Impacto financeiro aprovado no mês
-            impact = db.session.query(
-                func.sum(CostTable.monthly_impact)
-            ).filter(
-                CostTable.status == 'approved',
-                CostTable.updated_at >= month_start,
-                CostTable.updated_at < month_end
-            ).scalar() or 0
-            
-            monthly_data.append({
-                'month': month_start.strftime('%Y-%m'),
-                'submitted': submitted,
-                'approved': approved,
-                'impact': float(impact),
-                'approval_rate': (approved / submitted * 100) if submitted > 0 else 0
-            })
-        
-        monthly_data.reverse()  # Ordem cronológica
-        
+        # Uma consulta agrupada por métrica, meses sem dados preenchidos com zero
         return jsonify({
-            'monthly_metrics': monthly_data
+            'monthly_metrics': monthly_metrics(months)
         }), 200
         
     except Exception as e:
@@ -197,41 +148,16 @@ def get_monthly_metrics():
 
 @dashboard_bp.route('/metrics/suppliers', methods=['GET'])
 @login_required
+@query_budget(1)
+@cached_view
 def get_supplier_metrics():
     """Obter métricas por fornecedor"""
     try:
         limit = request.args.get('limit', 10, type=int)
         
         # Top fornecedores por impacto financeiro
-        top_suppliers = db.session.query(
-            Supplier.id,
-            Supplier.name,
-            func.sum(CostTable.monthly_impact).label('total_impact'),
-            func.count(CostTable.id).label('total_tables'),
-            func.sum(
-                func.case([(CostTable.status == 'approved', 1)], else_=0)
-            ).label('approved_tables')
-        ).join(CostTable).group_by(
-            Supplier.id, Supplier.name
-        ).order_by(
-            func.sum(CostTable.monthly_impact).desc()
-        ).limit(limit).all()
-        
-        supplier_metrics = []
-        for supplier in top_suppliers:
-            approval_rate = (supplier.approved_tables / supplier.total_tables * 100) if supplier.total_tables > 0 else 0
-            
-            supplier_metrics.append({
-                'supplier_id': supplier.id,
-                'supplier_name': supplier.name,
-                'total_impact': float(supplier.total_impact or 0),
-                'total_tables': supplier.total_tables,
-                'approved_tables': supplier.approved_tables,
-                'approval_rate': approval_rate
-            })
-        
         return jsonify({
-            'supplier_metrics': supplier_metrics
+            'supplier_metrics': supplier_metrics(limit)
         }), 200
         
     except Exception as e:
@@ -239,38 +165,14 @@ def get_supplier_metrics():
 
 @dashboard_bp.route('/metrics/categories', methods=['GET'])
 @login_required
+@query_budget(1)
+@cached_view
 def get_category_metrics():
     """Obter métricas por categoria"""
     try:
-        # Métricas por categoria
-        category_data = db.session.query(
-            CostTable.category,
-            func.count(CostTable.id).label('total_tables'),
-            func.sum(CostTable.monthly_impact).label('total_impact'),
-            func.avg(CostTable.monthly_impact).label('avg_impact'),
-            func.sum(
-                func.case([(CostTable.status == 'approved', 1)], else_=0)
-            ).label('approved_tables')
-        ).group_by(CostTable.category).all()
-        
-        category_metrics = []
-        for category in category_data:
-            approval_rate = (category.approved_tables / category.total_tables * 100) if category.total_tables > 0 else 0
-            
-            category_metrics.append({
-                'category': category.category,
-                'total_tables': category.total_tables,
-                'total_impact': float(category.total_impact or 0),
-                'avg_impact': float(category.avg_impact or 0),
-                'approved_tables': category.approved_tables,
-                'approval_rate': approval_rate
-            })
-        
-        # Ordenar por impacto total
-        category_metrics.sort(key=lambda x: x['total_impact'], reverse=True)
-        
+        # Ordenadas por impacto total
         return jsonify({
-            'category_metrics': category_metrics
+            'category_metrics': category_metrics()
         }), 200
         
     except Exception as e:
@@ -278,48 +180,54 @@ def get_category_metrics():
 
 @dashboard_bp.route('/metrics/approval-times', methods=['GET'])
 @login_required
+@query_budget(2)
+@cached_view
 def get_approval_time_metrics():
-    """Obter métricas de tempo de aprovação"""
+    """Obter métricas de tempo de aprovação (?days= janela, aprovações individuais por cursor)"""
     try:
-        # Aprovações concluídas nos últimos 3 meses
-        three_months_ago = datetime.now() - timedelta(days=90)
-        
-        completed_approvals = Approval.query.filter(
-            Approval.decision_date.isnot(None),
-            Approval.decision_date >= three_months_ago
-        ).all()
-        
-        approval_times = []
-        for approval in completed_approvals:
-            if approval.assigned_at and approval.decision_date:
-                time_diff = approval.decision_date - approval.assigned_at
-                approval_times.append({
-                    'approval_type': approval.approval_type,
-                    'days_taken': time_diff.days,
-                    'status': approval.status,
-                    'supplier_name': approval.cost_table.supplier.name
-                })
-        
-        # Calcular médias por tipo de aprovação
-        type_averages = {}
-        for approval in approval_times:
-            approval_type = approval['approval_type']
-            if approval_type not in type_averages:
-                type_averages[approval_type] = []
-            type_averages[approval_type].append(approval['days_taken'])
-        
-        avg_times = {}
-        for approval_type, times in type_averages.items():
-            avg_times[approval_type] = sum(times) / len(times) if times else 0
+        days = min(max(request.args.get('days', 90, type=int), 1), MAX_WINDOW_DAYS)
+        start = datetime.utcnow() - timedelta(days=days)
+        
+        # Percentis por tipo, fornecedor e categoria numa consulta agrupada
+        groups = approval_time_percentiles(start)
+        total_completed = sum(entry['count'] for entry in groups['approval_type'])
+        
+        # Aprovações individuais, das decisões mais recentes para as mais antigas
+        args = cursor_args(request.args, APPROVAL_TIMES_PER_PAGE)
+        args['with_count'] = False
+        keyset = keyset_paginate(decided_approval_rows(start), [Approval.decision_date, Approval.id],
+                                 descending=True, **args)
+        keyset.total = total_completed
+        
+        individual_approvals = [
+            {
+                'approval_id': row.id,
+                'approval_type': row.approval_type,
+                'hours_taken': round(row.hours, 2),
+                'days_taken': int(row.hours // 24),
+                'status': row.status,
+                'supplier_name': row.supplier_name,
+                'decision_date': row.decision_date.isoformat()
+            }
+            for row in keyset.items
+        ]
         
         return jsonify({
             'approval_time_metrics': {
-                'individual_approvals': approval_times,
-                'average_times_by_type': avg_times,
-                'total_completed': len(approval_times)
+                'window_days': days,
+                'total_completed': total_completed,
+                'average_times_by_type': {
+                    entry['approval_type']: entry['avg_hours'] / 24 for entry in groups['approval_type']
+                },
+                'by_approval_type': groups['approval_type'],
+                'by_supplier': groups['supplier'],
+                'by_category': groups['category'],
+                'individual_approvals': individual_approvals,
+                **keyset.to_dict()
             }
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from models.supplier import Supplier
 from models.user import db
 from routes.auth import login_required, role_required
+from services.pagination import InvalidCursor, cursor_args, keyset_paginate, wants_cursor
+from services.search import search_suppliers
 
 supplier_bp = Blueprint('supplier', __name__)
 
@@ -20,11 +22,8 @@ def get_suppliers():
         
         # Filtros
         if search:
-            query = query.filter(
-                (Supplier.name.contains(search)) |
-                (Supplier.cnpj.contains(search)) |
-                (Supplier.email.contains(search))
-            )
+            # Busca pelo índice FTS5 (nome, CNPJ só com dígitos e email)
+            query = search_suppliers(query, Supplier, search)
         
         if category:
             query = query.filter(Supplier.category == category)
@@ -32,6 +31,11 @@ def get_suppliers():
         if status:
             query = query.filter(Supplier.status == status)
         
+        if wants_cursor(request.args):
+            # Paginação por cursor (name + id); com busca, a ordem é a do cursor, não a relevância
+            keyset = keyset_paginate(query, [Supplier.name, Supplier.id], **cursor_args(request.args, per_page))
+            return jsonify(dict(keyset.to_dict(), suppliers=[supplier.to_dict() for supplier in keyset.items])), 200
+        
         # Ordenação
         query = query.order_by(Supplier.name)
         
@@ -50,6 +54,8 @@ def get_suppliers():
             'per_page': per_page
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -92,6 +98,8 @@ def create_supplier():
         )
         
         db.session.add(supplier)
+        db.session.flush()
+        supplier.link_users()
         db.session.commit()
         
         return jsonify({
@@ -112,6 +120,7 @@ def update_supplier(supplier_id):
         data = request.get_json()
         
         # Atualizar campos permitidos
+        email_changed = 'email' in data and data['email'] != supplier.email
         allowed_fields = ['name', 'email', 'phone', 'address', 'category', 'status']
         for field in allowed_fields:
             if field in data:
@@ -124,6 +133,10 @@ def update_supplier(supplier_id):
                 return jsonify({'error': 'CNPJ já cadastrado'}), 400
             supplier.cnpj = data['cnpj']
         
+        # Usuários fornecedores sem vínculo com o novo email passam a ser vinculados
+        if email_changed:
+            supplier.link_users()
+        
         db.session.commit()
         
         return jsonify({
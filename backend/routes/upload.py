@@ -0,0 +1,256 @@
+from flask import Blueprint, request, jsonify, session, current_app
+import hashlib
+import math
+import os
+import shutil
+import uuid
+from datetime import datetime
+from models.user import db
+from models.upload_session import UploadSession
+from routes.auth import login_required
+from routes.cost_table import (allowed_file, validate_upload_metadata, stored_upload_path,
+                               enqueue_stored_upload)
+from services.identity import current_identity
+from services.uploads import StoredUpload, chunked_upload_dir
+
+upload_bp = Blueprint('upload', __name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # 512MB
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def session_dir(upload_id):
+    return chunked_upload_dir(current_app.config['UPLOAD_FOLDER'], upload_id)
+
+def chunk_path(upload_id, index):
+    return os.path.join(session_dir(upload_id), f'{index:06d}.part')
+
+def received_chunks(upload_session):
+    """Índices das partes já recebidas e verificadas"""
+    directory = session_dir(upload_session.id)
+    if not os.path.isdir(directory):
+        return []
+    return [int(name.split('.')[0]) for name in os.listdir(directory) if name.endswith('.part')]
+
+def get_owned_session(upload_id):
+    """Retorna (upload_session, (resposta, status)) verificando a posse do upload"""
+    upload_session = UploadSession.query.get(upload_id)
+    if not upload_session:
+        return None, (jsonify({'error': 'Upload não encontrado'}), 404)
+
+    if upload_session.created_by != session['user_id']:
+        if not current_identity().has_role(['admin']):
+            return None, (jsonify({'error': 'Acesso negado'}), 403)
+
+    return upload_session, None
+
+def set_session_state(upload_id, state, expected_state):
+    """Troca o estado do upload só se ele ainda estiver em expected_state; retorna False se não estava"""
+    result = db.session.execute(
+        UploadSession.__table__.update()
+        .where(UploadSession.id == upload_id, UploadSession.state == expected_state)
+        .values(state=state, updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+@upload_bp.route('', methods=['POST'])
+@login_required
+def init_upload():
+    """Iniciar upload em partes de uma tabela de custos"""
+    try:
+        data = request.get_json() or {}
+
+        filename = data.get('filename', '')
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+
+        total_size = data.get('total_size')
+        if not isinstance(total_size, int) or total_size <= 0:
+            return jsonify({'error': 'total_size deve ser um inteiro positivo'}), 400
+
+        max_size = current_app.config.get('MAX_CHUNKED_UPLOAD_SIZE', DEFAULT_MAX_SIZE)
+        if total_size > max_size:
+            return jsonify({'error': f'Arquivo muito grande. Tamanho máximo: {max_size // (1024 * 1024)}MB'}), 413
+
+        # Cada parte precisa caber no limite de tamanho de uma requisição
+        chunk_size = data.get('chunk_size') or current_app.config.get('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        max_chunk_size = current_app.config['MAX_CONTENT_LENGTH']
+        if not isinstance(chunk_size, int) or chunk_size <= 0 or chunk_size > max_chunk_size:
+            return jsonify({'error': f'chunk_size deve estar entre 1 e {max_chunk_size} bytes'}), 400
+
+        metadata, error_response = validate_upload_metadata(data)
+        if error_response:
+            return error_response
+
+        upload_session = UploadSession(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            total_size=total_size,
+            chunk_size=chunk_size,
+            total_chunks=math.ceil(total_size / chunk_size),
+            sha256=(data.get('sha256') or '').lower() or None,
+            created_by=session['user_id']
+        )
+        metadata['effective_date'] = metadata['effective_date'].isoformat()
+        upload_session.set_metadata(metadata)
+
+        os.makedirs(session_dir(upload_session.id), exist_ok=True)
+        db.session.add(upload_session)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Upload iniciado',
+            'upload': upload_session.to_dict(received_chunks=[])
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@upload_bp.route('/<upload_id>', methods=['GET'])
+@login_required
+def get_upload(upload_id):
+    """Obter estado de um upload em partes (partes recebidas e pendentes)"""
+    try:
+        upload_session, error_response = get_owned_session(upload_id)
+        if error_response:
+            return error_response
+
+        return jsonify({'upload': upload_session.to_dict(received_chunks=received_chunks(upload_session))}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@upload_bp.route('/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def put_chunk(upload_id, index):
+    """Enviar uma parte do arquivo (corpo bruto, com SHA256 no cabeçalho X-Chunk-SHA256)"""
+    try:
+        upload_session, error_response = get_owned_session(upload_id)
+        if error_response:
+            return error_response
+
+        if upload_session.state != 'open':
+            return jsonify({'error': 'Upload não está aberto'}), 400
+
+        if index < 0 or index >= upload_session.total_chunks:
+            return jsonify({'error': 'Índice de parte inválido'}), 400
+
+        expected_hash = (request.headers.get('X-Chunk-SHA256') or '').lower()
+        if not expected_hash:
+            return jsonify({'error': 'Cabeçalho X-Chunk-SHA256 é obrigatório'}), 400
+
+        # Grava a parte em arquivo temporário, calculando o hash no fluxo
+        target = chunk_path(upload_id, index)
+        temp_path = f'{target}.{uuid.uuid4().hex}.tmp'
+        hash_sha256 = hashlib.sha256()
+        size = 0
+        with open(temp_path, 'wb') as f:
+            for data in iter(lambda: request.stream.read(COPY_BUFFER_SIZE), b""):
+                hash_sha256.update(data)
+                size += len(data)
+                f.write(data)
+
+        expected_size = upload_session.chunk_length(index)
+        if size != expected_size or hash_sha256.hexdigest() != expected_hash:
+            os.remove(temp_path)
+            return jsonify({
+                'error': 'Parte corrompida: tamanho ou hash não conferem',
+                'expected_size': expected_size,
+                'received_size': size
+            }), 422
+
+        # Reenvio da mesma parte é idempotente
+        os.replace(temp_path, target)
+
+        return jsonify({'index': index, 'size': size, 'sha256': expected_hash}), 200
+
+    except Exception as e:
+        if 'temp_path' in locals() and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return jsonify({'error': str(e)}), 500
+
+@upload_bp.route('/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """Concluir o upload: monta o arquivo e o envia ao pipeline de ingestão"""
+    claimed = False
+    try:
+        upload_session, error_response = get_owned_session(upload_id)
+        if error_response:
+            return error_response
+
+        # Só uma conclusão por upload: requisições simultâneas não passam daqui
+        if not set_session_state(upload_id, 'completing', expected_state='open'):
+            return jsonify({'error': 'Upload não está aberto'}), 400
+        claimed = True
+
+        missing = sorted(set(range(upload_session.total_chunks)) - set(received_chunks(upload_session)))
+        if missing:
+            set_session_state(upload_id, 'open', expected_state='completing')
+            return jsonify({'error': 'Há partes pendentes', 'missing_chunks': missing}), 400
+
+        # Revalida metadados e permissões no momento da conclusão
+        metadata, error_response = validate_upload_metadata(upload_session.get_metadata())
+        if error_response:
+            set_session_state(upload_id, 'open', expected_state='completing')
+            return error_response
+
+        # Monta o arquivo final em streaming, calculando o hash completo
+        filename, file_path = stored_upload_path(upload_session.filename)
+        hash_sha256 = hashlib.sha256()
+        size = 0
+        with open(file_path, 'wb') as output:
+            for index in range(upload_session.total_chunks):
+                with open(chunk_path(upload_id, index), 'rb') as part:
+                    for data in iter(lambda: part.read(COPY_BUFFER_SIZE), b""):
+                        hash_sha256.update(data)
+                        size += len(data)
+                        output.write(data)
+        stored = StoredUpload(file_path, hash_sha256.hexdigest(), size)
+
+        if upload_session.sha256 and upload_session.sha256 != stored.sha256:
+            os.remove(file_path)
+            set_session_state(upload_id, 'open', expected_state='completing')
+            return jsonify({'error': 'Hash do arquivo montado não confere com o informado'}), 422
+
+        response, status = enqueue_stored_upload(stored, filename, metadata)
+
+        upload_session.state = 'completed'
+        if status == 202:
+            upload_session.job_id = response.get_json()['job']['id']
+        db.session.commit()
+        shutil.rmtree(session_dir(upload_id), ignore_errors=True)
+
+        return response, status
+
+    except Exception as e:
+        db.session.rollback()
+        if 'file_path' in locals() and os.path.exists(file_path):
+            os.remove(file_path)
+        if claimed:
+            # Devolve o upload ao estado aberto para nova tentativa
+            set_session_state(upload_id, 'open', expected_state='completing')
+        return jsonify({'error': str(e)}), 500
+
+@upload_bp.route('/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_upload(upload_id):
+    """Cancelar um upload em partes e descartar as partes recebidas"""
+    try:
+        upload_session, error_response = get_owned_session(upload_id)
+        if error_response:
+            return error_response
+
+        # Partes em uso por uma conclusão em andamento não são apagadas
+        aborted = set_session_state(upload_id, 'aborted', expected_state='open')
+        if not aborted and upload_session.state == 'completing':
+            return jsonify({'error': 'Upload em conclusão'}), 409
+        shutil.rmtree(session_dir(upload_id), ignore_errors=True)
+
+        return jsonify({'message': 'Upload cancelado'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,17 @@
 from flask import Blueprint, jsonify, request
 from models.user import User, db
+from services.serialization import USER_SCHEMA, FieldError, json_response
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    try:
+        fields = USER_SCHEMA.parse_fields(request.args.get('fields', ''))
+    except FieldError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = db.session.execute(USER_SCHEMA.project(fields).select()).all()
+    return json_response(USER_SCHEMA.serialize(rows, fields))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -27,7 +32,10 @@ def update_user(user_id):
     user = User.query.get_or_404(user_id)
     data = request.json
     user.username = data.get('username', user.username)
-    user.email = data.get('email', user.email)
+    if data.get('email', user.email) != user.email:
+        user.email = data['email']
+        # Fornecedor ainda sem vínculo passa a ser vinculado pelo novo email
+        user.link_supplier()
     db.session.commit()
     return jsonify(user.to_dict())
 
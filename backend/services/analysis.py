@@ -0,0 +1,173 @@
+"""
+Análise dos itens de uma tabela de custos, calculada no servidor
+
+Substitui o envio de todos os itens ao navegador só para montar resumos. Tudo é
+calculado com NumPy sobre as colunas do snapshot:
+
+- maiores e menores itens por monthly_impact e por cost_change_percentage
+- histograma da variação percentual (faixas fixas)
+- subtotais por categoria
+- contagem de itens com aumento, redução e sem alteração
+
+Os itens não mudam depois do upload, então o resultado é gravado uma única vez
+dentro do diretório do snapshot (analysis.json); um snapshot regravado leva
+junto a análise antiga.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from services.cost_calculation import round_half_up, MONEY_SCALE, PERCENT_SCALE
+from services.snapshots import snapshot_path
+
+ANALYSIS_FILE = 'analysis.json'
+ANALYSIS_VERSION = 1
+
+DEFAULT_TOP_N = 10
+MAX_TOP_N = 100  # Calculado uma vez; cada requisição recorta o que pediu
+
+# Faixas do histograma de variação percentual: (-inf, -50), [-50, -20), ..., [100, inf)
+HISTOGRAM_EDGES = [-50, -20, -10, -5, 0, 5, 10, 20, 50, 100]
+
+TOP_FIELDS = ['id', 'sku', 'description', 'category', 'previous_cost', 'new_cost',
+              'cost_change_percentage', 'monthly_volume', 'monthly_impact']
+
+
+def _money(value):
+    return float(round_half_up(value, MONEY_SCALE))
+
+
+def _percent(value):
+    return float(round_half_up(value, PERCENT_SCALE))
+
+
+def _items(snapshot, positions):
+    columns = snapshot.columns
+    return [
+        {name: columns[name][position].item() for name in TOP_FIELDS}
+        for position in positions
+    ]
+
+
+def _ranked(values, count, descending):
+    """Posições dos `count` maiores (ou menores) valores, já ordenadas"""
+    count = min(count, len(values))
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+    keys = -values if descending else values
+    if count < len(values):
+        candidates = np.argpartition(keys, count - 1)[:count]
+    else:
+        candidates = np.arange(len(values))
+    # Empate: ordem do snapshot (sku, id)
+    return candidates[np.lexsort((candidates, keys[candidates]))]
+
+
+def _top(snapshot, column, count):
+    values = np.asarray(snapshot.columns[column])
+    return {
+        'highest': _items(snapshot, _ranked(values, count, descending=True)),
+        'lowest': _items(snapshot, _ranked(values, count, descending=False))
+    }
+
+
+def _histogram(percentages):
+    bins = np.searchsorted(np.asarray(HISTOGRAM_EDGES, dtype=np.float64), percentages, side='right')
+    counts = np.bincount(bins, minlength=len(HISTOGRAM_EDGES) + 1)
+    lower = [None] + HISTOGRAM_EDGES
+    upper = HISTOGRAM_EDGES + [None]
+    return [
+        {'min': low, 'max': high, 'count': int(count)}
+        for low, high, count in zip(lower, upper, counts)
+    ]
+
+
+def _categories(snapshot, changes):
+    columns = snapshot.columns
+    # Valores do dicionário já ordenados, como np.unique
+    names, inverse = columns['category'].values, np.asarray(columns['category'].codes)
+    size = len(names)
+    volume = np.asarray(columns['monthly_volume'])
+
+    items = np.bincount(inverse, minlength=size)
+    previous_value = np.bincount(inverse, weights=np.asarray(columns['previous_cost']) * volume, minlength=size)
+    new_value = np.bincount(inverse, weights=np.asarray(columns['new_cost']) * volume, minlength=size)
+    impact = np.bincount(inverse, weights=np.asarray(columns['monthly_impact']), minlength=size)
+    percentage_sum = np.bincount(inverse, weights=np.asarray(columns['cost_change_percentage']), minlength=size)
+    increases = np.bincount(inverse, weights=changes > 0, minlength=size)
+    decreases = np.bincount(inverse, weights=changes < 0, minlength=size)
+
+    result = [
+        {
+            'category': str(names[index]),
+            'items': int(items[index]),
+            'increases': int(increases[index]),
+            'decreases': int(decreases[index]),
+            'previous_value': _money(previous_value[index]),
+            'new_value': _money(new_value[index]),
+            'monthly_impact': _money(impact[index]),
+            'avg_change_percentage': _percent(percentage_sum[index] / items[index]) if items[index] else 0.0
+        }
+        for index in range(size)
+    ]
+    result.sort(key=lambda entry: abs(entry['monthly_impact']), reverse=True)
+    return result
+
+
+def analyze_snapshot(snapshot, top_n=MAX_TOP_N):
+    """Calcula a análise completa da tabela a partir do snapshot"""
+    columns = snapshot.columns
+    changes = np.asarray(columns['cost_change'])
+    percentages = np.asarray(columns['cost_change_percentage'])
+    increased = int(np.count_nonzero(changes > 0))
+    decreased = int(np.count_nonzero(changes < 0))
+
+    return {
+        'version': ANALYSIS_VERSION,
+        'cost_table_id': snapshot.cost_table_id,
+        'total_items': len(snapshot),
+        'changes': {
+            'increased': increased,
+            'decreased': decreased,
+            'unchanged': len(snapshot) - increased - decreased
+        },
+        'monthly_impact': _money(np.asarray(columns['monthly_impact']).sum()),
+        'avg_change_percentage': _percent(percentages.mean()) if len(snapshot) else 0.0,
+        'top_by_monthly_impact': _top(snapshot, 'monthly_impact', top_n),
+        'top_by_change_percentage': _top(snapshot, 'cost_change_percentage', top_n),
+        'change_percentage_histogram': _histogram(percentages),
+        'categories': _categories(snapshot, changes)
+    }
+
+
+def analysis_path(cost_table_id):
+    return os.path.join(snapshot_path(cost_table_id), ANALYSIS_FILE)
+
+
+def get_analysis(snapshot):
+    """Análise da tabela, lida do cache ou calculada e gravada na primeira chamada"""
+    path = analysis_path(snapshot.cost_table_id)
+    if os.path.exists(path):
+        with open(path) as f:
+            analysis = json.load(f)
+        if analysis.get('version') == ANALYSIS_VERSION:
+            return analysis
+
+    analysis = analyze_snapshot(snapshot)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(analysis, f)
+    os.replace(temp_path, path)
+    return analysis
+
+
+def limit_top(analysis, top_n):
+    """Recorta as listas de maiores e menores itens para top_n"""
+    top_n = min(max(top_n, 0), MAX_TOP_N)
+    result = dict(analysis)
+    for key in ('top_by_monthly_impact', 'top_by_change_percentage'):
+        result[key] = {side: items[:top_n] for side, items in analysis[key].items()}
+    result.pop('version', None)
+    return result
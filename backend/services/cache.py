@@ -0,0 +1,136 @@
+"""
+Cache das respostas do dashboard, com invalidação por escrita e ETag
+
+Cada entrada vale até o TTL (DASHBOARD_CACHE_TTL, em segundos) ou até a próxima
+escrita em tabelas de custo, aprovações ou fornecedores, o que vier primeiro:
+um commit que altera esses modelos incrementa a geração do cache e descarta
+todas as entradas. Jobs de ingestão gravam em outro processo e invalidam o
+cache ao terminar (services/jobs.py); o TTL cobre qualquer outro escritor.
+
+As respostas levam ETag (hash do corpo) e Cache-Control: private, no-cache, de
+modo que o navegador revalida com If-None-Match. Com a entrada em cache, a
+resposta sai sem consultas ao banco (304 se o ETag bater).
+"""
+
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.approval import Approval
+from models.cost_table import CostTable
+from models.supplier import Supplier
+from services.serialization import dumps
+
+DEFAULT_TTL = 60
+MAX_ENTRIES = 1000
+
+# Escritas nesses modelos invalidam o cache
+WATCHED_MODELS = (CostTable, Approval, Supplier)
+
+_lock = threading.Lock()
+_generation = 0
+_entries = {}  # chave -> (geração, expira_em, valor)
+
+
+class Uncached:
+    """Resultado de build() que deve ser devolvido sem ir para o cache (ex.: respostas de erro)"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def invalidate_cache():
+    """Descarta todas as entradas (nova geração)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def _ttl():
+    return current_app.config.get('DASHBOARD_CACHE_TTL', DEFAULT_TTL)
+
+
+def cached(key, build):
+    """Valor de `key` na geração atual; build() só é chamado se não houver entrada válida
+
+    Um resultado Uncached é devolvido sem ser guardado.
+    """
+    ttl = _ttl()
+    now = time.monotonic()
+    entry = _entries.get(key)
+    if entry and entry[0] == _generation and entry[1] > now:
+        return entry[2]
+
+    generation = _generation
+    value = build()
+    if isinstance(value, Uncached):
+        return value.value
+    if ttl > 0:
+        with _lock:
+            # Uma escrita durante o cálculo invalida o valor recém-calculado
+            if generation == _generation:
+                if len(_entries) >= MAX_ENTRIES:
+                    _entries.clear()
+                _entries[key] = (generation, now + ttl, value)
+    return value
+
+
+def _conditional(body, mimetype='application/json'):
+    """Resposta com ETag; 304 sem corpo se o If-None-Match do cliente bater"""
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(hashlib.md5(body).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def conditional_json(payload):
+    return _conditional(dumps(payload))
+
+
+def cached_view(f):
+    """Guarda a resposta da rota (só status 200), por caminho e parâmetros"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        def build():
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                # Erros (400, 500 transitório) não são guardados nem reaproveitados
+                return Uncached(response)
+            return response.get_data(), response.mimetype
+
+        result = cached(('view', request.full_path), build)
+        if not isinstance(result, tuple):
+            return result
+        body, mimetype = result
+        return _conditional(body, mimetype)
+    return decorated_function
+
+
+def _track_changes(session, flush_context):
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(instance, WATCHED_MODELS) for instance in changed):
+        session.info['cache_invalid'] = True
+
+
+def _invalidate_on_commit(session):
+    if session.info.pop('cache_invalid', False):
+        invalidate_cache()
+
+
+def _discard_on_rollback(session):
+    session.info.pop('cache_invalid', None)
+
+
+def init_cache(app):
+    """Liga a invalidação do cache aos commits da aplicação"""
+    for name, listener in (('after_flush', _track_changes), ('after_commit', _invalidate_on_commit),
+                           ('after_rollback', _discard_on_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
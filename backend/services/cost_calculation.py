@@ -0,0 +1,94 @@
+"""
+Cálculo vetorizado das mudanças de custo e dos totais da tabela
+
+Política de arredondamento: todos os valores são arredondados "meio para cima"
+(half away from zero) na escala da coluna onde serão gravados:
+- custos e variação de custo: 4 casas (Numeric(10, 4))
+- percentuais: 2 casas (Numeric(5, 2))
+- volumes, impactos e totais: 2 casas (Numeric(10, 2), Numeric(12, 2), Numeric(15, 2))
+
+Os valores derivados são calculados a partir dos valores já arredondados das
+colunas de origem, e os totais somam os impactos já arredondados por item, de
+forma que a soma dos itens gravados sempre confere com o total da tabela.
+"""
+
+import numpy as np
+
+COST_SCALE = 4
+PERCENT_SCALE = 2
+MONEY_SCALE = 2
+
+# Tolerância para compensar a representação binária (ex.: 1.005 -> 1.00499999...)
+_ROUNDING_EPSILON = 1e-9
+
+
+def round_half_up(values, scale):
+    """Arredonda (meio para cima) um array ou escalar para `scale` casas decimais"""
+    factor = 10 ** scale
+    values = np.asarray(values, dtype=np.float64)
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5 + _ROUNDING_EPSILON) / factor
+
+
+def compute_cost_changes(df):
+    """Calcula cost_change, cost_change_percentage e monthly_impact de todos os itens
+
+    Equivale a CostItem.calculate_changes aplicado linha a linha, mas em uma única
+    passada sobre os arrays de colunas. Retorna o DataFrame com as colunas normalizadas.
+    """
+    previous_cost = round_half_up(df['previous_cost'].to_numpy(dtype=np.float64), COST_SCALE)
+    new_cost = round_half_up(df['new_cost'].to_numpy(dtype=np.float64), COST_SCALE)
+    monthly_volume = round_half_up(df['monthly_volume'].to_numpy(dtype=np.float64), MONEY_SCALE)
+
+    # Só há variação quando os dois custos são informados (não nulos)
+    has_change = (previous_cost != 0) & (new_cost != 0)
+    cost_change = np.where(has_change, round_half_up(new_cost - previous_cost, COST_SCALE), 0.0)
+
+    has_percentage = has_change & (previous_cost > 0)
+    safe_previous = np.where(has_percentage, previous_cost, 1.0)
+    cost_change_percentage = np.where(
+        has_percentage,
+        round_half_up(cost_change / safe_previous * 100, PERCENT_SCALE),
+        0.0
+    )
+
+    monthly_impact = np.where(
+        has_change & (monthly_volume != 0),
+        round_half_up(cost_change * monthly_volume, MONEY_SCALE),
+        0.0
+    )
+
+    df = df.copy()
+    df['previous_cost'] = previous_cost
+    df['new_cost'] = new_cost
+    df['monthly_volume'] = monthly_volume
+    df['cost_change'] = cost_change
+    df['cost_change_percentage'] = cost_change_percentage
+    df['monthly_impact'] = monthly_impact
+    return df
+
+
+def compute_table_totals(df, previous_total_value=None):
+    """Calcula os totais da tabela a partir dos itens já processados por compute_cost_changes"""
+    new_cost = df['new_cost'].to_numpy(dtype=np.float64)
+    monthly_volume = df['monthly_volume'].to_numpy(dtype=np.float64)
+
+    total_value = float(round_half_up(np.dot(new_cost, monthly_volume), MONEY_SCALE))
+    monthly_impact = float(round_half_up(df['monthly_impact'].to_numpy(dtype=np.float64).sum(), MONEY_SCALE))
+
+    totals = {
+        'total_items': int(len(df)),
+        'total_value': total_value,
+        'monthly_impact': monthly_impact,
+    }
+
+    if previous_total_value is not None:
+        previous_total_value = float(previous_total_value)
+        impact_value = float(round_half_up(total_value - previous_total_value, MONEY_SCALE))
+        totals['previous_total_value'] = previous_total_value
+        totals['impact_value'] = impact_value
+        if previous_total_value > 0:
+            totals['impact_percentage'] = float(
+                round_half_up(impact_value / previous_total_value * 100, PERCENT_SCALE)
+            )
+
+    return totals
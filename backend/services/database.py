@@ -0,0 +1,55 @@
+"""
+Configuração das conexões com o SQLite
+
+O servidor web e os processos do pool de ingestão gravam no mesmo arquivo:
+- journal_mode=WAL: leituras não bloqueiam a gravação (nem o contrário), então
+  as rotas continuam respondendo enquanto um job grava uma tabela grande
+- busy_timeout (SQLITE_BUSY_TIMEOUT, em segundos): quem encontra o banco
+  bloqueado por outro escritor espera o lock em vez de falhar na hora com
+  "database is locked"
+
+As opções vão em SQLALCHEMY_ENGINE_OPTIONS, repassadas também aos processos do pool.
+"""
+
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+DEFAULT_BUSY_TIMEOUT = 30
+
+# Erros do SQLite que somem ao tentar de novo (lock de outro escritor)
+TRANSIENT_ERRORS = ('database is locked', 'database is busy')
+
+
+def engine_options(busy_timeout=DEFAULT_BUSY_TIMEOUT):
+    """Opções do engine: o timeout do driver é o busy_timeout da conexão"""
+    return {'connect_args': {'timeout': busy_timeout}}
+
+
+def is_transient_error(error):
+    """Indica se o erro é um lock temporário do banco (vale tentar de novo)"""
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and any(
+        message in str(error) for message in TRANSIENT_ERRORS
+    )
+
+
+def _configure_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # Persistente no arquivo; bancos em memória seguem no modo 'memory'
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def init_database(app):
+    """Define as opções do engine (se ausentes) e liga o modo WAL a cada nova conexão
+
+    Deve ser chamada antes de db.init_app(app).
+    """
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config.get('SQLITE_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)))
+    if not event.contains(Engine, 'connect', _configure_connection):
+        event.listen(Engine, 'connect', _configure_connection)
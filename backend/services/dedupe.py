@@ -0,0 +1,266 @@
+"""
+Deduplicação de uploads pelo hash SHA256 do arquivo
+
+- Reenvio de um arquivo idêntico pelo mesmo fornecedor: o upload é rejeitado
+  como duplicado ou a tabela existente é clonada sem reprocessar o arquivo.
+- Cache de resultado do parser por hash: arquivos idênticos de fornecedores ou
+  categorias diferentes são lidos uma única vez.
+
+O cache do parser e os relatórios de validação ficam em UPLOAD_FOLDER com
+limite de idade (PARSED_CACHE_MAX_AGE_DAYS) e de tamanho total
+(PARSED_CACHE_MAX_BYTES): a cada gravação, entradas vencidas são apagadas e, se
+o total passar do limite, as mais antigas saem primeiro. Um relatório removido
+deixa de estar disponível para download (404).
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, literal
+
+from models.cost_table import CostTable, CostItem
+from models.ingestion_job import IngestionJob
+from models.user import db
+from services.ingestion import ingest_cost_items, next_version
+from services.sku_matching import resolve_previous_costs
+
+PARSED_CACHE_DIR = 'parsed_cache'
+VALIDATION_REPORT_DIR = 'validation'
+CACHE_DIRS = (PARSED_CACHE_DIR, VALIDATION_REPORT_DIR)
+
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+CLONED_ITEM_COLUMNS = ['sku', 'description', 'category', 'unit', 'previous_cost', 'new_cost',
+                       'cost_change', 'cost_change_percentage', 'monthly_volume', 'monthly_impact']
+CLONED_TABLE_FIELDS = ['total_items', 'total_value', 'monthly_impact', 'previous_total_value',
+                       'impact_value', 'impact_percentage', 'sku_comparison']
+
+# Colunas de entrada do cálculo (o restante é recalculado por ingest_cost_items)
+RESOLVED_ITEM_COLUMNS = ['sku', 'description', 'category', 'unit', 'previous_cost', 'new_cost',
+                         'monthly_volume']
+
+
+def find_duplicate(supplier_id, file_hash):
+    """Retorna a tabela ou o job em andamento do fornecedor com o mesmo arquivo"""
+    cost_table = CostTable.query.filter_by(
+        file_hash=file_hash,
+        supplier_id=supplier_id
+    ).order_by(CostTable.created_at.desc()).first()
+    if cost_table:
+        return cost_table, None
+
+    job = IngestionJob.query.filter(
+        IngestionJob.file_hash == file_hash,
+        IngestionJob.supplier_id == supplier_id,
+        IngestionJob.state.in_(['queued', 'running'])
+    ).first()
+    return None, job
+
+
+def _approved_baseline(table):
+    """Id da tabela aprovada contra a qual os custos anteriores da tabela foram resolvidos"""
+    comparison = table.get_sku_comparison()
+    return comparison.get('approved_cost_table_id') if comparison else None
+
+
+def _copy_items(source_id, cost_table_id):
+    # Cópia dos itens inteiramente no banco (INSERT ... SELECT)
+    items = CostItem.__table__
+    columns = [items.c[name] for name in CLONED_ITEM_COLUMNS]
+    db.session.execute(
+        items.insert().from_select(
+            CLONED_ITEM_COLUMNS + ['cost_table_id', 'created_at'],
+            select(*columns, literal(cost_table_id), literal(datetime.utcnow()))
+            .where(items.c.cost_table_id == source_id)
+            .order_by(items.c.id)
+        )
+    )
+
+
+def _load_items_frame(source_id):
+    """Itens da tabela como DataFrame no formato de entrada de ingest_cost_items"""
+    items = CostItem.__table__
+    rows = db.session.execute(
+        select(*[items.c[name] for name in RESOLVED_ITEM_COLUMNS])
+        .where(items.c.cost_table_id == source_id)
+        .order_by(items.c.id)
+    ).all()
+    df = pd.DataFrame(rows, columns=RESOLVED_ITEM_COLUMNS)
+    for name in ('previous_cost', 'new_cost', 'monthly_volume'):
+        df[name] = df[name].astype('float64')
+    return df
+
+
+def clone_cost_table(source, category, effective_date, submitted_by, comments=''):
+    """Cria uma nova versão com os itens de uma tabela com o mesmo arquivo (sem commit)
+
+    Se a tabela aprovada vigente é a mesma contra a qual a origem foi calculada,
+    itens, totais e comparação de SKUs são copiados literalmente. Se a aprovada
+    mudou, os custos anteriores são resolvidos contra a aprovada vigente, como em
+    create_cost_table, e itens, totais e comparação são recalculados; SKUs fora da
+    aprovada mantêm o previous_cost gravado na origem.
+    """
+    cost_table = CostTable(
+        supplier_id=source.supplier_id,
+        version=next_version(source.supplier_id),
+        filename=source.filename,
+        file_path=source.file_path,
+        file_size=source.file_size,
+        file_hash=source.file_hash,
+        effective_date=effective_date,
+        category=category,
+        status='submitted',
+        submitted_by=submitted_by,
+        comments=comments
+    )
+    db.session.add(cost_table)
+    db.session.flush()
+
+    previous_table = CostTable.query.filter_by(
+        supplier_id=source.supplier_id,
+        status='approved'
+    ).order_by(CostTable.created_at.desc()).first()
+
+    if (previous_table.id if previous_table else None) == _approved_baseline(source):
+        _copy_items(source.id, cost_table.id)
+        for field in CLONED_TABLE_FIELDS:
+            setattr(cost_table, field, getattr(source, field))
+        return cost_table
+
+    df = _load_items_frame(source.id)
+    previous_total_value = None
+    if previous_table:
+        previous_total_value = previous_table.total_value
+        df, comparison = resolve_previous_costs(df, previous_table.id)
+        cost_table.set_sku_comparison(comparison)
+    ingest_cost_items(cost_table, df, previous_total_value)
+
+    return cost_table
+
+
+def _cache_key(file_hash, sheet_name=None):
+    # A planilha escolhida faz parte da chave: o mesmo arquivo gera resultados diferentes
+    if sheet_name:
+        return f"{file_hash}-{hashlib.sha256(sheet_name.encode('utf-8')).hexdigest()[:16]}"
+    return file_hash
+
+
+def _parsed_cache_path(upload_folder, file_hash, sheet_name=None):
+    return os.path.join(upload_folder, PARSED_CACHE_DIR, f'{_cache_key(file_hash, sheet_name)}.pkl')
+
+
+def validation_report_path(file_hash, sheet_name=None, upload_folder=None):
+    """Caminho do relatório de validação (CSV) gerado na leitura deste arquivo"""
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    return os.path.join(upload_folder, VALIDATION_REPORT_DIR, f'{_cache_key(file_hash, sheet_name)}.csv')
+
+
+def save_validation_report(file_hash, report, sheet_name=None, upload_folder=None):
+    """Grava o relatório de validação por hash, para download sem reler o arquivo"""
+    if not file_hash or report is None:
+        return
+    report_path = validation_report_path(file_hash, sheet_name, upload_folder)
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    temp_path = f'{report_path}.{os.getpid()}.tmp'
+    report.write_csv(temp_path)
+    os.replace(temp_path, report_path)
+
+    # Resumo ao lado do relatório, reaproveitado quando o parser sai do cache
+    summary_path = f'{os.path.splitext(report_path)[0]}.json'
+    with open(temp_path, 'w') as f:
+        json.dump(report.summary(), f)
+    os.replace(temp_path, summary_path)
+    prune_cache(upload_folder)
+
+
+def load_validation_summary(file_hash, sheet_name=None, upload_folder=None):
+    """Resumo da validação gravado junto ao relatório, se existir"""
+    if not file_hash:
+        return None
+    summary_path = f'{os.path.splitext(validation_report_path(file_hash, sheet_name, upload_folder))[0]}.json'
+    if not os.path.exists(summary_path):
+        return None
+    with open(summary_path) as f:
+        return json.load(f)
+
+
+def _cache_limits():
+    config = current_app.config
+    max_age_days = config.get('PARSED_CACHE_MAX_AGE_DAYS', DEFAULT_CACHE_MAX_AGE_DAYS)
+    return max_age_days * 86400, config.get('PARSED_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES)
+
+
+def prune_cache(upload_folder=None, max_age_seconds=None, max_bytes=None):
+    """Apaga entradas do cache do parser e relatórios vencidos ou acima do tamanho total
+
+    Retorna o número de arquivos removidos.
+    """
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    if max_age_seconds is None or max_bytes is None:
+        default_age, default_bytes = _cache_limits()
+        max_age_seconds = default_age if max_age_seconds is None else max_age_seconds
+        max_bytes = default_bytes if max_bytes is None else max_bytes
+
+    entries = []
+    for name in CACHE_DIRS:
+        directory = os.path.join(upload_folder, name)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Removido por outro processo
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # Mais antigos primeiro: saem por idade e depois até caber no limite de tamanho
+    entries.sort()
+    cutoff = time.time() - max_age_seconds
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    return removed
+
+
+def load_parsed_result(file_hash, sheet_name=None, upload_folder=None):
+    """Retorna o DataFrame já processado para este hash, se existir no cache"""
+    if not file_hash:
+        return None
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    cache_path = _parsed_cache_path(upload_folder, file_hash, sheet_name)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        return pd.read_pickle(cache_path)
+    except Exception:
+        # Entrada corrompida: descarta e reprocessa o arquivo
+        os.remove(cache_path)
+        return None
+
+
+def save_parsed_result(file_hash, df, sheet_name=None, upload_folder=None):
+    """Guarda o resultado do parser no cache, gravando de forma atômica"""
+    if not file_hash:
+        return
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    cache_path = _parsed_cache_path(upload_folder, file_hash, sheet_name)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    df.to_pickle(temp_path)
+    os.replace(temp_path, cache_path)
+    prune_cache(upload_folder)
@@ -0,0 +1,120 @@
+"""
+Exportação dos itens de uma tabela de custos para CSV ou XLSX
+
+As linhas saem do snapshot colunar (memory map, ordenado por sku, id) em lotes
+de tamanho fixo, de modo que a memória não cresce com o tamanho da tabela:
+
+- csv: cada lote é escrito e enviado ao cliente assim que é gerado
+- xlsx: workbook do openpyxl em modo write-only (linhas vão direto para o
+  arquivo temporário, sem manter as células em memória), enviado em blocos e
+  apagado ao fim do envio
+
+O filtro `search` é o mesmo de /items (índice FTS5): a busca só devolve os ids
+dos itens encontrados, e as linhas continuam vindo do snapshot, na ordem por sku.
+Os cabeçalhos são os nomes das colunas aceitos no upload, então o arquivo
+exportado pode ser reenviado.
+"""
+
+import csv
+import io
+import os
+import tempfile
+
+import numpy as np
+from openpyxl import Workbook
+
+from models.cost_table import CostItem
+from models.user import db
+from services.search import search_cost_items
+from services.snapshots import SNAPSHOT_COLUMNS
+
+EXPORT_COLUMNS = SNAPSHOT_COLUMNS
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_columns(value):
+    """Colunas pedidas em ?columns=a,b,c (todas se vazio), na ordem pedida"""
+    if not value:
+        return list(EXPORT_COLUMNS)
+    columns = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in columns if name not in EXPORT_COLUMNS]
+    if unknown:
+        raise ExportError(f"Colunas desconhecidas: {', '.join(unknown)}. "
+                          f"Disponíveis: {', '.join(EXPORT_COLUMNS)}")
+    return columns
+
+
+def search_positions(snapshot, search):
+    """Posições no snapshot (ordem sku, id) dos itens que casam com a busca"""
+    query = search_cost_items(db.session.query(CostItem.id), CostItem, search,
+                              cost_table_id=snapshot.cost_table_id).order_by(None)
+    ids = np.fromiter((row[0] for row in db.session.execute(query.statement)), dtype=np.int64)
+    return np.flatnonzero(np.isin(snapshot.columns['id'], ids))
+
+
+def iter_row_batches(snapshot, columns, positions=None, batch_size=1000):
+    """Linhas (listas de valores) em lotes de até batch_size
+
+    Sem `positions`, percorre o snapshot inteiro em fatias contíguas.
+    """
+    total = len(snapshot) if positions is None else len(positions)
+    for start in range(0, total, batch_size):
+        if positions is None:
+            selector = slice(start, start + batch_size)
+        else:
+            selector = positions[start:start + batch_size]
+        values = [snapshot.columns[name][selector].tolist() for name in columns]
+        yield list(zip(*values))
+
+
+def csv_chunks(columns, batches):
+    """Partes do CSV: cabeçalho e depois um bloco de texto por lote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def write_xlsx(columns, batches, directory=None):
+    """Grava os lotes em um XLSX temporário (write-only) e retorna o caminho"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Itens')
+    sheet.append(columns)
+    for batch in batches:
+        for row in batch:
+            sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+    os.close(fd)
+    try:
+        workbook.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def file_chunks(path, block_size, remove=True):
+    """Lê o arquivo em blocos; com remove, apaga ao terminar (ou se o envio for interrompido)"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    finally:
+        if remove and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,46 @@
+"""
+Identidade do usuário logado, resolvida uma vez por requisição
+
+O usuário da sessão é carregado na primeira chamada a current_identity() e
+guardado em g: role, categorias que pode aprovar e fornecedor vinculado
+(users.supplier_id) ficam disponíveis para o resto da requisição sem novas
+consultas. O filtro de fornecedor (um usuário fornecedor só vê os dados do
+próprio fornecedor) usa o vínculo, sem buscar o fornecedor pelo email.
+
+Os valores são copiados do usuário ao resolver a identidade e continuam
+válidos depois de um commit (que expira a instância do ORM).
+"""
+
+from flask import g, session
+
+from models.user import User, db
+
+
+class Identity:
+    def __init__(self, user):
+        self.user = user
+        self.id = user.id
+        self.role = user.role
+        self.email = user.email
+        self.supplier_id = user.supplier_id
+        self.categories = user.get_categories()
+
+    @property
+    def is_supplier(self):
+        return self.role == 'supplier'
+
+    def has_role(self, roles):
+        return self.role in roles
+
+    def can_access_supplier(self, supplier_id):
+        """Usuários fornecedores só acessam o fornecedor vinculado"""
+        return not self.is_supplier or (self.supplier_id is not None and self.supplier_id == supplier_id)
+
+
+def current_identity():
+    """Identidade da requisição (None sem login ou se o usuário não existe mais)"""
+    if 'identity' not in g:
+        user_id = session.get('user_id')
+        user = db.session.get(User, user_id) if user_id is not None else None
+        g.identity = Identity(user) if user else None
+    return g.identity
@@ -0,0 +1,175 @@
+"""
+Ingestão em lote dos itens de tabelas de custo
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import Column, Float, MetaData, Table, cast, func, select
+from models.cost_table import CostTable, CostItem
+from models.user import db
+from services.cost_calculation import compute_cost_changes, compute_table_totals
+from services.readers import read_cost_frame
+from services.sku_matching import resolve_previous_costs
+from services.validation import CostFrameValidator
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+REQUIRED_COLUMNS = ['sku', 'description', 'new_cost']
+OPTIONAL_DEFAULTS = (('category', ''), ('unit', 'UN'), ('previous_cost', 0), ('monthly_volume', 0))
+
+
+class MissingColumnsError(ValueError):
+    pass
+
+
+def prepare_cost_chunk(chunk):
+    """Confere as colunas obrigatórias e preenche as opcionais ausentes com o padrão"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+    if missing_columns:
+        raise MissingColumnsError(f"Colunas obrigatórias ausentes: {', '.join(missing_columns)}")
+    
+    for column, default in OPTIONAL_DEFAULTS:
+        if column not in chunk.columns:
+            chunk[column] = default
+    return chunk
+
+
+def read_cost_table_file(source, filename, sheet_name=None, trace_memory=True):
+    """Lê, valida e limpa o arquivo de tabela de custos (caminho ou buffer já aberto)
+
+    Cada bloco lido é validado e convertido na hora; só as linhas válidas ficam em
+    memória. Retorna (df, error, stats), com tempo de leitura e pico de memória em
+    stats e o relatório de validação das linhas em stats['validation'].
+    """
+    stats = None
+    validator = CostFrameValidator()
+    try:
+        # Leitura em blocos, apenas com as colunas usadas na ingestão
+        df, stats = read_cost_frame(source, filename, sheet_name=sheet_name, trace_memory=trace_memory,
+                                    convert=lambda chunk: validator(prepare_cost_chunk(chunk)))
+        stats['validation'] = validator.report()
+        stats['validate_seconds'] = stats['convert_seconds']
+        
+        if len(df) == 0:
+            return None, "Nenhum item válido encontrado no arquivo", stats
+        
+        return df, None, stats
+        
+    except MissingColumnsError as e:
+        return None, str(e), stats
+    except Exception as e:
+        return None, f"Erro ao processar arquivo: {str(e)}", stats
+
+
+ITEM_COLUMNS = ['sku', 'description', 'category', 'unit', 'previous_cost', 'new_cost',
+                'cost_change', 'cost_change_percentage', 'monthly_volume', 'monthly_impact']
+
+
+def build_item_records(cost_table_id, df):
+    """Converte o DataFrame já calculado em registros prontos para INSERT"""
+    created_at = datetime.utcnow()
+    columns = [df[name].tolist() for name in ITEM_COLUMNS]
+    return [
+        dict(zip(ITEM_COLUMNS, values), cost_table_id=cost_table_id, created_at=created_at)
+        for values in zip(*columns)
+    ]
+
+
+# Tabela temporária (por conexão, sem triggers) por onde os itens passam antes de
+# cost_items: um único INSERT ... SELECT faz os triggers do índice de busca rodarem
+# em uma só instrução, em vez de uma instrução por linha do executemany
+STAGED_COLUMNS = ITEM_COLUMNS + ['cost_table_id', 'created_at']
+cost_items_staging = Table(
+    'cost_items_staging', MetaData(),
+    *[Column(name, CostItem.__table__.c[name].type) for name in STAGED_COLUMNS],
+    prefixes=['TEMPORARY']
+)
+
+
+def bulk_insert_cost_items(records, chunk_size=None):
+    """Insere os itens em lotes (executemany), sem passar pelo identity map do ORM"""
+    if chunk_size is None:
+        chunk_size = current_app.config.get('INGEST_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+    cost_items_staging.create(bind=db.session.connection(), checkfirst=True)
+
+    statement = cost_items_staging.insert()
+    for start in range(0, len(records), chunk_size):
+        db.session.execute(statement, records[start:start + chunk_size])
+
+    db.session.execute(
+        CostItem.__table__.insert().from_select(STAGED_COLUMNS, select(*cost_items_staging.c))
+    )
+    db.session.execute(cost_items_staging.delete())
+
+    return len(records)
+
+
+def ingest_cost_items(cost_table, df, previous_total_value=None, chunk_size=None):
+    """Calcula e persiste os itens da tabela, atualizando seus totais
+
+    Retorna o DataFrame calculado (uma linha por item gravado).
+    """
+    df = compute_cost_changes(df)
+    bulk_insert_cost_items(build_item_records(cost_table.id, df), chunk_size)
+
+    for field, value in compute_table_totals(df, previous_total_value).items():
+        setattr(cost_table, field, value)
+
+    return df
+
+
+def next_version(supplier_id):
+    """Próxima versão da tabela de custos do fornecedor (v1.0, v1.1, ...)
+
+    Retorna uma expressão SQL avaliada dentro do próprio INSERT: a leitura da
+    última versão fica sob o lock de escrita, então duas gravações nunca recebem
+    a mesma versão.
+    """
+    latest = (
+        select(func.max(cast(func.substr(CostTable.version, 2), Float)))
+        .where(CostTable.supplier_id == supplier_id)
+        .scalar_subquery()
+    )
+    return func.printf('v%.1f', func.coalesce(latest + 0.1, 1.0))
+
+
+def create_cost_table(df, supplier_id, category, effective_date, submitted_by, filename,
+                      file_path, file_size=None, file_hash=None, comments=''):
+    """Cria a tabela de custos com seus itens e totais (sem commit)"""
+    cost_table = CostTable(
+        supplier_id=supplier_id,
+        version=next_version(supplier_id),
+        filename=filename,
+        file_path=file_path,
+        file_size=file_size,
+        file_hash=file_hash,
+        effective_date=effective_date,
+        category=category,
+        status='submitted',
+        total_items=len(df),
+        submitted_by=submitted_by,
+        comments=comments
+    )
+
+    db.session.add(cost_table)
+    db.session.flush()  # Para obter o ID
+
+    # Tabela aprovada anterior, base para o cálculo de impacto
+    previous_table = CostTable.query.filter_by(
+        supplier_id=supplier_id,
+        status='approved'
+    ).order_by(CostTable.created_at.desc()).first()
+    previous_total_value = previous_table.total_value if previous_table else None
+
+    # Custo anterior de cada SKU vem da tabela aprovada (cruzamento em memória)
+    if previous_table:
+        df, comparison = resolve_previous_costs(df, previous_table.id)
+        cost_table.set_sku_comparison(comparison)
+
+    # Calcular e gravar itens e totais em lote
+    ingest_cost_items(cost_table, df, previous_total_value)
+
+    return cost_table
@@ -0,0 +1,317 @@
+"""
+Jobs de ingestão em segundo plano
+
+Os arquivos recebidos são processados localmente (sem broker externo), em duas fases:
+- leitura: um pool de INGEST_WORKERS processos lê e valida os arquivos em paralelo
+  e guarda o DataFrame no cache por hash (services.dedupe)
+- gravação: um único processo gravador persiste os jobs lidos, um de cada vez,
+  de modo que o SQLite nunca recebe dois escritores de ingestão ao mesmo tempo
+
+O estado de cada job fica na tabela ingestion_jobs, de modo que jobs
+interrompidos por um reinício do servidor são reenfileirados na inicialização.
+
+Um job que falha por lock temporário do banco (outro escritor segurou o lock
+além do busy_timeout) volta para a fila e é reenviado até MAX_TRANSIENT_RETRIES
+vezes; o arquivo só é apagado quando a falha é do próprio arquivo.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from flask import Flask, current_app
+from models.user import db, User
+from models.supplier import Supplier
+from models.cost_table import CostTable, CostItem
+from models.approval import Approval, ApprovalTemplate
+from models.ingestion_job import IngestionJob
+from services.cache import invalidate_cache
+from services.database import init_database, is_transient_error
+from services.dedupe import (load_parsed_result, save_parsed_result, save_validation_report,
+                             load_validation_summary)
+from services.ingestion import read_cost_table_file, create_cost_table
+from services.snapshots import write_snapshot
+from services.uploads import open_upload_buffer
+
+DEFAULT_WORKERS = 2
+MAX_TRANSIENT_RETRIES = 3
+
+# Resultados das fases: leitura concluída (segue para o gravador) ou reenvio
+PARSED = 'parsed'
+RETRY = 'retry'
+
+# Configurações repassadas aos processos do pool
+WORKER_CONFIG_KEYS = ['SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_TRACK_MODIFICATIONS', 'SQLALCHEMY_ENGINE_OPTIONS',
+                      'SQLITE_BUSY_TIMEOUT', 'UPLOAD_FOLDER', 'INGEST_CHUNK_SIZE', 'INGEST_TRACE_MEMORY']
+
+_executor = None
+_writer = None
+_executor_lock = threading.Lock()
+_worker_app = None
+
+
+def get_executor(app):
+    """Retorna o pool de processos de leitura compartilhado, criando-o sob demanda"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('INGEST_WORKERS', DEFAULT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def get_writer(app):
+    """Retorna o processo gravador único: as gravações dos jobs nunca concorrem entre si"""
+    global _writer
+    with _executor_lock:
+        if _writer is None:
+            _writer = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _writer
+
+
+def worker_config(app):
+    return {key: app.config[key] for key in WORKER_CONFIG_KEYS if key in app.config}
+
+
+def submit_job(app, job_id, attempt=0):
+    """Envia um job para o pool de leitura; a gravação segue depois para o gravador"""
+    future = get_executor(app).submit(run_parse_phase, worker_config(app), job_id)
+    future.add_done_callback(lambda f: _parse_done(app, job_id, attempt, f))
+    return future
+
+
+def _phase_result(future):
+    if future.cancelled() or future.exception() is not None:
+        return None
+    return future.result()
+
+
+def _parse_done(app, job_id, attempt, future):
+    result = _phase_result(future)
+    if result == PARSED:
+        writer_future = get_writer(app).submit(run_persist_phase, worker_config(app), job_id)
+        writer_future.add_done_callback(lambda f: _persist_done(app, job_id, attempt, f))
+    elif result == RETRY:
+        _retry_job(app, job_id, attempt)
+
+
+def _persist_done(app, job_id, attempt, future):
+    # O gravador escreve a tabela de custo em outro processo: o cache do dashboard é descartado ao terminar
+    invalidate_cache()
+    if _phase_result(future) == RETRY:
+        _retry_job(app, job_id, attempt)
+
+
+def _retry_job(app, job_id, attempt):
+    # O job volta pelo pool de leitura, que reaproveita o DataFrame do cache
+    if attempt < MAX_TRANSIENT_RETRIES:
+        submit_job(app, job_id, attempt + 1)
+        return
+
+    # Tentativas esgotadas: falha, mas o arquivo fica para reenvio manual
+    with app.app_context():
+        job = db.session.get(IngestionJob, job_id)
+        _fail_job(job_id, f'{job.error} (após {attempt + 1} tentativas)', remove_file=False)
+
+
+def resume_pending_jobs(app):
+    """Reenfileira jobs que não terminaram antes do último desligamento do servidor"""
+    # Processos do pool também importam a aplicação; só o processo principal retoma jobs
+    if multiprocessing.parent_process() is not None:
+        return []
+
+    with app.app_context():
+        jobs = IngestionJob.query.filter(IngestionJob.state.in_(['queued', 'running'])).all()
+        for job in jobs:
+            job.state = 'queued'
+            job.phase = None
+        db.session.commit()
+        job_ids = [job.id for job in jobs]
+
+    for job_id in job_ids:
+        submit_job(app, job_id)
+    return job_ids
+
+
+def _get_worker_app(config):
+    """Aplicação mínima usada dentro dos processos do pool (uma por processo)"""
+    global _worker_app
+    if _worker_app is None:
+        _worker_app = Flask(__name__)
+        _worker_app.config.update(config)
+        init_database(_worker_app)
+        db.init_app(_worker_app)
+    return _worker_app
+
+
+def run_parse_phase(config, job_id):
+    """Ponto de entrada executado no pool de leitura"""
+    with _get_worker_app(config).app_context():
+        try:
+            return parse_job(job_id)
+        finally:
+            db.session.remove()
+
+
+def run_persist_phase(config, job_id):
+    """Ponto de entrada executado no processo gravador"""
+    with _get_worker_app(config).app_context():
+        try:
+            return persist_job(job_id)
+        finally:
+            db.session.remove()
+
+
+def _claim_job(job_id, state, phase, new_phase):
+    """Avança a fase do job; retorna False se outro processo já o assumiu"""
+    now = datetime.utcnow()
+    values = {'state': 'running', 'phase': new_phase, 'updated_at': now}
+    if state == 'queued':
+        values['started_at'] = now
+    result = db.session.execute(
+        IngestionJob.__table__.update()
+        .where(IngestionJob.id == job_id, IngestionJob.state == state, IngestionJob.phase.is_(phase))
+        .values(**values)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _fail_job(job_id, error, keep_changes=False, remove_file=True):
+    if not keep_changes:
+        db.session.rollback()
+    job = db.session.get(IngestionJob, job_id)
+    job.state = 'failed'
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    # O arquivo inválido não é mantido
+    if remove_file and job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def _requeue_job(job_id, error):
+    """Devolve o job à fila após um lock temporário do banco (nada do job foi gravado)"""
+    db.session.rollback()
+    job = db.session.get(IngestionJob, job_id)
+    job.state = 'queued'
+    job.phase = None
+    job.error = f'Banco de dados ocupado, nova tentativa: {error}'
+    db.session.commit()
+    return RETRY
+
+
+def _read_job_file(job):
+    """Lê o arquivo do job, registrando tempos, memória e o relatório de validação"""
+    with open_upload_buffer(job.file_path) as buffer:
+        df, error, stats = read_cost_table_file(
+            buffer, job.filename,
+            sheet_name=job.sheet_name,
+            trace_memory=current_app.config.get('INGEST_TRACE_MEMORY', True)
+        )
+    if stats:
+        job.read_seconds = stats['read_seconds']
+        job.peak_memory_bytes = stats['peak_memory_bytes']
+        # Relatório por linha fica disponível para download mesmo se o arquivo falhar
+        report = stats.get('validation')
+        if report is not None:
+            save_validation_report(job.file_hash, report, job.sheet_name)
+            job.set_validation_summary(report.summary())
+    return df, error
+
+
+def parse_job(job_id):
+    """Fase 1 (pool de leitura): lê o arquivo e deixa o DataFrame no cache por hash
+
+    Retorna PARSED quando o job deve seguir para o gravador.
+    """
+    if not _claim_job(job_id, 'queued', None, 'parsing'):
+        return None
+
+    job = db.session.get(IngestionJob, job_id)
+    try:
+        start = time.perf_counter()
+        df = load_parsed_result(job.file_hash, job.sheet_name)
+        if df is None:
+            df, error = _read_job_file(job)
+            if error:
+                job.parse_seconds = time.perf_counter() - start
+                _fail_job(job_id, error, keep_changes=True)
+                return None
+            save_parsed_result(job.file_hash, df, job.sheet_name)
+        else:
+            job.set_validation_summary(load_validation_summary(job.file_hash, job.sheet_name))
+        job.parse_seconds = time.perf_counter() - start
+
+        job.rows_total = len(df)
+        job.phase = 'parsed'
+        db.session.commit()
+
+    except Exception as e:
+        if is_transient_error(e):
+            return _requeue_job(job_id, str(getattr(e, 'orig', e)))
+        _fail_job(job_id, f"Erro ao processar arquivo: {str(e)}")
+        return None
+
+    return PARSED
+
+
+def persist_job(job_id):
+    """Fase 2 (gravador único): grava a tabela e os itens em uma única transação"""
+    if not _claim_job(job_id, 'running', 'parsed', 'persisting'):
+        return None
+
+    job = db.session.get(IngestionJob, job_id)
+    try:
+        start = time.perf_counter()
+        df = load_parsed_result(job.file_hash, job.sheet_name)
+        if df is None:
+            # Entrada removida do cache entre as fases: o arquivo é lido de novo
+            df, error = _read_job_file(job)
+            if error:
+                _fail_job(job_id, error, keep_changes=True)
+                return None
+
+        cost_table = create_cost_table(
+            df,
+            supplier_id=job.supplier_id,
+            category=job.category,
+            effective_date=job.effective_date,
+            submitted_by=job.submitted_by,
+            filename=job.filename,
+            file_path=job.file_path,
+            file_size=job.file_size,
+            file_hash=job.file_hash,
+            comments=job.comments
+        )
+        job.cost_table_id = cost_table.id
+        job.rows_processed = cost_table.total_items
+        job.persist_seconds = time.perf_counter() - start
+        job.state = 'completed'
+        job.phase = None
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    except Exception as e:
+        if is_transient_error(e):
+            return _requeue_job(job_id, str(getattr(e, 'orig', e)))
+        _fail_job(job_id, f"Erro ao processar arquivo: {str(e)}")
+        return None
+
+    # Snapshot colunar para as rotas de leitura; se falhar, é gerado na primeira leitura
+    try:
+        write_snapshot(job.cost_table_id)
+    except Exception:
+        db.session.rollback()
+
+    return job_id
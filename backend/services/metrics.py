@@ -0,0 +1,302 @@
+"""
+Métricas do dashboard
+
+- mensais: cada métrica é uma única consulta agrupada por strftime('%Y-%m', ...),
+  e o número de consultas não depende de quantos meses são pedidos. Meses sem
+  registros não voltam do banco e são preenchidos com zero aqui.
+- status, categorias e fornecedores: lidas das tabelas de agregados
+  (services/rollups.py), sem percorrer cost_tables.
+- tempos de aprovação: percentis por tipo de aprovação, fornecedor e categoria
+  numa única consulta com funções de janela, em horas.
+- visão geral: a parte global (igual para todos os usuários) fica separada da
+  parte de cada usuário (aprovações pendentes e em atraso), para que a global
+  seja calculada uma vez e compartilhada pelo cache (services/cache.py).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+
+from models.approval import Approval
+from models.cost_table import CostTable
+from models.supplier import Supplier
+from models.user import db
+from services.rollups import rollup_approved_months, rollup_cost_tables, rollup_suppliers
+
+# Roles que veem as aprovações em atraso de todos
+OVERDUE_ROLES = ['admin', 'commercial_manager', 'commercial_director', 'vp_commercial']
+
+# Status cujo impacto entra no impacto financeiro do mês
+ACTIVE_IMPACT_STATUSES = ['approved', 'under_review', 'pricing_analysis', 'commercial_review']
+
+MAX_MONTHS = 120
+
+# Percentis dos tempos de aprovação
+APPROVAL_TIME_PERCENTILES = [50, 90, 99]
+
+
+def calendar_months(count, now=None):
+    """Primeiro dia do mês mais antigo e as chaves 'AAAA-MM' dos `count` meses até o atual"""
+    now = now or datetime.utcnow()
+    keys = []
+    year, month = now.year, now.month
+    for _ in range(count):
+        keys.append(f'{year:04d}-{month:02d}')
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    keys.reverse()
+    start_year, start_month = map(int, keys[0].split('-'))
+    return datetime(start_year, start_month, 1), keys
+
+
+def month_bucket(column):
+    return func.strftime('%Y-%m', column)
+
+
+def monthly_metrics(months, now=None):
+    """Submetidas, aprovadas, impacto aprovado e taxa de aprovação por mês (ordem cronológica)"""
+    months = min(max(months, 1), MAX_MONTHS)
+    start, keys = calendar_months(months, now)
+
+    # Tabelas submetidas por mês de criação
+    submitted_bucket = month_bucket(CostTable.created_at)
+    submitted = dict(db.session.query(
+        submitted_bucket,
+        func.count(CostTable.id)
+    ).filter(
+        CostTable.created_at >= start
+    ).group_by(submitted_bucket).all())
+
+    # Tabelas aprovadas e impacto por mês da aprovação (última atualização)
+    approved_bucket = month_bucket(CostTable.updated_at)
+    approved = {
+        month: (count, impact)
+        for month, count, impact in db.session.query(
+            approved_bucket,
+            func.count(CostTable.id),
+            func.sum(CostTable.monthly_impact)
+        ).filter(
+            CostTable.status == 'approved',
+            CostTable.updated_at >= start
+        ).group_by(approved_bucket).all()
+    }
+
+    result = []
+    for month in keys:
+        submitted_count = submitted.get(month, 0)
+        approved_count, impact = approved.get(month, (0, 0))
+        result.append({
+            'month': month,
+            'submitted': submitted_count,
+            'approved': approved_count,
+            'impact': float(impact or 0),
+            'approval_rate': (approved_count / submitted_count * 100) if submitted_count > 0 else 0
+        })
+    return result
+
+
+def _money(cents_total):
+    """Soma em centavos dos agregados como valor em reais (2 casas)"""
+    return round((cents_total or 0) / 100, 2)
+
+
+def _hours(value):
+    return round(float(value or 0), 2)
+
+
+def _approved_count(rollup):
+    return func.sum(case((rollup.c.status == 'approved', rollup.c.table_count), else_=0))
+
+
+def status_summary():
+    """Número de tabelas de custo por status"""
+    rollup = rollup_cost_tables
+    rows = db.session.execute(
+        select(rollup.c.status, func.sum(rollup.c.table_count)).group_by(rollup.c.status)
+    ).all()
+    return {status: int(count) for status, count in rows if count}
+
+
+def current_month_overview(now=None):
+    """Impacto das tabelas criadas no mês atual e tabelas aprovadas no mês"""
+    now = now or datetime.utcnow()
+    month = f'{now.year:04d}-{now.month:02d}'
+
+    monthly_impact = db.session.execute(
+        select(func.sum(rollup_cost_tables.c.impact_cents)).where(
+            rollup_cost_tables.c.month == month,
+            rollup_cost_tables.c.status.in_(ACTIVE_IMPACT_STATUSES)
+        )
+    ).scalar()
+    approved = db.session.execute(
+        select(rollup_approved_months.c.table_count).where(rollup_approved_months.c.month == month)
+    ).scalar()
+    return {'monthly_impact': _money(monthly_impact), 'approved_this_month': int(approved or 0)}
+
+
+def overview_totals(now=None):
+    """Parte da visão geral que não depende do usuário"""
+    status_counts = status_summary()
+    return {
+        'total_suppliers': Supplier.query.filter_by(status='active').count(),
+        'total_cost_tables': sum(status_counts.values()),
+        **current_month_overview(now),
+        'status_summary': status_counts
+    }
+
+
+def user_overview(user, now=None):
+    """Aprovações pendentes para o usuário e em atraso (apenas para gestores)"""
+    pending_approvals = 0
+    if not user.is_supplier:
+        pending_approvals = Approval.query.filter(Approval.pending_for(user.id)).count()
+
+    overdue_approvals = 0
+    if user.has_role(OVERDUE_ROLES):
+        overdue_approvals = Approval.query.filter(
+            Approval.status == 'pending',
+            Approval.deadline < (now or datetime.utcnow())
+        ).count()
+    return {'pending_approvals': pending_approvals, 'overdue_approvals': overdue_approvals}
+
+
+def category_metrics():
+    """Tabelas, impacto e aprovações por categoria, da maior para a menor em impacto"""
+    rollup = rollup_cost_tables
+    rows = db.session.execute(
+        select(
+            rollup.c.category,
+            func.sum(rollup.c.table_count).label('total_tables'),
+            func.sum(rollup.c.impact_cents).label('total_impact'),
+            _approved_count(rollup).label('approved_tables')
+        ).group_by(rollup.c.category)
+    ).all()
+
+    result = []
+    for row in rows:
+        result.append({
+            'category': row.category,
+            'total_tables': int(row.total_tables),
+            'total_impact': _money(row.total_impact),
+            'avg_impact': _money(row.total_impact / row.total_tables) if row.total_tables else 0,
+            'approved_tables': int(row.approved_tables),
+            'approval_rate': (row.approved_tables / row.total_tables * 100) if row.total_tables > 0 else 0
+        })
+    result.sort(key=lambda entry: entry['total_impact'], reverse=True)
+    return result
+
+
+def supplier_metrics(limit):
+    """Fornecedores com maior impacto total, com tabelas e aprovações"""
+    rollup = rollup_suppliers
+    total_impact = func.sum(rollup.c.impact_cents)
+    rows = db.session.execute(
+        select(
+            Supplier.id,
+            Supplier.name,
+            total_impact.label('total_impact'),
+            func.sum(rollup.c.table_count).label('total_tables'),
+            _approved_count(rollup).label('approved_tables')
+        ).select_from(rollup).join(Supplier, Supplier.id == rollup.c.supplier_id)
+        .group_by(Supplier.id, Supplier.name)
+        .order_by(total_impact.desc())
+        .limit(limit)
+    ).all()
+
+    return [
+        {
+            'supplier_id': row.id,
+            'supplier_name': row.name,
+            'total_impact': _money(row.total_impact),
+            'total_tables': int(row.total_tables),
+            'approved_tables': int(row.approved_tables),
+            'approval_rate': (row.approved_tables / row.total_tables * 100) if row.total_tables > 0 else 0
+        }
+        for row in rows
+    ]
+
+
+def approval_hours():
+    """Horas entre a atribuição e a decisão da aprovação"""
+    return (func.julianday(Approval.decision_date) - func.julianday(Approval.assigned_at)) * 24
+
+
+def decided_approvals_since(start):
+    """Condições das aprovações decididas desde `start` (com data de atribuição)"""
+    return (Approval.decision_date.isnot(None), Approval.assigned_at.isnot(None), Approval.decision_date >= start)
+
+
+def decided_approval_rows(start):
+    """Consulta das aprovações decididas desde `start`, com duração em horas e fornecedor"""
+    return db.session.query(
+        Approval.id,
+        Approval.approval_type,
+        Approval.status,
+        Approval.decision_date,
+        approval_hours().label('hours'),
+        Supplier.name.label('supplier_name')
+    ).join(CostTable, CostTable.id == Approval.cost_table_id).join(
+        Supplier, Supplier.id == CostTable.supplier_id
+    ).filter(*decided_approvals_since(start))
+
+
+def approval_time_percentiles(start):
+    """Quantidade, média e percentis (em horas) por tipo de aprovação, fornecedor e categoria
+
+    Cada grupo ordena suas durações com row_number(); o percentil p é a menor
+    duração cuja posição alcança p% do grupo (nearest rank).
+    """
+    durations = select(
+        Approval.approval_type,
+        CostTable.supplier_id,
+        Supplier.name.label('supplier_name'),
+        CostTable.category,
+        approval_hours().label('hours')
+    ).join(CostTable, CostTable.id == Approval.cost_table_id).join(
+        Supplier, Supplier.id == CostTable.supplier_id
+    ).where(*decided_approvals_since(start)).cte('durations')
+
+    groups = union_all(
+        select(literal('approval_type').label('dimension'), durations.c.approval_type.label('key'),
+               durations.c.approval_type.label('label'), durations.c.hours),
+        select(literal('supplier'), cast(durations.c.supplier_id, String), durations.c.supplier_name,
+               durations.c.hours),
+        select(literal('category'), durations.c.category, durations.c.category, durations.c.hours)
+    ).subquery('groups')
+
+    partition = [groups.c.dimension, groups.c.key]
+    ranked = select(
+        groups,
+        func.row_number().over(partition_by=partition, order_by=groups.c.hours).label('position'),
+        func.count().over(partition_by=partition).label('group_size')
+    ).subquery('ranked')
+
+    percentiles = [
+        func.min(case((ranked.c.position * 100 >= percentile * ranked.c.group_size, ranked.c.hours)))
+        .label(f'p{percentile}_hours')
+        for percentile in APPROVAL_TIME_PERCENTILES
+    ]
+    rows = db.session.execute(
+        select(
+            ranked.c.dimension,
+            ranked.c.key,
+            func.max(ranked.c.label).label('label'),
+            func.count().label('count'),
+            func.avg(ranked.c.hours).label('avg_hours'),
+            *percentiles
+        ).group_by(ranked.c.dimension, ranked.c.key)
+    ).all()
+
+    result = {'approval_type': [], 'supplier': [], 'category': []}
+    for row in rows:
+        entry = {'count': row.count, 'avg_hours': _hours(row.avg_hours)}
+        for percentile in APPROVAL_TIME_PERCENTILES:
+            entry[f'p{percentile}_hours'] = _hours(getattr(row, f'p{percentile}_hours'))
+        if row.dimension == 'supplier':
+            entry = {'supplier_id': int(row.key), 'supplier_name': row.label, **entry}
+        else:
+            entry = {row.dimension: row.key, **entry}
+        result[row.dimension].append(entry)
+
+    for entries in result.values():
+        entries.sort(key=lambda entry: entry['count'], reverse=True)
+    return result
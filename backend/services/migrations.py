@@ -0,0 +1,175 @@
+"""
+Migrações versionadas do esquema do banco
+
+`db.create_all()` só cria tabelas ausentes: não adiciona colunas nem índices a
+tabelas que já existem. As alterações de esquema de bancos já em uso ficam
+aqui, numeradas, e cada uma é aplicada uma única vez (a versão aplicada fica
+registrada em schema_migrations).
+
+Os modelos continuam declarando o esquema final (colunas e índices), usado por
+create_all em bancos novos; por isso toda migração deve ser idempotente
+(IF NOT EXISTS, verificação da coluna antes do ALTER TABLE). Todo índice ou
+coluna novo declarado nos modelos precisa de uma migração correspondente.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from services.reporting import drop_report_cube, ensure_report_cube
+from services.rollups import drop_rollups, ensure_rollups
+from services.search import ensure_search_index
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Registra a função como a migração `version`"""
+    def register(function):
+        MIGRATIONS.append((version, name, function))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return function
+    return register
+
+
+def table_columns(connection, table):
+    return {row[1] for row in connection.execute(text(f'PRAGMA table_info({table})'))}
+
+
+def add_column(connection, table, column, column_type):
+    """ALTER TABLE ADD COLUMN, se a coluna ainda não existir"""
+    if column not in table_columns(connection, table):
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+
+
+def create_index(connection, name, table, columns, unique=False):
+    connection.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+        f"ON {table} ({', '.join(columns)})"
+    ))
+
+
+def drop_index(connection, name):
+    connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+
+@migration(1, 'Índices de deduplicação de uploads e de itens por tabela e SKU')
+def _indexes_dedupe_and_items(connection):
+    create_index(connection, 'ix_cost_tables_file_hash_supplier', 'cost_tables', ['file_hash', 'supplier_id'])
+    create_index(connection, 'ix_cost_items_table_sku', 'cost_items', ['cost_table_id', 'sku'])
+
+
+@migration(2, 'Colunas de leitura e validação dos jobs e comparação de SKUs das tabelas')
+def _ingestion_and_comparison_columns(connection):
+    add_column(connection, 'ingestion_jobs', 'sheet_name', 'VARCHAR(100)')
+    add_column(connection, 'ingestion_jobs', 'read_seconds', 'FLOAT')
+    add_column(connection, 'ingestion_jobs', 'peak_memory_bytes', 'BIGINT')
+    add_column(connection, 'ingestion_jobs', 'validation_summary', 'TEXT')
+    add_column(connection, 'cost_tables', 'sku_comparison', 'TEXT')
+
+
+@migration(3, 'Índices de busca textual (FTS5) de itens e fornecedores')
+def _search_index(connection):
+    ensure_search_index(connection)
+
+
+@migration(4, 'Índices das consultas de aprovações, tabelas de custo, fornecedores e jobs')
+def _hot_path_indexes(connection):
+    # cost_items.cost_table_id já é a primeira coluna de ix_cost_items_table_sku
+    create_index(connection, 'ix_approvals_approver_status_deadline', 'approvals',
+                 ['approver_id', 'status', 'deadline'])
+    create_index(connection, 'ix_approvals_delegated_status', 'approvals', ['delegated_to', 'status'])
+    create_index(connection, 'ix_approvals_status_deadline', 'approvals', ['status', 'deadline'])
+    create_index(connection, 'ix_approvals_cost_table_sequence', 'approvals', ['cost_table_id', 'sequence_order'])
+    create_index(connection, 'ix_cost_tables_supplier_status_created', 'cost_tables',
+                 ['supplier_id', 'status', 'created_at'])
+    create_index(connection, 'ix_cost_tables_status_updated', 'cost_tables', ['status', 'updated_at'])
+    create_index(connection, 'ix_cost_tables_created_at', 'cost_tables', ['created_at'])
+    create_index(connection, 'ix_suppliers_email', 'suppliers', ['email'])
+    create_index(connection, 'ix_ingestion_jobs_cost_table', 'ingestion_jobs', ['cost_table_id'])
+    create_index(connection, 'ix_ingestion_jobs_file_hash_supplier', 'ingestion_jobs', ['file_hash', 'supplier_id'])
+
+
+@migration(5, 'Vínculo dos usuários fornecedores com o fornecedor')
+def _user_supplier_link(connection):
+    add_column(connection, 'users', 'supplier_id', 'INTEGER REFERENCES suppliers(id)')
+    create_index(connection, 'ix_users_supplier_id', 'users', ['supplier_id'])
+    # Mesmo critério usado antes a cada requisição: fornecedor com o email do usuário
+    connection.execute(text(
+        """UPDATE users SET supplier_id = (
+            SELECT MIN(suppliers.id) FROM suppliers WHERE suppliers.email = users.email
+        ) WHERE role = 'supplier' AND supplier_id IS NULL"""
+    ))
+
+
+@migration(6, 'Tabelas de agregados do dashboard e triggers de manutenção')
+def _dashboard_rollups(connection):
+    ensure_rollups(connection)
+
+
+@migration(7, 'Cubo de relatórios e triggers de manutenção')
+def _report_cube(connection):
+    ensure_report_cube(connection)
+
+
+@migration(8, 'Agregados do dashboard e cubo de relatórios em valores inteiros (centavos)')
+def _integer_rollups(connection):
+    # Tabelas e triggers são recriados com as colunas novas e recalculados dos dados atuais
+    drop_rollups(connection)
+    drop_report_cube(connection)
+    ensure_rollups(connection)
+    ensure_report_cube(connection)
+
+
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        """CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )"""
+    ))
+
+
+def applied_versions(connection):
+    _ensure_migrations_table(connection)
+    return {row[0] for row in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def run_migrations(engine):
+    """Aplica as migrações pendentes, cada uma em sua própria transação
+
+    Retorna as versões aplicadas nesta execução.
+    """
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+
+    executed = []
+    for version, name, function in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            function(connection)
+            # OR IGNORE: outro processo pode ter aplicado a mesma migração ao mesmo tempo
+            connection.execute(
+                text('INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) '
+                     'VALUES (:version, :name, :applied_at)'),
+                {'version': version, 'name': name, 'applied_at': datetime.utcnow().isoformat(' ')}
+            )
+        executed.append(version)
+    return executed
+
+
+def migration_status(engine):
+    """Situação de cada migração conhecida: versão, nome e data de aplicação (ou None)"""
+    with engine.begin() as connection:
+        _ensure_migrations_table(connection)
+        applied = {
+            row[0]: row[1] for row in connection.execute(
+                text('SELECT version, applied_at FROM schema_migrations')
+            )
+        }
+    return [
+        {'version': version, 'name': name, 'applied_at': applied.get(version)}
+        for version, name, _ in MIGRATIONS
+    ]
@@ -0,0 +1,121 @@
+"""
+Paginação por cursor (keyset) para as rotas de listagem
+
+Em vez de OFFSET + COUNT(*), cada página começa logo após a chave de ordenação
+do último item da página anterior (ex.: sku+id, created_at+id, deadline+id), de
+modo que qualquer página custa o mesmo que a primeira. O cursor é opaco para o
+cliente: os valores da chave codificados em base64.
+
+O modo é opcional: a rota usa cursor quando o parâmetro `cursor` é enviado (vazio
+na primeira página). A contagem total só é feita com `count=exact`.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, Date, tuple_
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Uma página de resultados com o cursor da próxima"""
+
+    def __init__(self, items, next_cursor, per_page, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def to_dict(self):
+        """Campos de paginação da resposta (os itens ficam a cargo da rota)"""
+        return {
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'per_page': self.per_page,
+            'total': self.total
+        }
+
+
+def wants_cursor(args):
+    """Verdadeiro se a requisição pediu paginação por cursor"""
+    return 'cursor' in args
+
+
+def cursor_args(args, default_per_page=DEFAULT_PER_PAGE):
+    """Lê cursor, per_page e count dos parâmetros da requisição"""
+    per_page = args.get('per_page', default_per_page, type=int)
+    return {
+        'cursor': args.get('cursor') or None,
+        'per_page': min(max(per_page, 1), MAX_PER_PAGE),
+        'with_count': args.get('count') == 'exact'
+    }
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """Valores da chave guardados no cursor, já nos tipos das colunas"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [_decode_value(column, value) for column, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise InvalidCursor('Cursor inválido')
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=DEFAULT_PER_PAGE, descending=False,
+                    with_count=False):
+    """Pagina a consulta pela chave `keys` (colunas; a última deve ser única, ex.: id)
+
+    A consulta não deve ter ordenação própria: a ordem é a da chave, toda ascendente
+    ou toda descendente. Busca per_page + 1 linhas para saber se há próxima página.
+    """
+    total = query.order_by(None).count() if with_count else None
+
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        key = tuple_(*keys)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    order = [column.desc() if descending else column.asc() for column in keys]
+    rows = query.order_by(None).order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in keys])
+
+    return KeysetPage(rows, next_cursor, per_page, total)
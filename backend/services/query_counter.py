@@ -0,0 +1,57 @@
+"""
+Contagem de consultas SQL por requisição
+
+Cada instrução enviada ao banco durante uma requisição é contada em g. Com
+QUERY_COUNT_HEADER, a resposta leva o total no cabeçalho X-Query-Count.
+
+As rotas de listagem declaram um orçamento fixo com @query_budget(n): o número
+de consultas não pode depender do tamanho da página (sinal de N+1). Acima do
+orçamento, a requisição gera um aviso no log; com QUERY_BUDGET_STRICT (testes e
+benchmarks) a resposta vira um erro 500.
+"""
+
+from functools import wraps
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def query_budget(limit):
+    """Declara o número máximo de consultas da rota"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g.query_budget = limit
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def init_query_counter(app):
+    """Liga a contagem de consultas e a verificação de orçamento na aplicação"""
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def check_query_budget(response):
+        count = g.get('query_count', 0)
+        limit = g.get('query_budget')
+
+        if limit is not None and count > limit:
+            message = f'Orçamento de consultas excedido: {count} consultas (limite {limit})'
+            app.logger.warning(f'{message} em {request.method} {request.path}')
+            if app.config.get('QUERY_BUDGET_STRICT'):
+                response = jsonify({'error': message})
+                response.status_code = 500
+
+        if app.config.get('QUERY_COUNT_HEADER'):
+            response.headers[QUERY_COUNT_HEADER] = str(count)
+        return response
@@ -0,0 +1,134 @@
+"""
+Verificação dos planos das consultas mais frequentes das rotas
+
+Cada consulta é montada como nas rotas e passada ao EXPLAIN QUERY PLAN do
+SQLite. A verificação falha se o plano percorrer a tabela inteira (SCAN sem
+índice), não usar o índice esperado ou usar um índice evitado de propósito.
+Usado pelo comando `flask check-query-plans`.
+
+Consultas com expressões que desviam o planejador de um índice (`status || ''`
+em Approval.pending_for, `cost_table_id + 0` em search_cost_items) listam o
+índice evitado: se a expressão for removida ou deixar de ter efeito, a
+verificação falha.
+"""
+
+import re
+from datetime import date, datetime
+
+from models.approval import Approval
+from models.cost_table import CostTable, CostItem
+from models.ingestion_job import IngestionJob
+from models.supplier import Supplier
+from models.user import db
+from services.search import search_cost_items
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def _hot_queries():
+    now = datetime.utcnow()
+    return [
+        ('Aprovações pendentes do usuário (/approvals/pending)',
+         Approval.query.filter(Approval.pending_for(1)).order_by(Approval.deadline, Approval.id).limit(21),
+         ['ix_approvals_approver_status_deadline', 'ix_approvals_delegated_status'],
+         ['ix_approvals_status_deadline']),
+
+        ('Aprovações em atraso (/approvals/overdue)',
+         Approval.query.filter(
+             Approval.status == 'pending',
+             Approval.deadline < now
+         ).order_by(Approval.deadline, Approval.id).limit(21),
+         ['ix_approvals_status_deadline'], []),
+
+        ('Fluxo de aprovação da tabela (/approvals/cost-table/<id>)',
+         Approval.query.filter_by(cost_table_id=1).order_by(Approval.sequence_order),
+         ['ix_approvals_cost_table_sequence'], []),
+
+        ('Listagem de tabelas de custo (/cost-tables/)',
+         CostTable.query.order_by(CostTable.created_at.desc(), CostTable.id.desc()).limit(21),
+         ['ix_cost_tables_created_at'], []),
+
+        ('Tabelas do fornecedor por status (/cost-tables/?supplier_id=&status=)',
+         CostTable.query.filter(
+             CostTable.supplier_id == 1,
+             CostTable.status == 'approved'
+         ).order_by(CostTable.created_at.desc()).limit(21),
+         ['ix_cost_tables_supplier_status_created'], []),
+
+        ('Tabelas aprovadas no mês (/dashboard/stats)',
+         db.session.query(db.func.count(CostTable.id)).filter(
+             CostTable.status == 'approved',
+             CostTable.updated_at >= now.replace(day=1)
+         ),
+         ['ix_cost_tables_status_updated'], []),
+
+        ('Tabela com o mesmo arquivo (deduplicação de upload)',
+         CostTable.query.filter_by(file_hash='0' * 64, supplier_id=1)
+         .order_by(CostTable.created_at.desc()).limit(1),
+         ['ix_cost_tables_file_hash_supplier'], []),
+
+        ('Itens da tabela (/cost-tables/<id>/items)',
+         CostItem.query.filter(CostItem.cost_table_id == 1).order_by(CostItem.sku, CostItem.id).limit(50),
+         ['ix_cost_items_table_sku'], []),
+
+        ('Busca nos itens da tabela (/cost-tables/<id>/items?search=)',
+         search_cost_items(CostItem.query, CostItem, 'parafuso', cost_table_id=1).limit(50),
+         ['cost_items_fts VIRTUAL TABLE', 'INTEGER PRIMARY KEY'],
+         ['ix_cost_items_table_sku']),
+
+        ('Fornecedor do usuário (filtro de acesso por email)',
+         Supplier.query.filter_by(email='fornecedor@empresa.com').limit(1),
+         ['ix_suppliers_email'], []),
+
+        ('Job de ingestão da tabela (/cost-tables/<id>/errors)',
+         IngestionJob.query.filter_by(cost_table_id=1).limit(1),
+         ['ix_ingestion_jobs_cost_table'], []),
+
+        ('Job em andamento com o mesmo arquivo (deduplicação de upload)',
+         IngestionJob.query.filter(
+             IngestionJob.file_hash == '0' * 64,
+             IngestionJob.supplier_id == 1,
+             IngestionJob.state.in_(['queued', 'running'])
+         ).limit(1),
+         ['ix_ingestion_jobs_file_hash_supplier'], []),
+    ]
+
+
+def _driver_value(value):
+    # Os valores não mudam o plano; datas vão como texto, como o SQLite as guarda
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(' ')
+    return value
+
+
+def explain(query):
+    """Linhas (detail) do EXPLAIN QUERY PLAN da consulta"""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(_driver_value(compiled.params[name]) for name in compiled.positiontup)
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).all()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """Confere o plano de cada consulta frequente
+
+    Retorna uma lista de dicionários com name, ok, plan e problems.
+    """
+    results = []
+    for name, query, expected_indexes, avoided_indexes in _hot_queries():
+        plan = explain(query)
+        problems = []
+        for detail in plan:
+            match = FULL_SCAN.match(detail)
+            if match:
+                problems.append(f'Leitura completa da tabela {match.group(1)}')
+        text = '\n'.join(plan)
+        for index in expected_indexes:
+            if index not in text:
+                problems.append(f'Índice {index} não utilizado')
+        for index in avoided_indexes:
+            if index in text:
+                problems.append(f'Índice {index} utilizado (a consulta deveria evitá-lo)')
+        results.append({'name': name, 'ok': not problems, 'plan': plan, 'problems': problems})
+    return results
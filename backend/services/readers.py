@@ -0,0 +1,190 @@
+"""
+Leitores de arquivos de tabela de custos
+
+Cada formato tem um leitor que produz o arquivo em blocos (DataFrames) já com
+projeção de colunas: apenas as colunas usadas pela ingestão são materializadas.
+- xlsx: openpyxl em modo somente leitura (streaming, sem carregar o DOM da planilha)
+- csv: pandas em blocos, com dtype explícito (texto) para todas as colunas
+- xls: pandas/xlrd (formato binário antigo, sem leitura em streaming)
+
+As colunas numéricas são lidas como vieram (texto no CSV) e convertidas bloco a
+bloco pela validação, que assim consegue apontar os valores não numéricos. Linhas
+totalmente vazias (ex.: linhas formatadas no fim da planilha) são descartadas.
+"""
+
+import sys
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COST_TABLE_COLUMNS = ['sku', 'description', 'new_cost', 'previous_cost', 'monthly_volume',
+                      'unit', 'category']
+
+# Sem inferência de tipo por bloco: tudo entra como texto e a conversão é explícita
+COLUMN_DTYPES = {name: str for name in COST_TABLE_COLUMNS}
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _is_projected(column):
+    return column in COST_TABLE_COLUMNS
+
+
+def read_csv_chunks(source, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê um CSV em blocos, materializando apenas as colunas projetadas"""
+    reader = pd.read_csv(source, usecols=_is_projected, dtype=COLUMN_DTYPES, chunksize=chunk_size)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def read_xlsx_chunks(source, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê uma planilha xlsx linha a linha (modo somente leitura) e produz blocos"""
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+
+        # Posição de cada coluna projetada no cabeçalho da planilha
+        positions = {}
+        for index, name in enumerate(header):
+            name = str(name).strip() if name is not None else None
+            if _is_projected(name) and name not in positions:
+                positions[name] = index
+        columns = list(positions)
+        indexes = [positions[name] for name in columns]
+        width = len(header)
+
+        buffer = []
+        for row in rows:
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            buffer.append([row[i] for i in indexes])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+
+        if buffer or not columns:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_xls_chunks(source, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê uma planilha xls (sem suporte a streaming) com projeção de colunas"""
+    yield pd.read_excel(source, sheet_name=sheet_name or 0, usecols=_is_projected)
+
+
+def reset_peak_memory():
+    """Zera o pico de memória residente do processo (Linux); retorna False se não suportado"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory_bytes():
+    """Pico de memória residente (RSS) do processo, em bytes"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+READERS = {
+    'csv': read_csv_chunks,
+    'xlsx': read_xlsx_chunks,
+    'xls': read_xls_chunks,
+}
+
+
+def get_reader(filename):
+    """Retorna o leitor registrado para a extensão do arquivo"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in READERS:
+        raise ValueError(f"Formato de arquivo não suportado: {extension or filename}")
+    return READERS[extension]
+
+
+def drop_blank_rows(chunk):
+    """Remove as linhas sem nenhum valor (ausente ou texto em branco em todas as colunas)"""
+    filled = pd.Series(False, index=chunk.index)
+    for name in chunk.columns:
+        column = chunk[name]
+        present = column.notna()
+        if not pd.api.types.is_numeric_dtype(column):
+            present &= column.astype(str).str.strip() != ''
+        filled |= present
+    return chunk[filled]
+
+
+def iter_cost_chunks(source, filename, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Blocos do arquivo sem as linhas vazias
+
+    O índice de cada bloco é a posição da linha nos dados do arquivo (0 = primeira
+    linha após o cabeçalho), preservada mesmo com linhas vazias descartadas.
+    """
+    reader = get_reader(filename)
+    offset = 0
+    for chunk in reader(source, sheet_name=sheet_name, chunk_size=chunk_size):
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield drop_blank_rows(chunk)
+
+
+def read_cost_frame(source, filename, sheet_name=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    trace_memory=True, convert=None):
+    """Lê o arquivo em blocos e mede tempo e pico de memória da leitura
+
+    Com `convert`, cada bloco é convertido assim que lido e só o resultado é
+    mantido (o bloco bruto é descartado); sem blocos no arquivo, convert recebe um
+    DataFrame vazio. O pico é o RSS máximo do processo durante a leitura; no Linux
+    ele é zerado antes de cada leitura, nos demais sistemas é o pico desde o início
+    do processo. Retorna (df, stats), onde stats tem read_seconds, convert_seconds,
+    peak_memory_bytes e rows_read (linhas não vazias lidas).
+    """
+    if trace_memory:
+        reset_peak_memory()
+    start = time.perf_counter()
+    convert_seconds = 0.0
+    rows_read = 0
+
+    chunks = []
+    for chunk in iter_cost_chunks(source, filename, sheet_name=sheet_name, chunk_size=chunk_size):
+        rows_read += len(chunk)
+        if convert is not None:
+            convert_start = time.perf_counter()
+            chunk = convert(chunk)
+            convert_seconds += time.perf_counter() - convert_start
+        chunks.append(chunk)
+
+    if not chunks and convert is not None:
+        chunks.append(convert(pd.DataFrame()))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+    stats = {
+        'read_seconds': time.perf_counter() - start - convert_seconds,
+        'convert_seconds': convert_seconds,
+        'peak_memory_bytes': peak_memory_bytes() if trace_memory else None,
+        'rows_read': rows_read,
+    }
+    return df, stats
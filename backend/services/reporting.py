@@ -0,0 +1,435 @@
+"""
+Cubo de relatórios (rota /api/dashboard/reports)
+
+Dois fatos pré-agregados por dia, fornecedor e categoria:
+
+- report_cost_tables: tabelas de custo por dia de criação e status, com valor
+  total, impacto mensal e impacto em valor
+- report_approvals: decisões de aprovação por dia da decisão, nível de aprovação
+  (approval_type) e status, com a soma das horas entre atribuição e decisão
+
+O grão é o dia porque os períodos dos relatórios são contados em dias (7, 30,
+90, 365); os meses da tendência mensal são agrupados a partir dele. Como os
+agregados do dashboard (services/rollups.py), o cubo é mantido por triggers em
+cost_tables e approvals, na mesma transação da escrita, e pode ser recalculado
+por completo com rebuild_report_cube() (comando rebuild-rollups, que pode ser
+agendado localmente para reparo). Os relatórios, com filtros por fornecedor e
+categoria e comparação com o período anterior, leem só o cubo.
+
+As medidas são inteiras (valores em centavos, durações em segundos), de modo que
+somar e descontar contribuições pelos triggers é exato e o cubo não deriva.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, column, func, select, table, text
+
+from models.supplier import Supplier
+from models.user import db
+from services.rollups import cents
+
+REPORT_COST_TABLES = 'report_cost_tables'
+REPORT_APPROVALS = 'report_approvals'
+REPORT_TABLES = [REPORT_COST_TABLES, REPORT_APPROVALS]
+REPORT_TRIGGERS = ['cost_tables_report_ai', 'cost_tables_report_ad', 'cost_tables_report_au',
+                   'cost_tables_report_approvals_au', 'approvals_report_ai', 'approvals_report_ad',
+                   'approvals_report_au']
+
+# Períodos aceitos em ?period= (dias, o de hoje incluído)
+PERIODS = {
+    'last_7_days': 7,
+    'last_30_days': 30,
+    'last_90_days': 90,
+    'last_year': 365
+}
+
+# Status cujo impacto entra no impacto mensal (o mesmo critério do dashboard)
+ACTIVE_IMPACT_STATUSES = ['approved', 'under_review', 'pricing_analysis', 'commercial_review']
+
+TOP_SUPPLIERS = 10
+
+
+def _day(expression):
+    return f"COALESCE(date({expression}), '')"
+
+
+def _seconds(row):
+    seconds = f'(julianday({row}.decision_date) - julianday({row}.assigned_at)) * 86400'
+    return f'CAST(ROUND(COALESCE({seconds}, 0)) AS INTEGER)'
+
+
+def _upsert(keys, measures):
+    updates = ',\n'.join(f'{measure} = {measure} + excluded.{measure}' for measure in measures)
+    return f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates};"
+
+
+COST_TABLE_KEYS = ['day', 'supplier_id', 'category', 'status']
+COST_TABLE_MEASURES = ['table_count', 'total_value_cents', 'monthly_impact_cents', 'impact_value_cents']
+APPROVAL_KEYS = ['day', 'supplier_id', 'category', 'approval_level', 'status']
+APPROVAL_MEASURES = ['decision_count', 'timed_count', 'seconds_total']
+
+
+def _cost_table_contribution(row, sign):
+    """Soma (sign 1) ou desconta (sign -1) do cubo a tabela de custo `row` (NEW ou OLD)"""
+    statement = f"""
+        INSERT INTO {REPORT_COST_TABLES}({', '.join(COST_TABLE_KEYS + COST_TABLE_MEASURES)})
+        VALUES ({_day(f'{row}.created_at')}, {row}.supplier_id, {row}.category, COALESCE({row}.status, ''),
+                {sign}, {sign} * {cents(f'{row}.total_value')}, {sign} * {cents(f'{row}.monthly_impact')},
+                {sign} * {cents(f'{row}.impact_value')})
+        {_upsert(COST_TABLE_KEYS, COST_TABLE_MEASURES)}
+    """
+    if sign < 0:
+        # O grupo que ficou vazio sai do cubo
+        statement += f"""
+        DELETE FROM {REPORT_COST_TABLES} WHERE table_count = 0 AND day = {_day(f'{row}.created_at')}
+            AND supplier_id = {row}.supplier_id AND category = {row}.category
+            AND status = COALESCE({row}.status, '');
+        """
+    return statement
+
+
+def _approval_contribution(row, sign):
+    """Soma ou desconta do cubo a aprovação `row` (NEW ou OLD), com os dados da sua tabela de custo"""
+    statement = f"""
+        INSERT INTO {REPORT_APPROVALS}({', '.join(APPROVAL_KEYS + APPROVAL_MEASURES)})
+        SELECT {_day(f'{row}.decision_date')}, c.supplier_id, c.category, {row}.approval_type,
+               COALESCE({row}.status, ''), {sign}, {sign} * ({row}.assigned_at IS NOT NULL), {sign} * {_seconds(row)}
+        FROM cost_tables c WHERE c.id = {row}.cost_table_id AND {row}.decision_date IS NOT NULL
+        {_upsert(APPROVAL_KEYS, APPROVAL_MEASURES)}
+    """
+    if sign < 0:
+        statement += f"""
+        DELETE FROM {REPORT_APPROVALS} WHERE decision_count = 0 AND day = {_day(f'{row}.decision_date')}
+            AND approval_level = {row}.approval_type;
+        """
+    return statement
+
+
+def _table_approvals(row, sign):
+    """Soma ou desconta as aprovações decididas da tabela de custo `row` com o fornecedor e a categoria dela"""
+    statement = f"""
+        INSERT INTO {REPORT_APPROVALS}({', '.join(APPROVAL_KEYS + APPROVAL_MEASURES)})
+        SELECT {_day('a.decision_date')}, {row}.supplier_id, {row}.category, a.approval_type,
+               COALESCE(a.status, ''), {sign}, {sign} * (a.assigned_at IS NOT NULL), {sign} * {_seconds('a')}
+        FROM approvals a WHERE a.cost_table_id = {row}.id AND a.decision_date IS NOT NULL
+        {_upsert(APPROVAL_KEYS, APPROVAL_MEASURES)}
+    """
+    if sign < 0:
+        statement += f"""
+        DELETE FROM {REPORT_APPROVALS} WHERE decision_count = 0
+            AND supplier_id = {row}.supplier_id AND category = {row}.category;
+        """
+    return statement
+
+
+REPORT_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {REPORT_COST_TABLES} (
+        day VARCHAR(10) NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        category VARCHAR(100) NOT NULL,
+        status VARCHAR(30) NOT NULL,
+        table_count INTEGER NOT NULL DEFAULT 0,
+        total_value_cents INTEGER NOT NULL DEFAULT 0,
+        monthly_impact_cents INTEGER NOT NULL DEFAULT 0,
+        impact_value_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, supplier_id, category, status)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {REPORT_APPROVALS} (
+        day VARCHAR(10) NOT NULL,
+        supplier_id INTEGER NOT NULL,
+        category VARCHAR(100) NOT NULL,
+        approval_level VARCHAR(30) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        decision_count INTEGER NOT NULL DEFAULT 0,
+        timed_count INTEGER NOT NULL DEFAULT 0,
+        seconds_total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, supplier_id, category, approval_level, status)
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_report_ai AFTER INSERT ON cost_tables BEGIN
+        {_cost_table_contribution('new', 1)}
+    END""",
+    # As aprovações da tabela excluída saem junto (se ainda existirem)
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_report_ad AFTER DELETE ON cost_tables BEGIN
+        {_cost_table_contribution('old', -1)}
+        {_table_approvals('old', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_report_au
+        AFTER UPDATE OF category, status, supplier_id, total_value, monthly_impact, impact_value, created_at
+        ON cost_tables BEGIN
+        {_cost_table_contribution('old', -1)}
+        {_cost_table_contribution('new', 1)}
+    END""",
+    # Fornecedor ou categoria alterados: as aprovações da tabela mudam de grupo
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_report_approvals_au
+        AFTER UPDATE OF category, supplier_id ON cost_tables
+        WHEN old.category IS NOT new.category OR old.supplier_id IS NOT new.supplier_id BEGIN
+        {_table_approvals('old', -1)}
+        {_table_approvals('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS approvals_report_ai AFTER INSERT ON approvals BEGIN
+        {_approval_contribution('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS approvals_report_ad AFTER DELETE ON approvals BEGIN
+        {_approval_contribution('old', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS approvals_report_au
+        AFTER UPDATE OF status, decision_date, assigned_at, approval_type, cost_table_id ON approvals BEGIN
+        {_approval_contribution('old', -1)}
+        {_approval_contribution('new', 1)}
+    END""",
+]
+
+# Reconstrução completa a partir de cost_tables e approvals
+REBUILD_STATEMENTS = [
+    *[f'DELETE FROM {name}' for name in REPORT_TABLES],
+    f"""INSERT INTO {REPORT_COST_TABLES}({', '.join(COST_TABLE_KEYS + COST_TABLE_MEASURES)})
+        SELECT {_day('created_at')}, supplier_id, category, COALESCE(status, ''), COUNT(*),
+               SUM({cents('total_value')}), SUM({cents('monthly_impact')}), SUM({cents('impact_value')})
+        FROM cost_tables GROUP BY 1, 2, 3, 4""",
+    f"""INSERT INTO {REPORT_APPROVALS}({', '.join(APPROVAL_KEYS + APPROVAL_MEASURES)})
+        SELECT {_day('a.decision_date')}, c.supplier_id, c.category, a.approval_type, COALESCE(a.status, ''),
+               COUNT(*), SUM(a.assigned_at IS NOT NULL), SUM({_seconds('a')})
+        FROM approvals a JOIN cost_tables c ON c.id = a.cost_table_id
+        WHERE a.decision_date IS NOT NULL GROUP BY 1, 2, 3, 4, 5""",
+]
+
+report_cost_tables = table(REPORT_COST_TABLES, *[column(name) for name in COST_TABLE_KEYS + COST_TABLE_MEASURES])
+report_approvals = table(REPORT_APPROVALS, *[column(name) for name in APPROVAL_KEYS + APPROVAL_MEASURES])
+
+
+def ensure_report_cube(connection):
+    """Cria tabelas e triggers ausentes; um cubo recém-criado é calculado com os dados atuais"""
+    existing = {
+        row[0] for row in connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'report_%'")
+        )
+    }
+    for statement in REPORT_DDL:
+        connection.execute(text(statement))
+    if not set(REPORT_TABLES) <= existing:
+        rebuild_report_cube(connection)
+
+
+def drop_report_cube(connection):
+    """Remove tabelas e triggers do cubo (recriados por ensure_report_cube)"""
+    for name in REPORT_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+    for name in REPORT_TABLES:
+        connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+
+def rebuild_report_cube(connection):
+    """Recalcula o cubo a partir de cost_tables e approvals"""
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def period_bounds(period, today=None):
+    """Primeiro e último dia do período e do período anterior de mesmo tamanho ('AAAA-MM-DD')
+
+    Os dias são em UTC, como as datas gravadas (created_at, decision_date) que
+    formam o dia do cubo.
+    """
+    days = PERIODS[period]
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    previous_start = start - timedelta(days=days)
+    return {
+        'start': start.isoformat(),
+        'end': today.isoformat(),
+        'previous_start': previous_start.isoformat(),
+        'previous_end': (start - timedelta(days=1)).isoformat()
+    }
+
+
+def _filters(cube, start, end, supplier_id, category):
+    conditions = [cube.c.day >= start, cube.c.day <= end]
+    if supplier_id is not None:
+        conditions.append(cube.c.supplier_id == supplier_id)
+    if category:
+        conditions.append(cube.c.category == category)
+    return conditions
+
+
+def _money(cents_total):
+    """Soma em centavos do cubo como valor em reais (2 casas)"""
+    return round((cents_total or 0) / 100, 2)
+
+
+def _rate(part, total):
+    return round(part / total * 100, 1) if total else 0
+
+
+def _change(current, previous):
+    """Variação percentual em relação ao período anterior (None sem base de comparação)"""
+    return round((current - previous) / previous * 100, 1) if previous else None
+
+
+def _summaries(bounds, supplier_id, category):
+    """Resumo do período e do anterior (uma consulta em cada fato)"""
+    cube = report_cost_tables
+    in_period = case((cube.c.day >= bounds['start'], 'current'), else_='previous')
+    tables = {
+        row.period: row for row in db.session.execute(
+            select(
+                in_period.label('period'),
+                func.sum(cube.c.table_count).label('total_tables'),
+                func.count(func.distinct(cube.c.supplier_id)).label('total_suppliers'),
+                func.sum(cube.c.total_value_cents).label('total_value'),
+                func.sum(case((cube.c.status.in_(ACTIVE_IMPACT_STATUSES), cube.c.monthly_impact_cents), else_=0))
+                .label('monthly_impact'),
+                func.sum(case((cube.c.status == 'approved', cube.c.table_count), else_=0)).label('approved')
+            ).where(*_filters(cube, bounds['previous_start'], bounds['end'], supplier_id, category))
+            .group_by(in_period)
+        ).all()
+    }
+
+    cube = report_approvals
+    in_period = case((cube.c.day >= bounds['start'], 'current'), else_='previous')
+    levels = db.session.execute(
+        select(
+            in_period.label('period'),
+            cube.c.approval_level,
+            func.sum(cube.c.decision_count).label('decisions'),
+            func.sum(case((cube.c.status == 'approved', cube.c.decision_count), else_=0)).label('approved'),
+            func.sum(cube.c.timed_count).label('timed'),
+            (func.sum(cube.c.seconds_total) / 3600.0).label('hours')
+        ).where(*_filters(cube, bounds['previous_start'], bounds['end'], supplier_id, category))
+        .group_by(in_period, cube.c.approval_level)
+    ).all()
+
+    summaries, approval_metrics = {}, {}
+    for period in ('current', 'previous'):
+        row = tables.get(period)
+        period_levels = [level for level in levels if level.period == period]
+        timed = sum(level.timed for level in period_levels)
+        hours = sum(level.hours for level in period_levels)
+        total_tables = int(row.total_tables) if row else 0
+        summaries[period] = {
+            'total_tables': total_tables,
+            'total_suppliers': row.total_suppliers if row else 0,
+            'total_value': _money(row.total_value) if row else 0,
+            'monthly_impact': _money(row.monthly_impact) if row else 0,
+            'approval_rate': _rate(int(row.approved), total_tables) if row else 0,
+            'avg_approval_time': round(hours / timed / 24, 1) if timed else 0
+        }
+        decisions = sum(level.decisions for level in period_levels)
+        approved = sum(level.approved for level in period_levels)
+        approval_metrics[period] = {
+            'total_decisions': decisions,
+            'approved': approved,
+            'rejected': decisions - approved,
+            'approval_rate': _rate(approved, decisions),
+            'avg_approval_time': summaries[period]['avg_approval_time'],
+            'by_level': [
+                {
+                    'approval_level': level.approval_level,
+                    'decisions': level.decisions,
+                    'approved': level.approved,
+                    'approval_rate': _rate(level.approved, level.decisions),
+                    'avg_approval_time': round(level.hours / level.timed / 24, 1) if level.timed else 0
+                }
+                for level in sorted(period_levels, key=lambda level: level.decisions, reverse=True)
+            ]
+        }
+    return summaries, approval_metrics
+
+
+def _monthly_trend(bounds, supplier_id, category):
+    cube = report_cost_tables
+    month = func.substr(cube.c.day, 1, 7)
+    rows = db.session.execute(
+        select(
+            month.label('month'),
+            func.sum(cube.c.table_count).label('submissions'),
+            func.sum(case((cube.c.status == 'approved', cube.c.table_count), else_=0)).label('approvals'),
+            func.sum(cube.c.total_value_cents).label('value'),
+            func.sum(cube.c.impact_value_cents).label('impact')
+        ).where(*_filters(cube, bounds['start'], bounds['end'], supplier_id, category))
+        .group_by(month).order_by(month)
+    ).all()
+    return [
+        {
+            'month': row.month,
+            'submissions': int(row.submissions),
+            'approvals': int(row.approvals),
+            'value': _money(row.value),
+            'impact': _money(row.impact)
+        }
+        for row in rows
+    ]
+
+
+def _supplier_analysis(bounds, supplier_id, category):
+    cube = report_cost_tables
+    value = func.sum(cube.c.total_value_cents)
+    rows = db.session.execute(
+        select(
+            Supplier.id,
+            Supplier.name,
+            func.sum(cube.c.table_count).label('tables'),
+            value.label('value'),
+            func.sum(cube.c.impact_value_cents).label('impact')
+        ).select_from(cube).join(Supplier, Supplier.id == cube.c.supplier_id)
+        .where(*_filters(cube, bounds['start'], bounds['end'], supplier_id, category))
+        .group_by(Supplier.id, Supplier.name)
+        .order_by(value.desc())
+        .limit(TOP_SUPPLIERS)
+    ).all()
+    return [
+        {
+            'supplier_id': row.id,
+            'name': row.name,
+            'tables': int(row.tables),
+            'value': _money(row.value),
+            'impact': _money(row.impact)
+        }
+        for row in rows
+    ]
+
+
+def _category_breakdown(bounds, supplier_id, category):
+    """Participação de cada categoria no número de tabelas do período (value, em %)"""
+    cube = report_cost_tables
+    rows = db.session.execute(
+        select(
+            cube.c.category,
+            func.sum(cube.c.table_count).label('tables'),
+            func.sum(cube.c.total_value_cents).label('total_value')
+        ).where(*_filters(cube, bounds['start'], bounds['end'], supplier_id, category))
+        .group_by(cube.c.category)
+    ).all()
+    total = sum(row.tables for row in rows)
+    result = [
+        {
+            'name': row.category,
+            'value': _rate(row.tables, total),
+            'tables': int(row.tables),
+            'total_value': _money(row.total_value)
+        }
+        for row in rows
+    ]
+    result.sort(key=lambda entry: entry['tables'], reverse=True)
+    return result
+
+
+def build_report(period, supplier_id=None, category=None, today=None):
+    """Relatório do período, com filtros opcionais de fornecedor e categoria e comparação com o período anterior"""
+    bounds = period_bounds(period, today)
+    summaries, approval_metrics = _summaries(bounds, supplier_id, category)
+    summary, previous = summaries['current'], summaries['previous']
+
+    return {
+        'period': dict(bounds, name=period),
+        'filters': {'supplier_id': supplier_id, 'category': category},
+        'summary': summary,
+        'monthlyTrend': _monthly_trend(bounds, supplier_id, category),
+        'supplierAnalysis': _supplier_analysis(bounds, supplier_id, category),
+        'categoryBreakdown': _category_breakdown(bounds, supplier_id, category),
+        'approvalMetrics': approval_metrics['current'],
+        'comparison': {
+            'summary': previous,
+            'approvalMetrics': approval_metrics['previous'],
+            'change': {key: _change(summary[key], previous[key]) for key in summary}
+        }
+    }
@@ -0,0 +1,146 @@
+"""
+Tabelas de agregados (rollups) do dashboard
+
+- rollup_cost_tables: tabelas de custo e impacto mensal por categoria, status
+  e mês de criação
+- rollup_suppliers: tabelas de custo e impacto por fornecedor e status
+- rollup_approved_months: tabelas aprovadas e impacto pelo mês da aprovação
+  (última atualização da tabela aprovada)
+
+Os agregados são mantidos por triggers em cost_tables, como os índices de busca:
+cada inserção, alteração ou exclusão desconta a contribuição antiga da tabela e
+soma a nova, na mesma transação do upload, da mudança de status ou da decisão
+de aprovação. O dashboard lê só essas tabelas, cujo tamanho não cresce com o
+número de tabelas de custo. rebuild_rollups() (comando rebuild-rollups)
+recalcula tudo a partir de cost_tables, para reparo.
+
+Os valores são acumulados em centavos inteiros (impact_cents): somar e descontar
+a mesma contribuição é exato, então os agregados não acumulam erro de ponto
+flutuante com o número de escritas.
+"""
+
+from sqlalchemy import table, column, text
+
+ROLLUP_COST_TABLES = 'rollup_cost_tables'
+ROLLUP_SUPPLIERS = 'rollup_suppliers'
+ROLLUP_APPROVED_MONTHS = 'rollup_approved_months'
+ROLLUP_TABLES = [ROLLUP_COST_TABLES, ROLLUP_SUPPLIERS, ROLLUP_APPROVED_MONTHS]
+ROLLUP_TRIGGERS = ['cost_tables_rollup_ai', 'cost_tables_rollup_ad', 'cost_tables_rollup_au']
+
+
+def _month(expression):
+    return f"COALESCE(strftime('%Y-%m', {expression}), '')"
+
+
+def cents(expression):
+    """Valor monetário (2 casas) como inteiro em centavos; nulo vale 0"""
+    return f'CAST(ROUND(COALESCE({expression}, 0) * 100) AS INTEGER)'
+
+
+def _contribution(row, sign):
+    """Soma (sign 1) ou desconta (sign -1) dos agregados a tabela de custo `row` (NEW ou OLD)"""
+    impact = f"{sign} * {cents(f'{row}.monthly_impact')}"
+    statements = f"""
+        INSERT INTO {ROLLUP_COST_TABLES}(category, status, month, table_count, impact_cents)
+        VALUES ({row}.category, COALESCE({row}.status, ''), {_month(f'{row}.created_at')}, {sign}, {impact})
+        ON CONFLICT(category, status, month) DO UPDATE SET
+            table_count = table_count + excluded.table_count,
+            impact_cents = impact_cents + excluded.impact_cents;
+        INSERT INTO {ROLLUP_SUPPLIERS}(supplier_id, status, table_count, impact_cents)
+        VALUES ({row}.supplier_id, COALESCE({row}.status, ''), {sign}, {impact})
+        ON CONFLICT(supplier_id, status) DO UPDATE SET
+            table_count = table_count + excluded.table_count,
+            impact_cents = impact_cents + excluded.impact_cents;
+        INSERT INTO {ROLLUP_APPROVED_MONTHS}(month, table_count, impact_cents)
+        SELECT {_month(f'{row}.updated_at')}, {sign}, {impact} WHERE {row}.status = 'approved'
+        ON CONFLICT(month) DO UPDATE SET
+            table_count = table_count + excluded.table_count,
+            impact_cents = impact_cents + excluded.impact_cents;
+    """
+    if sign < 0:
+        # Grupos que ficaram vazios saem do agregado
+        statements += ''.join(f'DELETE FROM {name} WHERE table_count = 0;\n' for name in ROLLUP_TABLES)
+    return statements
+
+
+ROLLUP_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {ROLLUP_COST_TABLES} (
+        category VARCHAR(100) NOT NULL,
+        status VARCHAR(30) NOT NULL,
+        month VARCHAR(7) NOT NULL,
+        table_count INTEGER NOT NULL DEFAULT 0,
+        impact_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (category, status, month)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {ROLLUP_SUPPLIERS} (
+        supplier_id INTEGER NOT NULL,
+        status VARCHAR(30) NOT NULL,
+        table_count INTEGER NOT NULL DEFAULT 0,
+        impact_cents INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (supplier_id, status)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {ROLLUP_APPROVED_MONTHS} (
+        month VARCHAR(7) NOT NULL PRIMARY KEY,
+        table_count INTEGER NOT NULL DEFAULT 0,
+        impact_cents INTEGER NOT NULL DEFAULT 0
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_rollup_ai AFTER INSERT ON cost_tables BEGIN
+        {_contribution('new', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_rollup_ad AFTER DELETE ON cost_tables BEGIN
+        {_contribution('old', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_tables_rollup_au
+        AFTER UPDATE OF category, status, supplier_id, monthly_impact, created_at, updated_at ON cost_tables BEGIN
+        {_contribution('old', -1)}
+        {_contribution('new', 1)}
+    END""",
+]
+
+# Reconstrução completa a partir de cost_tables
+REBUILD_STATEMENTS = [
+    *[f'DELETE FROM {name}' for name in ROLLUP_TABLES],
+    f"""INSERT INTO {ROLLUP_COST_TABLES}(category, status, month, table_count, impact_cents)
+        SELECT category, COALESCE(status, ''), {_month('created_at')}, COUNT(*), SUM({cents('monthly_impact')})
+        FROM cost_tables GROUP BY 1, 2, 3""",
+    f"""INSERT INTO {ROLLUP_SUPPLIERS}(supplier_id, status, table_count, impact_cents)
+        SELECT supplier_id, COALESCE(status, ''), COUNT(*), SUM({cents('monthly_impact')})
+        FROM cost_tables GROUP BY 1, 2""",
+    f"""INSERT INTO {ROLLUP_APPROVED_MONTHS}(month, table_count, impact_cents)
+        SELECT {_month('updated_at')}, COUNT(*), SUM({cents('monthly_impact')})
+        FROM cost_tables WHERE status = 'approved' GROUP BY 1""",
+]
+
+rollup_cost_tables = table(ROLLUP_COST_TABLES, column('category'), column('status'), column('month'),
+                           column('table_count'), column('impact_cents'))
+rollup_suppliers = table(ROLLUP_SUPPLIERS, column('supplier_id'), column('status'),
+                         column('table_count'), column('impact_cents'))
+rollup_approved_months = table(ROLLUP_APPROVED_MONTHS, column('month'),
+                               column('table_count'), column('impact_cents'))
+
+
+def ensure_rollups(connection):
+    """Cria tabelas e triggers ausentes; agregados recém-criados são calculados com os dados atuais"""
+    existing = {
+        row[0] for row in connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'rollup_%'")
+        )
+    }
+    for statement in ROLLUP_DDL:
+        connection.execute(text(statement))
+    if not set(ROLLUP_TABLES) <= existing:
+        rebuild_rollups(connection)
+
+
+def drop_rollups(connection):
+    """Remove tabelas e triggers dos agregados (recriados por ensure_rollups)"""
+    for name in ROLLUP_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {name}'))
+    for name in ROLLUP_TABLES:
+        connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+
+def rebuild_rollups(connection):
+    """Recalcula todos os agregados a partir de cost_tables"""
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
@@ -0,0 +1,141 @@
+"""
+Busca textual com índices FTS5 do SQLite
+
+- cost_items_fts: sku, description e category dos itens (conteúdo externo,
+  lido da própria tabela cost_items; o índice guarda apenas os termos)
+- suppliers_fts: name, CNPJ só com dígitos e email dos fornecedores
+
+Os índices são mantidos por triggers em inserções, alterações e exclusões,
+inclusive as feitas em lote (executemany, INSERT ... SELECT). A busca casa
+cada termo digitado por prefixo e ordena pelo rank bm25.
+"""
+
+import re
+
+from sqlalchemy import table, column, literal_column, false, text
+
+COST_ITEMS_FTS = 'cost_items_fts'
+SUPPLIERS_FTS = 'suppliers_fts'
+
+# Sem acentos e sem diferenciar maiúsculas ("acucar" encontra "Açúcar")
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+
+def _digits(expression):
+    return f"replace(replace(replace(replace({expression}, '.', ''), '/', ''), '-', ''), ' ', '')"
+
+
+SEARCH_INDEX_DDL = [
+    # Itens: índice de conteúdo externo sobre cost_items
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {COST_ITEMS_FTS} USING fts5(
+        sku, description, category,
+        content='cost_items', content_rowid='id', tokenize='{TOKENIZER}'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_items_fts_ai AFTER INSERT ON cost_items BEGIN
+        INSERT INTO {COST_ITEMS_FTS}(rowid, sku, description, category)
+        VALUES (new.id, new.sku, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_items_fts_ad AFTER DELETE ON cost_items BEGIN
+        INSERT INTO {COST_ITEMS_FTS}({COST_ITEMS_FTS}, rowid, sku, description, category)
+        VALUES ('delete', old.id, old.sku, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_items_fts_au AFTER UPDATE OF sku, description, category ON cost_items BEGIN
+        INSERT INTO {COST_ITEMS_FTS}({COST_ITEMS_FTS}, rowid, sku, description, category)
+        VALUES ('delete', old.id, old.sku, old.description, old.category);
+        INSERT INTO {COST_ITEMS_FTS}(rowid, sku, description, category)
+        VALUES (new.id, new.sku, new.description, new.category);
+    END""",
+
+    # Fornecedores: o CNPJ é indexado só com os dígitos
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SUPPLIERS_FTS} USING fts5(
+        name, cnpj_digits, email, tokenize='{TOKENIZER}'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS suppliers_fts_ai AFTER INSERT ON suppliers BEGIN
+        INSERT INTO {SUPPLIERS_FTS}(rowid, name, cnpj_digits, email)
+        VALUES (new.id, new.name, {_digits('new.cnpj')}, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS suppliers_fts_ad AFTER DELETE ON suppliers BEGIN
+        DELETE FROM {SUPPLIERS_FTS} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS suppliers_fts_au AFTER UPDATE OF name, cnpj, email ON suppliers BEGIN
+        DELETE FROM {SUPPLIERS_FTS} WHERE rowid = old.id;
+        INSERT INTO {SUPPLIERS_FTS}(rowid, name, cnpj_digits, email)
+        VALUES (new.id, new.name, {_digits('new.cnpj')}, new.email);
+    END""",
+]
+
+# Reconstrução completa a partir das tabelas de origem
+REBUILD_STATEMENTS = [
+    f"INSERT INTO {COST_ITEMS_FTS}({COST_ITEMS_FTS}) VALUES ('rebuild')",
+    f"DELETE FROM {SUPPLIERS_FTS}",
+    f"""INSERT INTO {SUPPLIERS_FTS}(rowid, name, cnpj_digits, email)
+        SELECT id, name, {_digits('cnpj')}, email FROM suppliers""",
+]
+
+cost_items_fts = table(COST_ITEMS_FTS, column('rowid'), column('rank'))
+suppliers_fts = table(SUPPLIERS_FTS, column('rowid'), column('rank'))
+
+
+def ensure_search_index(connection):
+    """Cria índices e triggers ausentes; índices recém-criados são preenchidos com os dados atuais"""
+    existing = {
+        row[0] for row in connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (:items, :suppliers)"),
+            {'items': COST_ITEMS_FTS, 'suppliers': SUPPLIERS_FTS}
+        )
+    }
+    for statement in SEARCH_INDEX_DDL:
+        connection.execute(text(statement))
+    if existing != {COST_ITEMS_FTS, SUPPLIERS_FTS}:
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection):
+    """Reconstrói os índices de busca a partir de cost_items e suppliers"""
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def match_expression(search, collapse_digits=False):
+    """Converte o texto digitado em consulta FTS5: todos os termos, cada um por prefixo
+
+    Com collapse_digits, um texto só com dígitos e pontuação de CNPJ vira um único
+    termo de dígitos. Retorna None se não houver termo pesquisável.
+    """
+    search = (search or '').strip()
+    if collapse_digits and re.fullmatch(r'[\d./\-\s]+', search):
+        terms = [re.sub(r'\D', '', search)]
+    else:
+        terms = re.findall(r'\w+', search)
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    # Aspas neutralizam a sintaxe do FTS5 (operadores, colunas) no texto do usuário
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _search(query, model, index, search, collapse_digits=False):
+    expression = match_expression(search, collapse_digits)
+    if expression is None:
+        return query.filter(false())
+    return (query.join(index, index.c.rowid == model.id)
+            .filter(literal_column(index.name).op('MATCH')(expression))
+            .order_by(index.c.rank))
+
+
+def search_cost_items(query, model, search, cost_table_id=None):
+    """Restringe a consulta de itens aos que casam com a busca, ordenando por relevância
+
+    O filtro por tabela usa `cost_table_id + 0` de propósito: sem ele o SQLite
+    percorre todos os itens da tabela pelo índice e avalia o MATCH linha a linha;
+    assim a consulta parte dos resultados do FTS e busca cada item pela chave. O
+    plano é conferido em services/query_plans.py (flask check-query-plans).
+    """
+    if cost_table_id is not None:
+        query = query.filter((model.cost_table_id + 0) == cost_table_id)
+    return _search(query, model, cost_items_fts, search)
+
+
+def search_suppliers(query, model, search):
+    """Restringe a consulta de fornecedores aos que casam com a busca, ordenando por relevância"""
+    return _search(query, model, suppliers_fts, search, collapse_digits=True)
@@ -0,0 +1,338 @@
+"""
+Serialização das listagens a partir de tuplas, sem instâncias do ORM
+
+Cada modelo tem um esquema com os campos da saída (os mesmos de to_dict), as
+colunas de origem de cada campo e a conversão. A consulta seleciona só as
+colunas dos campos pedidos e a conversão é feita direto sobre as linhas:
+
+- números (Numeric) vêm do SQLite como float, sem passar por Decimal
+- datas vêm como o texto gravado e viram ISO 8601 (igual a isoformat())
+- campos derivados (days_remaining, is_overdue, needs_reminder...) usam um
+  único `now` por resposta
+- colunas JSON repetidas (categorias dos usuários) são lidas uma vez por valor
+
+?fields=a,b,c limita os campos da resposta. Objetos relacionados (fornecedor,
+aprovador...) são buscados com uma consulta por relação, pelos ids da página.
+
+As respostas usam orjson quando instalado, com json da biblioteca padrão como
+alternativa; a saída é a mesma de jsonify (chaves ordenadas).
+"""
+
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from operator import itemgetter
+
+from flask import Response, current_app
+from sqlalchemy import Date, DateTime, Float, Numeric, String, select, type_coerce
+
+from models.approval import Approval
+from models.cost_table import CostTable, CostItem
+from models.supplier import Supplier
+from models.user import User, ROLE_NAMES, db
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _number(value):
+    return float(value) if value else 0
+
+
+def _timestamp(value):
+    """Texto gravado pelo SQLite ('AAAA-MM-DD HH:MM:SS.ffffff') no formato de isoformat()"""
+    if value is None:
+        return None
+    value = value.replace(' ', 'T', 1)
+    return value[:-7] if value.endswith('.000000') else value
+
+
+def _loads(value):
+    return orjson.loads(value) if orjson else json.loads(value)
+
+
+def _json(value):
+    return _loads(value) if value else None
+
+
+@lru_cache(maxsize=256)
+def _parsed_list(value):
+    return tuple(_loads(value))
+
+
+def _json_list(value):
+    return list(_parsed_list(value)) if value else []
+
+
+def _deadline(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _days_remaining(now, deadline):
+    return max(0, (_deadline(deadline) - now).days) if deadline else 0
+
+
+def _is_overdue(now, deadline):
+    return now > _deadline(deadline) if deadline else False
+
+
+def _needs_reminder(now, status, deadline, reminded_at):
+    if status != 'pending':
+        return False
+    reminder_time = _deadline(deadline) - timedelta(hours=24)
+    return now >= reminder_time and (not reminded_at or _deadline(reminded_at) < reminder_time)
+
+
+def _approval_level(monthly_impact):
+    monthly_impact = float(monthly_impact or 0)
+    if monthly_impact <= 50000:
+        return 'manager'
+    elif monthly_impact <= 200000:
+        return 'director'
+    elif monthly_impact <= 500000:
+        return 'vp'
+    return 'full_chain'
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name} {last_name}"
+
+
+def _role_display(role):
+    return ROLE_NAMES.get(role, role)
+
+
+class Field:
+    """Campo da saída: colunas de origem e conversão (sem conversão, o valor vai como veio)
+
+    Com uses_now, a conversão recebe o instante da resposta como primeiro argumento.
+    """
+
+    def __init__(self, name, sources=None, convert=None, uses_now=False):
+        self.name = name
+        self.sources = sources or [name]
+        self.convert = convert
+        self.uses_now = uses_now
+
+
+def _select_column(column):
+    """Coluna como vem do driver: Numeric como float e datas como texto"""
+    if isinstance(column.type, Numeric):
+        return type_coerce(column, Float).label(column.key)
+    if isinstance(column.type, (DateTime, Date)):
+        return type_coerce(column, String).label(column.key)
+    return column.label(column.key)
+
+
+class Projection:
+    """Campos escolhidos de um esquema: colunas a selecionar e conversão das linhas"""
+
+    def __init__(self, schema, names, extra=()):
+        self.schema = schema
+        self.fields = [schema.fields[name] for name in names]
+
+        sources = []
+        for source in [s for field in self.fields for s in field.sources] + list(extra):
+            if source not in sources:
+                sources.append(source)
+        self.positions = {source: index for index, source in enumerate(sources)}
+        self.columns = [_select_column(schema.table.c[source]) for source in sources]
+
+    def _getters(self, now):
+        getters = []
+        for field in self.fields:
+            positions = [self.positions[source] for source in field.sources]
+            if field.convert is None:
+                getter = itemgetter(positions[0])
+            elif field.uses_now or len(positions) > 1:
+                convert = partial(field.convert, now) if field.uses_now else field.convert
+                values = itemgetter(*positions)
+                if len(positions) > 1:
+                    getter = lambda row, convert=convert, values=values: convert(*values(row))
+                else:
+                    getter = lambda row, convert=convert, values=values: convert(values(row))
+            else:
+                getter = lambda row, convert=field.convert, position=positions[0]: convert(row[position])
+            getters.append((field.name, getter))
+        return getters
+
+    def serialize(self, rows, now=None):
+        """Lista de dicionários (mesmo formato de to_dict) a partir das linhas"""
+        getters = self._getters(now or datetime.utcnow())
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+    def select(self):
+        return select(*self.columns)
+
+
+class Schema:
+    def __init__(self, model, fields, relations=None):
+        self.model = model
+        self.table = model.__table__
+        self.fields = {field.name: field for field in fields}
+        # Objetos relacionados: nome na saída -> (campo com o id, esquema)
+        self.relations = relations or {}
+        self._projections = {}
+
+    @property
+    def names(self):
+        return list(self.fields) + list(self.relations)
+
+    def parse_fields(self, value):
+        """Campos pedidos em ?fields=a,b,c (todos se vazio), na ordem do esquema"""
+        if not value:
+            return None
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.names]
+        if unknown:
+            raise FieldError(f"Campos desconhecidos: {', '.join(unknown)}. "
+                             f"Disponíveis: {', '.join(self.names)}")
+        return [name for name in self.names if name in requested]
+
+    def relations_for(self, names=None):
+        """Relações incluídas na resposta"""
+        return [name for name in self.relations if names is None or name in names]
+
+    def project(self, names=None, extra=()):
+        """Projeção dos campos `names` (todos se None); `extra` são colunas só para a consulta
+
+        O campo com o id de cada relação pedida entra na saída junto com ela.
+        """
+        names = list(self.fields) if names is None else names
+        fields = [name for name in self.fields
+                  if name in names or any(self.relations[relation][0] == name
+                                          for relation in self.relations_for(names))]
+        key = (tuple(fields), tuple(extra))
+        projection = self._projections.get(key)
+        if projection is None:
+            projection = self._projections[key] = Projection(self, fields, extra)
+        return projection
+
+    def query(self, names=None, extra=()):
+        """Consulta (Query) só com as colunas da projeção, para filtrar e paginar"""
+        return db.session.query(*self.project(names, extra).columns)
+
+    def serialize(self, rows, names=None, extra=(), now=None):
+        return self.project(names, extra).serialize(rows, now)
+
+    def attach_relations(self, items, names=None, now=None):
+        """Inclui nos itens as relações pedidas (todas se names for None)"""
+        for relation in self.relations_for(names):
+            link, schema = self.relations[relation]
+            attach(items, relation, link, schema, now)
+        return items
+
+
+def attach(items, key, link, schema, now=None):
+    """Inclui em cada item o objeto relacionado (item[link] é o id), com uma consulta só"""
+    ids = {item[link] for item in items if item.get(link) is not None}
+    related = {}
+    if ids:
+        projection = schema.project(extra=['id'])
+        id_position = projection.positions['id']
+        rows = db.session.execute(
+            projection.select().where(schema.table.c.id.in_(ids))
+        ).all()
+        related = {row[id_position]: item for row, item in zip(rows, projection.serialize(rows, now))}
+    for item in items:
+        item[key] = related.get(item.get(link))
+    return items
+
+
+def dumps(payload):
+    """JSON (bytes) com chaves ordenadas, como jsonify"""
+    if orjson:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    if orjson:
+        return Response(dumps(payload), status=status, mimetype=JSON_MIMETYPE)
+    response = current_app.json.response(payload)
+    response.status_code = status
+    return response
+
+
+SUPPLIER_SCHEMA = Schema(Supplier, [
+    Field('id'), Field('name'), Field('cnpj'), Field('email'), Field('phone'), Field('address'),
+    Field('category'), Field('status'),
+    Field('created_at', convert=_timestamp),
+    Field('updated_at', convert=_timestamp),
+])
+
+USER_SCHEMA = Schema(User, [
+    Field('id'), Field('username'), Field('email'), Field('first_name'), Field('last_name'),
+    Field('full_name', ['first_name', 'last_name'], _full_name),
+    Field('phone'), Field('role'),
+    Field('role_display', ['role'], _role_display),
+    Field('department'), Field('manager_id'), Field('supplier_id'),
+    Field('approval_limit', convert=_number),
+    Field('can_delegate'),
+    Field('categories', convert=_json_list),
+    Field('is_active'), Field('email_notifications'),
+    Field('last_login', convert=_timestamp),
+    Field('created_at', convert=_timestamp),
+    Field('updated_at', convert=_timestamp),
+])
+
+COST_TABLE_SCHEMA = Schema(CostTable, [
+    Field('id'), Field('supplier_id'), Field('version'), Field('filename'), Field('file_size'),
+    Field('effective_date'), Field('expiration_date'),
+    Field('category'), Field('currency'), Field('status'), Field('total_items'),
+    Field('total_value', convert=_number),
+    Field('previous_total_value', convert=_number),
+    Field('impact_value', convert=_number),
+    Field('impact_percentage', convert=_number),
+    Field('monthly_impact', convert=_number),
+    Field('current_margin', convert=_number),
+    Field('new_margin', convert=_number),
+    Field('margin_impact', convert=_number),
+    Field('submitted_by'),
+    Field('submitted_at', convert=_timestamp),
+    Field('deadline', convert=_timestamp),
+    Field('days_remaining', ['deadline'], _days_remaining, uses_now=True),
+    Field('is_overdue', ['deadline'], _is_overdue, uses_now=True),
+    Field('comments'), Field('rejection_reason'),
+    Field('sku_comparison', convert=_json),
+    Field('created_at', convert=_timestamp),
+    Field('updated_at', convert=_timestamp),
+    Field('approval_level_required', ['monthly_impact'], _approval_level),
+], relations={'supplier': ('supplier_id', SUPPLIER_SCHEMA), 'submitter': ('submitted_by', USER_SCHEMA)})
+
+COST_ITEM_SCHEMA = Schema(CostItem, [
+    Field('id'), Field('cost_table_id'), Field('sku'), Field('description'), Field('category'),
+    Field('unit'),
+    Field('previous_cost', convert=_number),
+    Field('new_cost', convert=_number),
+    Field('cost_change', convert=_number),
+    Field('cost_change_percentage', convert=_number),
+    Field('monthly_volume', convert=_number),
+    Field('monthly_impact', convert=_number),
+    Field('created_at', convert=_timestamp),
+])
+
+APPROVAL_SCHEMA = Schema(Approval, [
+    Field('id'), Field('cost_table_id'), Field('approver_id'), Field('approval_type'),
+    Field('status'), Field('sequence_order'),
+    Field('decision_date', convert=_timestamp),
+    Field('comments'), Field('rejection_reason'),
+    Field('assigned_at', convert=_timestamp),
+    Field('deadline', convert=_timestamp),
+    Field('days_remaining', ['deadline'], _days_remaining, uses_now=True),
+    Field('is_overdue', ['deadline'], _is_overdue, uses_now=True),
+    Field('needs_reminder', ['status', 'deadline', 'reminded_at'], _needs_reminder, uses_now=True),
+    Field('delegated_to'),
+    Field('delegated_at', convert=_timestamp),
+    Field('delegation_reason'),
+    Field('created_at', convert=_timestamp),
+    Field('updated_at', convert=_timestamp),
+], relations={'cost_table': ('cost_table_id', COST_TABLE_SCHEMA), 'approver': ('approver_id', USER_SCHEMA)})
@@ -0,0 +1,108 @@
+"""
+Resolução do custo anterior por SKU contra a última tabela aprovada do fornecedor
+
+Os SKUs enviados são cruzados de uma vez com os itens da tabela aprovada (hash
+join em memória, sem uma consulta por SKU). Os itens aprovados vêm do snapshot
+colunar da tabela ou, se ele ainda não existir, de uma única consulta ordenada
+pelo índice (cost_table_id, sku).
+
+- SKU encontrado sem previous_cost informado: recebe o custo aprovado (filled)
+- SKU encontrado com previous_cost diferente do aprovado: vale o aprovado (mismatch)
+- SKU não encontrado: item novo, mantém o previous_cost da planilha (new)
+- SKU aprovado ausente no envio: descontinuado (discontinued)
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models.cost_table import CostItem
+from models.user import db
+from services.cost_calculation import round_half_up, COST_SCALE
+from services.snapshots import load_snapshot
+
+SAMPLE_SIZE = 50  # SKUs de exemplo por situação no resumo
+
+
+def load_approved_costs(cost_table_id):
+    """Retorna (skus, custos) da tabela aprovada, ordenados por sku"""
+    snapshot = load_snapshot(cost_table_id)
+    if snapshot is not None:
+        return np.asarray(snapshot.columns['sku']), snapshot.columns['new_cost']
+
+    items = CostItem.__table__
+    rows = db.session.execute(
+        select(items.c.sku, items.c.new_cost)
+        .where(items.c.cost_table_id == cost_table_id)
+        .order_by(items.c.sku, items.c.id)
+    ).all()
+    skus = np.asarray([row[0] for row in rows], dtype=np.str_)
+    costs = np.asarray([float(row[1] or 0) for row in rows], dtype=np.float64)
+    return skus, costs
+
+
+def _approved_index(skus):
+    # Tabelas antigas podem ter SKU repetido; vale a primeira ocorrência (menor id)
+    index = pd.Index(skus)
+    if not index.is_unique:
+        keep = ~index.duplicated(keep='first')
+        return index[keep], keep
+    return index, None
+
+
+def _sample(values):
+    return [str(value) for value in values[:SAMPLE_SIZE]]
+
+
+def resolve_previous_costs(df, approved_table_id):
+    """Preenche ou confere previous_cost de cada SKU contra a tabela aprovada
+
+    Retorna (df, resumo), com o resumo da comparação (contagens e SKUs de exemplo).
+    """
+    skus, costs = load_approved_costs(approved_table_id)
+    index, keep = _approved_index(skus)
+    costs = round_half_up(costs if keep is None else costs[keep], COST_SCALE)
+
+    positions = index.get_indexer(df['sku'])
+    found = positions >= 0
+    approved = np.where(found, costs[positions], 0.0) if len(costs) else np.zeros(len(df))
+    declared = round_half_up(df['previous_cost'].to_numpy(dtype=np.float64), COST_SCALE)
+
+    filled = found & (declared == 0)
+    mismatch = found & (declared != 0) & (declared != approved)
+    new = ~found
+
+    hit = np.zeros(len(index), dtype=bool)
+    hit[positions[found]] = True
+    discontinued = index[~hit]
+
+    df = df.copy()
+    df['previous_cost'] = np.where(found, approved, declared)
+
+    uploaded_skus = df['sku'].to_numpy()
+    summary = {
+        'approved_cost_table_id': approved_table_id,
+        'matched': int(found.sum()),
+        'filled': int(filled.sum()),
+        'mismatch': int(mismatch.sum()),
+        'new': int(new.sum()),
+        'discontinued': int(len(discontinued)),
+        'samples': {
+            'filled': _sample(uploaded_skus[filled]),
+            'mismatch': _sample(uploaded_skus[mismatch]),
+            'new': _sample(uploaded_skus[new]),
+            'discontinued': _sample(discontinued)
+        }
+    }
+    return df, summary
+
+
+def compare_skus(skus, approved_table_id):
+    """SKUs novos e descontinuados de uma tabela em relação à aprovada (listas completas)"""
+    approved_skus, _ = load_approved_costs(approved_table_id)
+    skus = np.asarray(skus)
+    approved_skus = np.asarray(approved_skus)
+    return {
+        'new': np.unique(skus[~np.isin(skus, approved_skus)]).tolist(),
+        'discontinued': np.unique(approved_skus[~np.isin(approved_skus, skus)]).tolist()
+    }
@@ -0,0 +1,344 @@
+"""
+Snapshot colunar dos itens de cada tabela de custos
+
+Os itens de uma tabela não mudam depois do upload. Ao finalizar a ingestão, eles
+são gravados ao lado do upload em arquivos .npy por coluna (ordenados por sku,
+id), que as rotas de leitura abrem com memory map para servir páginas,
+agregações e exportações sem consultar o SQLite.
+
+Números e ids são arrays float64/int64. Texto livre (sku, descrição) fica em
+bytes UTF-8 concatenados com os offsets de cada valor; categoria e unidade, com
+poucos valores distintos, ficam como códigos int32 e a lista de valores.
+"""
+
+import json
+import os
+import shutil
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from models.cost_table import CostItem
+from models.user import db
+
+SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_VERSION = 2
+
+# Texto livre: bytes UTF-8 concatenados + offsets; poucos valores distintos: dicionário + códigos
+UTF8_COLUMNS = ['sku', 'description']
+DICTIONARY_COLUMNS = ['category', 'unit']
+TEXT_COLUMNS = ['sku', 'description', 'category', 'unit']
+NUMERIC_COLUMNS = ['previous_cost', 'new_cost', 'cost_change', 'cost_change_percentage',
+                   'monthly_volume', 'monthly_impact']
+SNAPSHOT_COLUMNS = ['id'] + TEXT_COLUMNS + NUMERIC_COLUMNS
+
+# Linhas lidas do banco por vez ao gravar o snapshot
+WRITE_BATCH_SIZE = 5000
+
+# Snapshots abertos recentemente (memory maps, baratos de manter)
+_OPEN_SNAPSHOTS_LIMIT = 32
+_open_snapshots = OrderedDict()
+_open_snapshots_lock = threading.Lock()
+
+
+class TextColumn:
+    """Coluna de texto em UTF-8: bytes de todos os valores concatenados e o offset de cada um (n + 1)
+
+    Ocupa o tamanho real do texto (um np.str_ de largura fixa reserva, para toda linha,
+    4 bytes por caractere do maior valor). Índices inteiros devolvem np.str_; fatias e
+    listas de posições, arrays de objetos.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _value(self, position):
+        return bytes(self.data[self.offsets[position]:self.offsets[position + 1]]).decode('utf-8')
+
+    def _range(self, start, stop):
+        if stop <= start:
+            return []
+        offsets = np.asarray(self.offsets[start:stop + 1], dtype=np.int64)
+        base = int(offsets[0])
+        blob = bytes(self.data[base:int(offsets[-1])])
+        bounds = (offsets - base).tolist()
+        return [blob[low:high].decode('utf-8') for low, high in zip(bounds[:-1], bounds[1:])]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            values = self._range(start, stop) if step == 1 else self._range(0, len(self))[key]
+            return np.array(values, dtype=object)
+        if isinstance(key, (int, np.integer)):
+            position = int(key) + (len(self) if key < 0 else 0)
+            if not 0 <= position < len(self):
+                raise IndexError(key)
+            return np.str_(self._value(position))
+        positions = np.asarray(key)
+        if positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+        return np.array([self._value(int(position)) for position in positions], dtype=object)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._range(0, len(self)), dtype=dtype or object)
+
+    def searchsorted(self, value, side='left'):
+        """Busca binária numa coluna ordenada (ordem de bytes UTF-8, a mesma do ORDER BY do SQLite)"""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            current = self._value(middle)
+            if current < value or (side == 'right' and current == value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class DictionaryColumn:
+    """Coluna de texto com poucos valores distintos: valores ordenados e o código de cada linha"""
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = np.array(values, dtype=object)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return np.str_(self.values[self.codes[key]])
+        return self.values[np.asarray(self.codes[key])]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values[np.asarray(self.codes)].astype(dtype or object)
+
+
+class _TextBuilder:
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def append(self, value):
+        self.data += (value or '').encode('utf-8')
+        self.offsets.append(len(self.data))
+
+    def save(self, directory, name):
+        np.save(os.path.join(directory, f'{name}.data.npy'), np.frombuffer(bytes(self.data), dtype=np.uint8))
+        np.save(os.path.join(directory, f'{name}.offsets.npy'), np.frombuffer(self.offsets, dtype=np.int64))
+
+
+class _DictionaryBuilder:
+    def __init__(self):
+        self.codes = array('i')
+        self.index = {}
+
+    def append(self, value):
+        value = value or ''
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.index)
+        self.codes.append(code)
+
+    def save(self, directory, name):
+        # Códigos renumerados pela ordem dos valores (como np.unique)
+        values = sorted(self.index)
+        remap = np.empty(len(values), dtype=np.int32)
+        for rank, value in enumerate(values):
+            remap[self.index[value]] = rank
+        codes = remap[np.frombuffer(self.codes, dtype=np.int32)] if len(self.codes) else np.empty(0, np.int32)
+        np.save(os.path.join(directory, f'{name}.codes.npy'), codes)
+        with open(os.path.join(directory, f'{name}.values.json'), 'w') as f:
+            json.dump(values, f)
+
+
+class CostItemSnapshot:
+    """Itens de uma tabela de custos em colunas mapeadas em memória"""
+
+    def __init__(self, cost_table_id, columns, meta):
+        self.cost_table_id = cost_table_id
+        self.columns = columns
+        self.meta = meta
+        self.rows = meta['rows']
+        self.created_at = meta.get('created_at')
+
+    def __len__(self):
+        return self.rows
+
+    def position_after(self, sku, item_id):
+        """Posição do primeiro item depois de (sku, id) na ordem do snapshot"""
+        skus = self.columns['sku']
+        start = skus.searchsorted(sku, side='left')
+        stop = skus.searchsorted(sku, side='right')
+        return start + int(np.searchsorted(self.columns['id'][start:stop], item_id, side='right'))
+
+    def to_dicts(self, start=0, stop=None, fields=None):
+        """Itens no mesmo formato de CostItem.to_dict, para o intervalo [start, stop)
+
+        Com `fields`, só esses campos (colunas do snapshot, cost_table_id e created_at).
+        """
+        requested = fields
+        fields = [name for name in fields if name in self.columns] if fields else SNAPSHOT_COLUMNS
+        values = [self.columns[name][start:stop].tolist() for name in fields]
+        extra = {}
+        if not requested or 'cost_table_id' in requested:
+            extra['cost_table_id'] = self.cost_table_id
+        if not requested or 'created_at' in requested:
+            extra['created_at'] = self.created_at
+        return [dict(zip(fields, row), **extra) for row in zip(*values)]
+
+
+def snapshot_path(cost_table_id, upload_folder=None):
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    return os.path.join(upload_folder, SNAPSHOT_DIR, str(cost_table_id))
+
+
+def _read_meta(path):
+    """meta.json do snapshot em `path` se ele estiver na versão atual, senão None"""
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == SNAPSHOT_VERSION else None
+
+
+def _publish(temp_dir, target):
+    """Troca o diretório temporário pelo snapshot com rename atômico
+
+    Dois escritores podem gravar a mesma tabela ao mesmo tempo (o job de ingestão e
+    a primeira leitura na aplicação web). Como os itens não mudam depois do upload,
+    um snapshot da versão atual já publicado por outro escritor vale como sucesso:
+    o temporário é descartado. Um snapshot de versão antiga sai do caminho (rename
+    para um nome próprio) antes da troca.
+    """
+    for _ in range(3):
+        try:
+            os.rename(temp_dir, target)
+            return
+        except OSError:
+            if _read_meta(target) is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return
+        stale = f'{target}.{os.getpid()}.{threading.get_ident()}.old'
+        try:
+            os.rename(target, stale)
+        except OSError:
+            pass  # Outro escritor já tirou o antigo do caminho
+        shutil.rmtree(stale, ignore_errors=True)
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    raise OSError(f'Não foi possível publicar o snapshot em {target}')
+
+
+def write_snapshot(cost_table_id, upload_folder=None):
+    """Grava o snapshot colunar a partir dos itens persistidos (uma leitura sequencial, em lotes)"""
+    target = snapshot_path(cost_table_id, upload_folder)
+    items = CostItem.__table__
+    columns = [items.c[name] for name in SNAPSHOT_COLUMNS] + [items.c.created_at]
+    result = db.session.execute(
+        select(*columns)
+        .where(items.c.cost_table_id == cost_table_id)
+        .order_by(items.c.sku, items.c.id)
+        .execution_options(yield_per=WRITE_BATCH_SIZE)
+    )
+
+    ids = array('q')
+    builders = {name: _TextBuilder() for name in UTF8_COLUMNS}
+    builders.update({name: _DictionaryBuilder() for name in DICTIONARY_COLUMNS})
+    numbers = {name: array('d') for name in NUMERIC_COLUMNS}
+    text_positions = [(SNAPSHOT_COLUMNS.index(name), builders[name]) for name in TEXT_COLUMNS]
+    numeric_positions = [(SNAPSHOT_COLUMNS.index(name), numbers[name]) for name in NUMERIC_COLUMNS]
+    created_at = None
+    for rows in result.partitions():
+        for row in rows:
+            ids.append(row[0])
+            for position, builder in text_positions:
+                builder.append(row[position])
+            for position, values in numeric_positions:
+                values.append(float(row[position] or 0))
+            if row[-1] is not None and (created_at is None or row[-1] > created_at):
+                created_at = row[-1]
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'cost_table_id': cost_table_id,
+        'rows': len(ids),
+        'sorted_by': ['sku', 'id'],
+        'columns': SNAPSHOT_COLUMNS,
+        'created_at': created_at.isoformat() if created_at else None,
+        'written_at': datetime.utcnow().isoformat()
+    }
+
+    # Grava em diretório temporário e publica de uma vez, para leitores nunca verem snapshot parcial
+    temp_dir = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    np.save(os.path.join(temp_dir, 'id.npy'), np.frombuffer(ids, dtype=np.int64))
+    for name, builder in builders.items():
+        builder.save(temp_dir, name)
+    for name, values in numbers.items():
+        np.save(os.path.join(temp_dir, f'{name}.npy'), np.frombuffer(values, dtype=np.float64))
+    with open(os.path.join(temp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    _publish(temp_dir, target)
+    return target
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Arrays vazios não podem ser mapeados em memória
+        return np.load(path)
+
+
+def _load_column(path, name):
+    if name in UTF8_COLUMNS:
+        return TextColumn(_load_array(os.path.join(path, f'{name}.data.npy')),
+                          _load_array(os.path.join(path, f'{name}.offsets.npy')))
+    if name in DICTIONARY_COLUMNS:
+        with open(os.path.join(path, f'{name}.values.json')) as f:
+            values = json.load(f)
+        return DictionaryColumn(_load_array(os.path.join(path, f'{name}.codes.npy')), values)
+    return _load_array(os.path.join(path, f'{name}.npy'))
+
+
+def load_snapshot(cost_table_id, upload_folder=None):
+    """Abre o snapshot com memory map; retorna None se ainda não existir"""
+    path = snapshot_path(cost_table_id, upload_folder)
+    with _open_snapshots_lock:
+        if path in _open_snapshots:
+            _open_snapshots.move_to_end(path)
+            return _open_snapshots[path]
+
+    meta = _read_meta(path)
+    if meta is None:
+        return None
+
+    columns = {name: _load_column(path, name) for name in meta['columns']}
+    snapshot = CostItemSnapshot(cost_table_id, columns, meta)
+
+    with _open_snapshots_lock:
+        _open_snapshots[path] = snapshot
+        while len(_open_snapshots) > _OPEN_SNAPSHOTS_LIMIT:
+            _open_snapshots.popitem(last=False)
+    return snapshot
+
+
+def get_snapshot(cost_table_id):
+    """Retorna o snapshot da tabela, gerando-o a partir do banco se ainda não existir"""
+    snapshot = load_snapshot(cost_table_id)
+    if snapshot is None:
+        write_snapshot(cost_table_id)
+        snapshot = load_snapshot(cost_table_id)
+    return snapshot
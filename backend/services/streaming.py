@@ -0,0 +1,60 @@
+"""
+Respostas em streaming com os itens de uma tabela de custos
+
+Os itens são lidos do snapshot colunar (memory map, ordenado por sku, id) em
+lotes de tamanho fixo e serializados lote a lote, de modo que a memória por
+requisição não depende do tamanho da tabela. Dois formatos:
+
+- json: o mesmo documento da resposta normal ({"cost_table": {..., "items": [...]}}),
+  enviado em partes (Transfer-Encoding: chunked)
+- ndjson: uma linha com os dados da tabela (sem itens) e, depois, um item por linha
+"""
+
+import json
+
+DEFAULT_STREAM_BATCH_SIZE = 1000
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_FORMATS = ('json', 'ndjson')
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def stream_format(request):
+    """Formato de streaming pedido (?stream=json|ndjson ou Accept: application/x-ndjson), ou None"""
+    requested = request.args.get('stream')
+    if requested:
+        return requested if requested in STREAM_FORMATS else 'invalid'
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+
+def iter_item_batches(snapshot, batch_size=DEFAULT_STREAM_BATCH_SIZE):
+    """Itens do snapshot em listas de até batch_size dicionários"""
+    for start in range(0, len(snapshot), batch_size):
+        yield snapshot.to_dicts(start, start + batch_size)
+
+
+def cost_table_json_chunks(table_dict, batches):
+    """Partes do documento {"cost_table": {..., "items": [...]}}"""
+    header = _dumps(table_dict)
+    yield '{"cost_table":' + header[:-1] + (',' if table_dict else '') + '"items":['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = ','.join(_dumps(item) for item in batch)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']}}\n'
+
+
+def cost_table_ndjson_chunks(table_dict, batches):
+    """Linha da tabela seguida de uma linha por item"""
+    yield _dumps({'cost_table': table_dict}) + '\n'
+    for batch in batches:
+        if batch:
+            yield ''.join(_dumps(item) + '\n' for item in batch)
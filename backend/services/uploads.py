@@ -0,0 +1,210 @@
+"""
+Gravação de uploads em passagem única
+
+O corpo multipart é gravado diretamente na pasta de uploads enquanto é recebido,
+calculando o SHA256 e o tamanho no mesmo fluxo. Assim o arquivo é escrito uma
+única vez e não precisa ser relido para gerar o hash.
+
+As partes de uploads em partes ficam em UPLOAD_FOLDER/chunked/<id> até a
+conclusão; uploads abandonados expiram após UPLOAD_SESSION_TTL_HOURS sem
+atividade (comando expire-uploads).
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import Request, current_app
+
+from models.upload_session import UploadSession
+from models.user import db
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # 1MB
+CHUNKED_UPLOAD_DIR = 'chunked'
+DEFAULT_UPLOAD_SESSION_TTL_HOURS = 24
+
+
+class HashingFileWriter:
+    """Arquivo temporário que calcula SHA256 e tamanho à medida que recebe dados"""
+
+    def __init__(self, directory, buffer_size=DEFAULT_BUFFER_SIZE):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b', buffering=buffer_size)
+        self._hash = hashlib.sha256()
+        self._persisted = False
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def persist(self, destination):
+        """Move o arquivo recebido para o destino final (sem cópia)"""
+        self._file.close()
+        os.replace(self.path, destination)
+        self._persisted = True
+        return StoredUpload(destination, self.sha256, self.size)
+
+    def close(self):
+        # Uploads descartados não deixam arquivos temporários para trás
+        self._file.close()
+        if not self._persisted and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush etc. são delegados ao arquivo subjacente
+        return getattr(self._file, name)
+
+
+class StoredUpload:
+    """Arquivo gravado na pasta de uploads, com hash e tamanho já calculados"""
+
+    def __init__(self, path, sha256, size):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+    def open_buffer(self):
+        return open_upload_buffer(self.path)
+
+
+class UploadRequest(Request):
+    """Request que grava arquivos multipart direto na pasta de uploads, com hash"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return HashingFileWriter(
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config.get('UPLOAD_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+        )
+
+
+def store_upload(file_storage, file_path, buffer_size=None):
+    """Grava o arquivo enviado em file_path e retorna StoredUpload com hash e tamanho"""
+    stream = file_storage.stream
+    if isinstance(stream, HashingFileWriter):
+        return stream.persist(file_path)
+
+    # Fallback: copia em blocos grandes, calculando o hash na mesma passagem
+    if buffer_size is None:
+        buffer_size = current_app.config.get('UPLOAD_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+    return save_stream(stream, file_path, buffer_size)
+
+
+def save_stream(stream, file_path, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Copia um stream para file_path calculando SHA256 e tamanho"""
+    hash_sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(buffer_size), b""):
+            hash_sha256.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    return StoredUpload(file_path, hash_sha256.hexdigest(), size)
+
+
+class MappedBuffer:
+    """Memory map somente leitura com a interface de arquivo esperada por pandas/zipfile"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._buffer, name)
+
+
+@contextmanager
+def open_upload_buffer(file_path):
+    """Abre o arquivo gravado como memory map somente leitura, pronto para o parser"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield MappedBuffer(buffer)
+
+
+def chunked_upload_dir(upload_folder, upload_id):
+    """Pasta com as partes recebidas de um upload em partes"""
+    return os.path.join(upload_folder, CHUNKED_UPLOAD_DIR, upload_id)
+
+
+def _last_activity(upload_session, directory):
+    # Partes novas não alteram a linha do upload, só a pasta (mtime)
+    last = upload_session.updated_at or upload_session.created_at
+    try:
+        last = max(last, datetime.utcfromtimestamp(os.stat(directory).st_mtime))
+    except OSError:
+        pass
+    return last
+
+
+def expire_upload_sessions(ttl_hours=None, upload_folder=None):
+    """Expira uploads em partes sem atividade há mais de ttl_hours e apaga suas partes
+
+    Uploads abertos (ou presos em conclusão) passam a 'expired'; pastas de partes
+    sem upload aberto correspondente também são removidas. Retorna o número de
+    uploads expirados.
+    """
+    if ttl_hours is None:
+        ttl_hours = current_app.config.get('UPLOAD_SESSION_TTL_HOURS', DEFAULT_UPLOAD_SESSION_TTL_HOURS)
+    upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+
+    expired = 0
+    active = set()
+    sessions = UploadSession.query.filter(UploadSession.state.in_(['open', 'completing'])).all()
+    for upload_session in sessions:
+        directory = chunked_upload_dir(upload_folder, upload_session.id)
+        if _last_activity(upload_session, directory) >= cutoff:
+            active.add(upload_session.id)
+            continue
+        # Só expira se ninguém mudou o estado desde a leitura
+        result = db.session.execute(
+            UploadSession.__table__.update()
+            .where(UploadSession.id == upload_session.id, UploadSession.state == upload_session.state)
+            .values(state='expired', updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            expired += 1
+        else:
+            active.add(upload_session.id)
+
+    # Pastas de uploads já encerrados ou expirados (inclusive órfãs)
+    root = os.path.join(upload_folder, CHUNKED_UPLOAD_DIR)
+    if os.path.isdir(root):
+        grace = time.time() - ttl_hours * 3600
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name in active:
+                continue
+            try:
+                recent = os.stat(path).st_mtime >= grace
+            except OSError:
+                continue
+            # Pasta recente sem linha: upload sendo iniciado (pasta criada antes do commit)
+            if recent and db.session.get(UploadSession, name) is None:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+    return expired
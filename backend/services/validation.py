@@ -0,0 +1,187 @@
+"""
+Validação vetorizada das linhas de uma tabela de custos
+
+Todas as regras são avaliadas de uma vez sobre máscaras de coluna (sem laço por
+linha), bloco a bloco durante a leitura do arquivo. O resultado é um índice
+compacto: a posição de cada linha com problema e um bitmask com as regras
+violadas. Linhas com erro são descartadas da ingestão;
+avisos não impedem a gravação. O índice pode ser exportado como CSV para download.
+"""
+
+import numpy as np
+import pandas as pd
+
+# (código, severidade, mensagem); a posição na lista é o bit da regra no bitmask
+RULES = [
+    ('missing_sku', 'error', 'SKU ausente'),
+    ('missing_cost', 'error', 'new_cost ausente'),
+    ('non_numeric_cost', 'error', 'new_cost não numérico'),
+    ('negative_cost', 'error', 'Custo negativo'),
+    ('duplicate_sku', 'error', 'SKU repetido no arquivo'),
+    ('non_numeric_value', 'warning', 'previous_cost ou monthly_volume não numérico (assumido 0)'),
+    ('missing_description', 'warning', 'Descrição ausente'),
+    ('absurd_change', 'warning', 'Variação de custo acima do limite'),
+    ('invalid_unit', 'warning', 'Unidade fora da lista permitida'),
+]
+
+RULE_BITS = {code: np.uint16(1 << bit) for bit, (code, _, _) in enumerate(RULES)}
+ERROR_MASK = np.uint16(sum(1 << bit for bit, (_, severity, _) in enumerate(RULES) if severity == 'error'))
+
+MAX_CHANGE_PERCENTAGE = 100  # Variação absoluta acima disso gera aviso
+ALLOWED_UNITS = {'UN', 'PC', 'PCT', 'CX', 'FD', 'DZ', 'KG', 'G', 'L', 'ML', 'M', 'M2', 'M3', 'TON'}
+
+REPORT_COLUMNS = ['linha', 'sku', 'severidade', 'regras', 'mensagens']
+
+
+def _text(series):
+    """Texto sem espaços nas bordas; valores ausentes viram string vazia"""
+    return series.where(series.notna(), '').astype(str).str.strip()
+
+
+class ValidationReport:
+    """Índice compacto das linhas com problema (posição + bitmask de regras)"""
+
+    def __init__(self, total_rows, positions, flags, skus):
+        self.total_rows = total_rows
+        self.positions = positions  # Posição da linha no arquivo (0 = primeira linha de dados)
+        self.flags = flags
+        self.skus = skus
+
+    @property
+    def error_rows(self):
+        return int(np.count_nonzero(self.flags & ERROR_MASK))
+
+    @property
+    def warning_rows(self):
+        return int(np.count_nonzero((self.flags & ERROR_MASK) == 0))
+
+    def summary(self):
+        """Contagem de linhas por regra"""
+        return {
+            'total_rows': self.total_rows,
+            'valid_rows': self.total_rows - self.error_rows,
+            'error_rows': self.error_rows,
+            'warning_rows': self.warning_rows,
+            'rules': {
+                code: int(np.count_nonzero(self.flags & RULE_BITS[code]))
+                for code, _, _ in RULES
+                if np.any(self.flags & RULE_BITS[code])
+            }
+        }
+
+    def to_frame(self):
+        """Relatório legível: uma linha por linha do arquivo com problema"""
+        codes = pd.Series('', index=range(len(self.flags)), dtype=object)
+        messages = codes.copy()
+        for code, _, message in RULES:
+            hit = (self.flags & RULE_BITS[code]) != 0
+            codes = codes.where(~hit, codes + code + ';')
+            messages = messages.where(~hit, messages + message + '; ')
+
+        return pd.DataFrame({
+            'linha': self.positions + 2,  # Numeração da planilha (cabeçalho na linha 1)
+            'sku': self.skus,
+            'severidade': np.where(self.flags & ERROR_MASK, 'error', 'warning'),
+            'regras': codes.str.rstrip(';'),
+            'mensagens': messages.str.rstrip('; ')
+        }, columns=REPORT_COLUMNS)
+
+    def write_csv(self, path):
+        self.to_frame().to_csv(path, index=False)
+
+
+class CostFrameValidator:
+    """Validação bloco a bloco: cada bloco lido é validado e convertido na hora
+
+    Chamado com cada bloco do arquivo (o índice do bloco é a posição da linha nos
+    dados), devolve só as linhas sem erro, já com os tipos finais, e acumula o
+    índice de problemas. SKUs válidos já vistos em blocos anteriores ficam num
+    conjunto, para a regra de SKU repetido valer para o arquivo inteiro.
+    """
+
+    def __init__(self, max_change_percentage=MAX_CHANGE_PERCENTAGE, allowed_units=ALLOWED_UNITS):
+        self.max_change_percentage = max_change_percentage
+        self.allowed_units = allowed_units
+        self.total_rows = 0
+        self.seen_skus = set()
+        self._positions = []
+        self._flags = []
+        self._skus = []
+
+    def __call__(self, df):
+        flags = np.zeros(len(df), dtype=np.uint16)
+
+        def flag(code, mask):
+            np.bitwise_or(flags, RULE_BITS[code], out=flags, where=np.asarray(mask, dtype=bool))
+
+        sku = _text(df['sku'])
+        description = _text(df['description'])
+        unit = _text(df['unit']).replace('', 'UN')
+        new_cost = pd.to_numeric(df['new_cost'], errors='coerce')
+        previous_cost = pd.to_numeric(df['previous_cost'], errors='coerce')
+        monthly_volume = pd.to_numeric(df['monthly_volume'], errors='coerce')
+
+        missing_sku = sku == ''
+        missing_cost = df['new_cost'].isna()
+        if not pd.api.types.is_numeric_dtype(df['new_cost']):
+            missing_cost |= _text(df['new_cost']) == ''
+        flag('missing_sku', missing_sku)
+        flag('missing_cost', missing_cost)
+        flag('non_numeric_cost', new_cost.isna() & ~missing_cost)
+        flag('negative_cost', (new_cost < 0) | (previous_cost < 0))
+
+        # Repetido no bloco ou em blocos anteriores, só entre linhas sem outro erro:
+        # uma linha inválida não tira o lugar da primeira ocorrência válida do SKU
+        no_error = (flags & ERROR_MASK) == 0
+        candidates = sku[no_error]
+        duplicate = np.zeros(len(df), dtype=bool)
+        duplicate[no_error] = candidates.duplicated(keep='first') | candidates.isin(self.seen_skus)
+        flag('duplicate_sku', duplicate)
+        self.seen_skus.update(candidates)
+
+        flag('non_numeric_value',
+             (previous_cost.isna() & df['previous_cost'].notna()) |
+             (monthly_volume.isna() & df['monthly_volume'].notna()))
+        flag('missing_description', description == '')
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (new_cost - previous_cost).abs() / previous_cost * 100
+        flag('absurd_change', (previous_cost > 0) & (change > self.max_change_percentage))
+        flag('invalid_unit', ~unit.str.upper().isin(self.allowed_units))
+
+        problems = np.flatnonzero(flags)
+        self.total_rows += len(df)
+        self._positions.append(np.asarray(df.index, dtype=np.int64)[problems])
+        self._flags.append(flags[problems])
+        self._skus.append(sku.to_numpy()[problems])
+
+        valid = (flags & ERROR_MASK) == 0
+        return pd.DataFrame({
+            'sku': sku,
+            'description': description,
+            'category': _text(df['category']),
+            'unit': unit,
+            'previous_cost': previous_cost.fillna(0),
+            'new_cost': new_cost,
+            'monthly_volume': monthly_volume.fillna(0)
+        })[valid]
+
+    def report(self):
+        """Índice das linhas com problema de todos os blocos validados"""
+        if not self._flags:
+            return ValidationReport(0, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint16),
+                                    np.empty(0, dtype=object))
+        return ValidationReport(self.total_rows, np.concatenate(self._positions), np.concatenate(self._flags),
+                                np.concatenate(self._skus))
+
+
+def validate_cost_frame(df, max_change_percentage=MAX_CHANGE_PERCENTAGE, allowed_units=ALLOWED_UNITS):
+    """Valida o DataFrame lido do arquivo em uma passagem vetorizada
+
+    Espera as colunas da tabela de custos já presentes (opcionais preenchidas com
+    o padrão). Retorna (df_limpo, report), com df_limpo contendo apenas as linhas
+    sem erro, com tipos normalizados e índice reiniciado.
+    """
+    validator = CostFrameValidator(max_change_percentage, allowed_units)
+    clean = validator(df.reset_index(drop=True))
+    return clean.reset_index(drop=True), validator.report()
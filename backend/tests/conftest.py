@@ -0,0 +1,115 @@
+"""
+Fixtures compartilhadas pelos testes
+"""
+
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Permitir imports no mesmo estilo de main.py (models.*, routes.*, services.*)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask
+from models.user import db, User
+from models.supplier import Supplier
+from models.cost_table import CostTable
+from models.approval import Approval
+import models.ingestion_job  # noqa: F401 (tabela usada pelas migrações)
+from routes.approval import approval_bp
+from routes.cost_table import cost_table_bp
+from routes.dashboard import dashboard_bp
+from services.database import init_database
+from services.migrations import run_migrations
+from services.query_counter import init_query_counter
+
+TABLES = 60
+OWNERS = 10
+
+
+def seed(tables=TABLES, owners=OWNERS):
+    """Tabelas de custo com aprovações pendentes, vencidas e decididas; retorna o usuário logado"""
+    user = User(username='teste', email='teste@empresa.com', first_name='Teste',
+                last_name='Admin', role='admin')
+    user.set_password('teste')
+    db.session.add(user)
+
+    # Fornecedores e usuários distintos por tabela, para o N+1 não ficar escondido no identity map
+    suppliers, users = [], [user]
+    for index in range(owners):
+        suppliers.append(Supplier(name=f'Fornecedor {index}', cnpj=f'00.000.000/0001-{index:02d}',
+                                  email=f'fornecedor{index}@teste.com', category='Outros'))
+        if index:
+            approver = User(username=f'teste{index}', email=f'teste{index}@empresa.com',
+                            first_name='Teste', last_name=str(index), role='commercial_manager')
+            approver.set_password('teste')
+            users.append(approver)
+    db.session.add_all(suppliers + users[1:])
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for index in range(tables):
+        owner = index % owners
+        cost_table = CostTable(
+            supplier_id=suppliers[owner].id, version=f'v1.{index}', filename=f'teste_{index}.xlsx',
+            file_path='teste.xlsx', effective_date=date.today(), category='Outros',
+            total_items=0, submitted_by=users[owner].id, status='under_review'
+        )
+        db.session.add(cost_table)
+        db.session.flush()
+        # Uma aprovação pendente (metade vencida, delegada ao usuário logado) e uma decidida por tabela
+        db.session.add(Approval(cost_table_id=cost_table.id, approver_id=users[owner].id, delegated_to=user.id,
+                                approval_type='category_buyer', sequence_order=1, status='pending',
+                                deadline=now + timedelta(hours=(index % 2) * 48 - 12)))
+        db.session.add(Approval(cost_table_id=cost_table.id, approver_id=users[owner].id,
+                                approval_type='pricing_analyst', sequence_order=2, status='approved',
+                                assigned_at=now - timedelta(days=3), decision_date=now - timedelta(days=1),
+                                deadline=now))
+    db.session.commit()
+    return user
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Aplicação com banco SQLite temporário, contador de consultas e dados de exemplo"""
+    folder = tmp_path_factory.mktemp('app')
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='teste',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{folder / 'app.db'}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        UPLOAD_FOLDER=str(folder / 'uploads'),
+        # Sem cache do dashboard: toda chamada precisa chegar ao banco
+        DASHBOARD_CACHE_TTL=0,
+        QUERY_COUNT_HEADER=True,
+        QUERY_BUDGET_STRICT=True,
+    )
+    init_database(app)
+    db.init_app(app)
+    init_query_counter(app)
+    app.register_blueprint(cost_table_bp, url_prefix='/api/cost-tables')
+    app.register_blueprint(approval_bp, url_prefix='/api/approvals')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+
+    with app.app_context():
+        db.create_all()
+        # Agregados do dashboard e índices de busca (mantidos por triggers)
+        run_migrations(db.engine)
+        app.config['TEST_USER_ID'] = seed().id
+
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de teste com o usuário administrador logado"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = app.config['TEST_USER_ID']
+    return client
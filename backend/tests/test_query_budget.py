@@ -0,0 +1,44 @@
+"""
+Orçamento de consultas SQL das rotas de listagem
+
+Cada rota é chamada com páginas pequenas e grandes: o número de consultas tem
+que ser o mesmo e igual ao orçamento fixo da rota (crescer com a página é sinal de N+1).
+"""
+
+import pytest
+
+from services.query_counter import QUERY_COUNT_HEADER
+
+PAGE_SIZES = (5, 50)
+
+# (rota, parâmetro de tamanho da página, consultas esperadas)
+ENDPOINTS = [
+    ('/api/cost-tables/', 'per_page', 5),
+    ('/api/cost-tables/?cursor=', 'per_page', 4),
+    ('/api/approvals/pending', 'per_page', 5),
+    ('/api/approvals/overdue', 'per_page', 6),
+    ('/api/approvals/reminders', None, 2),
+    ('/api/approvals/cost-table/1/workflow', None, 2),
+    ('/api/dashboard/recent-activity', 'limit', 3),
+    ('/api/dashboard/metrics/approval-times', 'per_page', 2),
+    ('/api/dashboard/metrics/monthly', 'months', 2),
+    ('/api/dashboard/metrics/suppliers', 'limit', 1),
+    ('/api/dashboard/metrics/categories', None, 1),
+    ('/api/dashboard/overview', None, 7),
+    ('/api/dashboard/reports?period=last_year', None, 6),
+]
+
+
+def query_count(client, path, size_param, size):
+    url = path
+    if size_param:
+        url += ('&' if '?' in path else '?') + f'{size_param}={size}'
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return int(response.headers[QUERY_COUNT_HEADER])
+
+
+@pytest.mark.parametrize('path, size_param, expected', ENDPOINTS, ids=[e[0] for e in ENDPOINTS])
+def test_query_count_is_fixed(client, path, size_param, expected):
+    counts = [query_count(client, path, size_param, size) for size in PAGE_SIZES]
+    assert counts == [expected] * len(PAGE_SIZES)
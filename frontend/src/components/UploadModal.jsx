@@ -158,7 +158,7 @@ export default function UploadModal({ isOpen, onClose, onSuccess }) {
       })
       
       xhr.addEventListener('load', () => {
-        if (xhr.status === 200) {
+        if (xhr.status >= 200 && xhr.status < 300) {
           setSuccess(true)
           setTimeout(() => {
             onSuccess?.()